@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Set, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from main.canonical import Canonicalizer, load_canonicalizer
+from main.file_detector import is_downloadable_url
+from main.link_utils import extract_links_streaming
+
+BASE = "https://data.example.gov"
+
+
+def _variant(rnd: random.Random, path: str, query: str = "") -> str:
+    # The ways real portals spell the same link: scheme, host case, ports, slashes, index pages,
+    # parameter order, campaign tags and session ids
+    host = rnd.choice(["data.example.gov", "Data.Example.gov", "data.example.gov:443"])
+    scheme = "http" if rnd.random() < 0.15 else "https"
+    if scheme == "http":
+        host = host.replace(":443", ":80")
+    if path.endswith("/") and rnd.random() < 0.3:
+        path += "index.html"
+    elif path != "/" and not path.endswith((".csv", ".json", ".zip")) and rnd.random() < 0.3:
+        path = path.rstrip("/") + "/"
+    params = [p for p in query.split("&") if p]
+    rnd.shuffle(params)
+    if rnd.random() < 0.25:
+        params.append(f"utm_source=newsletter&utm_campaign=wk{rnd.randint(1, 52)}")
+    if rnd.random() < 0.1:
+        path += f";jsessionid={rnd.getrandbits(48):x}"
+    href = f"{scheme}://{host}{path}"
+    if params:
+        href += "?" + "&".join(params)
+    if rnd.random() < 0.2:
+        href += "#resources"
+    return href
+
+
+def make_page(path: str, query: str, datasets: int, per_page: int, popular: int) -> str:
+    if path.startswith("/files/"):
+        return ""  # a data file fetched as a page: no links
+    rnd = random.Random(f"{path}?{query}")
+    pages = (datasets + per_page - 1) // per_page
+    links = [_variant(rnd, "/"), _variant(rnd, "/datasets/"), _variant(rnd, "/about")]
+    # Sidebar: the most downloaded files, repeated on every page of the portal
+    links += [_variant(rnd, f"/files/popular_{i}.csv") for i in range(popular)]
+    if path.startswith("/datasets"):
+        page = int(dict(parse_qsl(query)).get("page", "1"))
+        start = (page - 1) * per_page
+        links += [_variant(rnd, f"/dataset/{i}") for i in range(start, min(datasets, start + per_page))]
+        links += [_variant(rnd, "/datasets", f"page={p}&sort=name") for p in range(1, pages + 1)]
+    elif path.startswith("/dataset/"):
+        i = path.rsplit("/", 1)[-1]
+        links += [_variant(rnd, f"/files/dataset_{i}.{ext}") for ext in ("csv", "json")]
+        links += [_variant(rnd, "/datasets", "page=1&sort=name")]
+    else:
+        links += [_variant(rnd, "/datasets", "page=1&sort=name")]
+    body = "".join(f'<li><a href="{href}">link</a></li>' for href in links)
+    return f"<html><body><ul>{body}</ul></body></html>"
+
+
+def _route(url: str) -> Tuple[str, str]:
+    # What the server would actually serve for a URL, however it is spelled
+    parts = urlsplit(url)
+    path = parts.path.split(";", 1)[0]
+    if path.endswith("index.html"):
+        path = path[: -len("index.html")]
+    path = path.rstrip("/") or "/"
+    page = dict(parse_qsl(parts.query)).get("page", "")
+    return path, f"page={page}" if page else ""
+
+
+def crawl(
+    seen_key: Callable[[str], str],
+    rewrite: Callable[[str], str],
+    dedupe_files: bool,
+    datasets: int,
+    per_page: int,
+    popular: int,
+) -> Tuple[Dict[str, int], Set[Tuple[str, str]]]:
+    seen: Set[str] = set()
+    queue: Deque[str] = deque([BASE + "/"])
+    seen.add(seen_key(BASE + "/"))
+    counts = {"page_fetches": 0, "file_fetches": 0}
+    reached: Set[Tuple[str, str]] = set()
+    while queue:
+        url = queue.popleft()
+        counts["page_fetches"] += 1
+        route = _route(url)
+        reached.add(route)
+        html = make_page(route[0], route[1], datasets, per_page, popular)
+        for href in extract_links_streaming(html, url):
+            href = rewrite(href)
+            if is_downloadable_url(href):
+                if dedupe_files and not _add(seen, seen_key(href)):
+                    continue
+                counts["file_fetches"] += 1
+                reached.add(_route(href))
+            elif _add(seen, seen_key(href)):
+                queue.append(href)
+    return counts, reached
+
+
+def _add(seen: Set[str], key: str) -> bool:
+    if key in seen:
+        return False
+    seen.add(key)
+    return True
+
+
+def _throughput(canonicalizer: Canonicalizer, urls: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for url in urls:
+            canonicalizer.canonicalize_with_key(url)
+        best = min(best, time.perf_counter() - started)
+    return len(urls) / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fetches saved by URL canonicalization on a synthetic data portal")
+    parser.add_argument("--datasets", type=int, default=200)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--popular", type=int, default=40, help="Files linked from every page")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    canonicalizer = load_canonicalizer()
+    sizes = (args.datasets, args.per_page, args.popular)
+    # Before: only fragments were dropped, and file links were not deduplicated at all
+    before, before_reached = crawl(lambda u: u, lambda u: u, False, *sizes)
+    after, after_reached = crawl(canonicalizer.key, canonicalizer.canonicalize, True, *sizes)
+
+    print(f"{'':<16}{'page_fetches':>14}{'file_fetches':>14}{'resources':>12}")
+    for name, counts, reached in (("normalize_url", before, before_reached), ("canonical", after, after_reached)):
+        print(f"{name:<16}{counts['page_fetches']:>14}{counts['file_fetches']:>14}{len(reached):>12}")
+    total_before = before["page_fetches"] + before["file_fetches"]
+    total_after = after["page_fetches"] + after["file_fetches"]
+    print(f"fetch reduction: {total_before} -> {total_after} ({1 - total_after / total_before:.1%} fewer requests)")
+    if not before_reached <= after_reached:
+        raise SystemExit("canonical crawl missed resources the baseline reached")
+
+    rnd = random.Random(1)
+    urls = [_variant(rnd, f"/dataset/{i}", "page=2&sort=name") for i in range(20000)]
+    print(f"canonicalize_with_key: {_throughput(canonicalizer, urls, args.repeat) / 1000:.0f}k urls/s")
+
+
+if __name__ == "__main__":
+    main()
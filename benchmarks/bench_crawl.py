@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.synthetic_site import SiteSpec, add_spec_arguments, spec_from_args, start_site
+
+# Metric name -> True when higher is better; used to decide which direction is a regression
+COMPARED = {
+    "pages_per_s": True,
+    "files_per_s": True,
+    "mb_per_s": True,
+    "peak_rss_mb": False,
+    "loop_lag_p99_ms": False,
+}
+# Absolute changes below these are noise on a shared machine, whatever the relative change
+NOISE_FLOOR = {"peak_rss_mb": 5.0, "loop_lag_p99_ms": 5.0}
+
+
+def _serve(spec: SiteSpec, ready: Any) -> None:
+    async def serve() -> None:
+        runner, url = await start_site(spec)
+        ready.put(url)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(serve())
+
+
+async def _watch_loop(samples: List[float], interval: float = 0.01) -> None:
+    # Event-loop lag: how late a short sleep wakes up while the crawl runs
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - started - interval))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _crawl_once(url: str, spec: SiteSpec, options: Dict[str, int], results: Any) -> None:
+    # Runs in a fresh process, so peak RSS and the metrics registry belong to this crawl alone
+    workdir = tempfile.mkdtemp(prefix="bench-crawl-")
+    os.environ["DB_URL"] = f"sqlite+pysqlite:///{workdir}/bench.db"
+    from sqlalchemy import func, select
+
+    from main.config import load_settings
+    from main.crawler import Crawler
+    from main.db import acquisition_metadata
+    from main.metrics import profile_summary
+
+    settings = replace(
+        load_settings(),
+        start_url=url,
+        max_depth=spec.depth,
+        output_dir=Path(workdir) / "out",
+        max_concurrency=options["concurrency"],
+        per_host_concurrency=options["concurrency"],
+        download_concurrency=options["download_concurrency"],
+        per_host_download_concurrency=options["download_concurrency"],
+        backoff_base_seconds=0.05,
+    )
+
+    async def run() -> Dict[str, Any]:
+        crawler = Crawler(settings)
+        lag: List[float] = []
+        watcher = asyncio.create_task(_watch_loop(lag))
+        started = time.perf_counter()
+        try:
+            await crawler.run(url)
+        finally:
+            elapsed = time.perf_counter() - started
+            watcher.cancel()
+        with crawler.engine.connect() as conn:
+            size_kb = conn.execute(select(func.sum(acquisition_metadata.c.file_size_kb))).scalar() or 0
+        stats = crawler.stats
+        files = stats.get("downloaded_files", 0) + stats.get("duplicate_files", 0)
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "pages": stats.get("fetched_pages", 0),
+            "files": files,
+            "mb": round(float(size_kb) / 1024, 2),
+            "pages_per_s": round(stats.get("fetched_pages", 0) / elapsed, 2),
+            "files_per_s": round(files / elapsed, 2),
+            "mb_per_s": round(float(size_kb) / 1024 / elapsed, 2),
+            "loop_lag_p50_ms": round(_percentile(lag, 0.5) * 1000, 2),
+            "loop_lag_p99_ms": round(_percentile(lag, 0.99) * 1000, 2),
+            "loop_lag_max_ms": round(max(lag, default=0.0) * 1000, 2),
+            "errors": stats.get("errors", 0),
+            "phases": {name: row["p95_seconds"] for name, row in profile_summary()["phases"].items()},
+        }
+
+    try:
+        result = asyncio.run(run())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    # ru_maxrss is in kilobytes on Linux
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    results.put(result)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def _median(runs: List[Dict[str, Any]]) -> Dict[str, float]:
+    keys = [k for k, v in runs[0].items() if isinstance(v, (int, float))]
+    return {k: round(statistics.median(run[k] for run in runs), 3) for k in keys}
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for name, higher_is_better in COMPARED.items():
+        if name not in baseline or not baseline[name]:
+            continue
+        change = (current[name] - baseline[name]) / baseline[name]
+        if abs(current[name] - baseline[name]) < NOISE_FLOOR.get(name, 0.0):
+            continue
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{name}: {baseline[name]} -> {current[name]} ({change:+.1%})")
+    return regressions
+
+
+def _wait_for_result(worker: Any, results: Any, timeout: float) -> Dict[str, Any]:
+    # A crawl that crashes never reports, so poll for the worker's exit instead of blocking forever
+    deadline = time.monotonic() + timeout
+    while True:
+        exited = worker.exitcode is not None
+        try:
+            run = results.get(timeout=1.0)
+            worker.join()
+            return run
+        except queue.Empty:
+            pass
+        if exited:
+            raise SystemExit(f"crawl worker exited with code {worker.exitcode} without a result")
+        if time.monotonic() > deadline:
+            worker.terminate()
+            worker.join()
+            raise SystemExit(f"crawl did not finish within {timeout:.0f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Crawl a local synthetic site and report throughput")
+    add_spec_arguments(parser)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--download-concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--env", nargs="*", default=[], help="Settings overrides as ENV=VALUE, e.g. LINK_EXTRACTOR=streaming")
+    parser.add_argument("--json", type=Path, help="Write the results to this file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON from an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative change before a regression")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds one crawl may take before it is a failure")
+    args = parser.parse_args()
+
+    spec = spec_from_args(args)
+    for assignment in args.env:
+        key, _, value = assignment.partition("=")
+        os.environ[key] = value
+    options = {"concurrency": args.concurrency, "download_concurrency": args.download_concurrency}
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"Synthetic site: {spec.pages} pages, {spec.files} files of {spec.file_kb} KB")
+
+    runs: List[Dict[str, Any]] = []
+    for i in range(args.repeat):
+        # A fresh server per run, so injected errors hit the same URLs every time
+        ready, results = ctx.Queue(), ctx.Queue()
+        server = ctx.Process(target=_serve, args=(spec, ready), daemon=True)
+        server.start()
+        try:
+            url = ready.get(timeout=30)
+            worker = ctx.Process(target=_crawl_once, args=(url, spec, options, results))
+            worker.start()
+            run = _wait_for_result(worker, results, args.timeout)
+        finally:
+            server.terminate()
+        runs.append(run)
+        print(
+            f"run {i + 1}: {run['elapsed_s']:.2f}s  {run['pages_per_s']:.1f} pages/s  "
+            f"{run['files_per_s']:.1f} files/s  {run['mb_per_s']:.1f} MB/s  rss {run['peak_rss_mb']:.0f} MB  "
+            f"lag p99 {run['loop_lag_p99_ms']:.1f} ms"
+        )
+
+    median = _median(runs)
+    report = {
+        "commit": _git_commit(),
+        "spec": asdict(spec),
+        "options": options,
+        "env": args.env,
+        "runs": runs,
+        "median": median,
+    }
+    print("median: " + "  ".join(f"{k}={median[k]}" for k in COMPARED))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if baseline.get("spec") != report["spec"]:
+            print("warning: baseline was recorded against a different site spec")
+        regressions = compare(median, baseline["median"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions against {baseline.get('commit') or args.compare}")
+
+
+if __name__ == "__main__":
+    main()
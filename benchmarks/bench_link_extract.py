@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from main.link_utils import StreamingLinkExtractor, extract_links, extract_links_streaming
+
+
+def make_portal_page(target_kb: int, seed: int = 0) -> str:
+    # Roughly shaped like a CKAN/Socrata catalog listing: nav, long tables, inline scripts
+    rnd = random.Random(seed)
+    parts: List[str] = [
+        "<!DOCTYPE html><html><head><title>Catalog</title>",
+        '<link rel="stylesheet" href="/static/site.css">',
+        "<script>var cfg = {a: 1, b: '<a href=\"fake\">'};</script></head><body>",
+        '<nav><a href="/">Home</a><a href="/datasets">Datasets</a><a href="/login">Login</a></nav><table>',
+    ]
+    size = sum(len(p) for p in parts)
+    i = 0
+    while size < target_kb * 1024:
+        ext = rnd.choice(["csv", "xlsx", "json", "zip", "html"])
+        row = (
+            f'<tr class="row-{i % 2}"><td><a href="/dataset/{i}?page={i % 7}#top">Dataset {i}</a></td>'
+            f'<td><a href="https://files.example.org/res/{i}/data.{ext}" title="Download">{ext.upper()}</a></td>'
+            f"<td>{'lorem ipsum statistics ' * rnd.randint(1, 6)}</td>"
+            f'<td><span class="tag">indicator</span><a href="mailto:owner{i}@example.org">owner</a></td></tr>'
+        )
+        parts.append(row)
+        size += len(row)
+        i += 1
+    parts.append("</table></body></html>")
+    return "".join(parts)
+
+
+def _anchors_only(html: str, base_url: str) -> List[str]:
+    extractor = StreamingLinkExtractor(base_url, tags=("a",), data_attrs=False)
+    extractor.feed(html)
+    return extractor.close()
+
+
+def _time(fn: Callable[[str, str], List[str]], html: str, base_url: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(html, base_url)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare link extraction engines on synthetic portal pages")
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    base_url = "https://data.example.gov/catalog/"
+    print(f"{'size_kb':>8} {'links':>7} {'bs4_ms':>9} {'stream_ms':>10} {'speedup':>8}")
+    for size_kb in args.sizes_kb:
+        html = make_portal_page(size_kb)
+        reference = extract_links(html, base_url)
+        if _anchors_only(html, base_url) != reference:
+            raise SystemExit(f"streaming extractor disagrees with bs4 on {size_kb} KB page")
+        bs4_s = _time(extract_links, html, base_url, args.repeat)
+        stream_s = _time(extract_links_streaming, html, base_url, args.repeat)
+        print(
+            f"{size_kb:>8} {len(reference):>7} {bs4_s * 1000:>9.1f} {stream_s * 1000:>10.1f} "
+            f"{bs4_s / stream_s:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
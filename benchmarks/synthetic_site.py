@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import random
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Tuple
+
+from aiohttp import web
+
+
+@dataclass(frozen=True)
+class SiteSpec:
+    branching: int = 5  # child pages per page
+    depth: int = 2  # levels below the index page
+    page_kb: int = 20
+    files_per_page: int = 5
+    file_kb: int = 256
+    latency_ms: float = 0.0
+    error_rate: float = 0.0  # share of URLs whose first request fails with a 503
+    duplicate_links: int = 3  # extra links per page to pages and files linked elsewhere
+    unique_files: bool = True  # False serves identical bytes for every file
+    seed: int = 0
+
+    @property
+    def pages(self) -> int:
+        return sum(self.branching ** level for level in range(self.depth + 1))
+
+    @property
+    def files(self) -> int:
+        return self.pages * self.files_per_page
+
+
+_FILLER = "Statistical release tables for the region, updated quarterly with methodology notes. "
+
+
+def _page_paths(spec: SiteSpec) -> List[str]:
+    paths = ["/"]
+    level = [""]
+    for _ in range(spec.depth):
+        level = [f"{parent}/{i}" for parent in level for i in range(spec.branching)]
+        paths.extend(f"/p{path}" for path in level)
+    return paths
+
+
+def _children(spec: SiteSpec, path: str) -> List[str]:
+    if path == "/":
+        return [f"/p/{i}" for i in range(spec.branching)] if spec.depth > 0 else []
+    if path.count("/") - 1 >= spec.depth:
+        return []
+    return [f"{path}/{i}" for i in range(spec.branching)]
+
+
+def _file_paths(spec: SiteSpec, path: str) -> List[str]:
+    key = "root" if path == "/" else path[3:].replace("/", "_")
+    return [f"/files/{key}_{j}.csv" for j in range(spec.files_per_page)]
+
+
+def render_page(spec: SiteSpec, path: str, all_pages: List[str]) -> str:
+    rnd = random.Random(f"{spec.seed}:{path}")
+    links = [f'<li><a href="{child}">Section {child}</a></li>' for child in _children(spec, path)]
+    links += [f'<li><a href="{f}">Download CSV</a></li>' for f in _file_paths(spec, path)]
+    for _ in range(spec.duplicate_links):
+        other = rnd.choice(all_pages)
+        target = rnd.choice([other] + _file_paths(spec, other)) if spec.files_per_page else other
+        links.append(f'<li><a href="{target}#ref">See also</a></li>')
+    head = f"<!DOCTYPE html><html><head><title>{path}</title></head><body><h1>Open data {path}</h1><ul>"
+    body = head + "".join(links) + "</ul>"
+    padding = max(0, spec.page_kb * 1024 - len(body) - 32)
+    return body + "<p>" + (_FILLER * (padding // len(_FILLER) + 1))[:padding] + "</p></body></html>"
+
+
+def _file_body(spec: SiteSpec, path: str, block: bytes) -> bytes:
+    size = spec.file_kb * 1024
+    body = (block * (size // len(block) + 1))[:size]
+    if not spec.unique_files:
+        return body
+    # A per-file first row keeps content hashes distinct without generating every byte
+    header = f"id,{path}\n".encode()
+    return header + body[len(header):]
+
+
+def _fails_first(spec: SiteSpec, path: str) -> bool:
+    # The index page always answers, so every run discovers the same site
+    if spec.error_rate <= 0 or path == "/":
+        return False
+    digest = hashlib.sha1(f"{spec.seed}:{path}".encode()).digest()
+    return int.from_bytes(digest[:4], "big") / 2**32 < spec.error_rate
+
+
+def make_app(spec: SiteSpec) -> web.Application:
+    all_pages = _page_paths(spec)
+    known = set(all_pages)
+    pages: Dict[str, str] = {}
+    block = b"".join(f"{i},{i * 7 % 101},{i * 13 % 997}\n".encode() for i in range(4096))
+    failed: set = set()
+    counters = {"pages": 0, "files": 0, "errors": 0, "bytes": 0}
+
+    async def _delay() -> None:
+        if spec.latency_ms > 0:
+            await asyncio.sleep(spec.latency_ms / 1000)
+
+    def _inject_error(path: str) -> bool:
+        if path in failed or not _fails_first(spec, path):
+            return False
+        failed.add(path)
+        counters["errors"] += 1
+        return True
+
+    async def page(request: web.Request) -> web.Response:
+        path = request.path
+        if path not in known:
+            raise web.HTTPNotFound()
+        await _delay()
+        if _inject_error(path):
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        html = pages.get(path)
+        if html is None:
+            html = pages[path] = render_page(spec, path, all_pages)
+        counters["pages"] += 1
+        return web.Response(text=html, content_type="text/html")
+
+    async def data_file(request: web.Request) -> web.Response:
+        path = request.path
+        await _delay()
+        if _inject_error(path):
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        body = _file_body(spec, path, block)
+        counters["files"] += 1
+        counters["bytes"] += len(body)
+        return web.Response(body=body, content_type="text/csv")
+
+    app = web.Application()
+    app["counters"] = counters
+    app.router.add_get("/", page)
+    app.router.add_get("/p/{tail:.*}", page)
+    app.router.add_get("/files/{name}", data_file)
+    return app
+
+
+async def start_site(spec: SiteSpec, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, str]:
+    runner = web.AppRunner(make_app(spec), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound}/"
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = SiteSpec()
+    for name, value in asdict(defaults).items():
+        flag = "--" + name.replace("_", "-")
+        if isinstance(value, bool):
+            parser.add_argument(flag, type=lambda v: v.lower() in ("1", "true", "yes"), default=value)
+        else:
+            parser.add_argument(flag, type=type(value), default=value)
+
+
+def spec_from_args(args: argparse.Namespace) -> SiteSpec:
+    return SiteSpec(**{name: getattr(args, name) for name in asdict(SiteSpec())})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a synthetic open-data portal for offline crawl benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+    spec = spec_from_args(args)
+
+    async def serve() -> None:
+        runner, url = await start_site(spec, args.host, args.port)
+        print(f"Serving {spec.pages} pages and {spec.files} files at {url}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
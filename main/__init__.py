@@ -5,6 +5,21 @@ __all__ = [
     "file_detector",
     "downloader",
     "ai_reasoner",
+    "page_analysis",
+    "canonical",
+    "robots",
+    "sitemap",
+    "seen",
+    "frontier",
+    "distributed",
+    "scheduler",
+    "host_control",
+    "http_cache",
+    "http_pool",
+    "disk_writer",
+    "metrics",
+    "warc",
+    "jobs",
     "crawler",
     "cli",
 ]
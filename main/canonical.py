@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, fields
+from fnmatch import translate
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+# Query parameters that never change what a page or file is; patterns use fnmatch syntax
+TRACKING_PARAMS = (
+    "utm_*",
+    "gclid",
+    "gclsrc",
+    "dclid",
+    "fbclid",
+    "msclkid",
+    "yclid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_gl",
+    "_hsenc",
+    "_hsmi",
+    "mkt_tok",
+    "ref_src",
+)
+SESSION_PARAMS = ("jsessionid", "phpsessid", "aspsessionid*", "sessionid", "session_id", "cfid", "cftoken")
+INDEX_FILES = ("index.html", "index.htm", "index.php", "index.shtml", "default.asp", "default.aspx", "default.htm")
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+_PERCENT = re.compile(r"%([0-9A-Fa-f]{2})")
+_PATH_SESSION = re.compile(r";(?:jsessionid|phpsessid)=[^/?#]*", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class HostRule:
+    # Extra parameters to strip, and parameters to keep even if they match a default pattern
+    drop_params: Tuple[str, ...] = ()
+    keep_params: Tuple[str, ...] = ()
+    sort_query: bool = True
+    # Equivalences that only affect the dedupe key, never the URL that is fetched
+    fold_scheme: bool = True
+    fold_www: bool = False
+    fold_trailing_slash: bool = True
+    fold_index: bool = True
+    fold_case: bool = False
+
+
+def _compile(patterns: Iterable[str]) -> "Optional[re.Pattern[str]]":
+    # One regex for a list of fnmatch patterns
+    patterns = [p.lower() for p in patterns]
+    return re.compile("|".join(translate(p) for p in patterns)) if patterns else None
+
+
+def _normalize_percent(text: str) -> str:
+    # %7E -> ~ and %2f -> %2F: one spelling for every escaped character
+    def repl(match: "re.Match[str]") -> str:
+        char = chr(int(match.group(1), 16))
+        return char if char in _UNRESERVED else "%" + match.group(1).upper()
+
+    return _PERCENT.sub(repl, text) if "%" in text else text
+
+
+def _remove_dot_segments(path: str) -> str:
+    if "." not in path:
+        return path
+    output: List[str] = []
+    for segment in path.split("/"):
+        if segment == "..":
+            if len(output) > 1:
+                output.pop()
+        elif segment != ".":
+            output.append(segment)
+    if path.endswith(("/.", "/..")):
+        output.append("")
+    return "/".join(output) or "/"
+
+
+class Canonicalizer:
+    # Two steps: canonicalize() rewrites a URL into a form that is still safe to fetch (host case,
+    # default ports, dot segments, escapes, tracking/session parameters, query order); key() further
+    # folds equivalences that are only true for most sites (http/https, trailing slash, index.html)
+    # and is what the seen-set stores. Rules are looked up by exact host, then ".parent.domain" suffix.
+    def __init__(
+        self,
+        rules: Optional[Dict[str, HostRule]] = None,
+        strip_params: Iterable[str] = TRACKING_PARAMS + SESSION_PARAMS,
+        default_rule: HostRule = HostRule(),
+    ) -> None:
+        self.rules = {host.lower(): rule for host, rule in (rules or {}).items()}
+        self.strip_params = tuple(p.lower() for p in strip_params)
+        self.default_rule = default_rule
+        self._rule_cache: Dict[str, HostRule] = {}
+        self._strip_re = _compile(self.strip_params)
+        self._patterns: Dict[Tuple[str, ...], "Optional[re.Pattern[str]]"] = {}
+
+    def rule_for(self, host: str) -> HostRule:
+        rule = self._rule_cache.get(host)
+        if rule is None:
+            rule = self.rules.get(host)
+            labels = host.split(".")
+            for i in range(1, len(labels)):
+                if rule is not None:
+                    break
+                rule = self.rules.get("." + ".".join(labels[i:]))
+            rule = self._rule_cache[host] = rule or self.default_rule
+        return rule
+
+    def _pattern(self, patterns: Tuple[str, ...]) -> "Optional[re.Pattern[str]]":
+        if patterns not in self._patterns:
+            self._patterns[patterns] = _compile(patterns)
+        return self._patterns[patterns]
+
+    def _strip(self, name: str, rule: HostRule) -> bool:
+        name = unquote_plus(name).lower() if "%" in name or "+" in name else name.lower()
+        keep = self._pattern(rule.keep_params)
+        if keep is not None and keep.match(name):
+            return False
+        if self._strip_re is not None and self._strip_re.match(name):
+            return True
+        drop = self._pattern(rule.drop_params)
+        return drop is not None and drop.match(name) is not None
+
+    def _split(self, url: str) -> Tuple[str, str, str, str, str, HostRule]:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").rstrip(".")
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        netloc = f"[{host}]" if ":" in host else host
+        if port is not None and port != _DEFAULT_PORTS.get(scheme):
+            netloc = f"{netloc}:{port}"
+        if parts.username is not None:
+            userinfo = parts.username + (f":{parts.password}" if parts.password is not None else "")
+            netloc = f"{userinfo}@{netloc}"
+        rule = self.rule_for(host)
+        path = _PATH_SESSION.sub("", parts.path) if ";" in parts.path else parts.path
+        path = _remove_dot_segments(_normalize_percent(path)) or "/"
+        query = parts.query
+        if query:
+            pairs = [p for p in query.split("&") if p and not self._strip(p.split("=", 1)[0], rule)]
+            if rule.sort_query:
+                pairs.sort()
+            query = "&".join(_normalize_percent(p) for p in pairs)
+        return scheme, host, netloc, path, query, rule
+
+    def canonicalize(self, url: str) -> str:
+        scheme, _, netloc, path, query, _ = self._split(url)
+        return urlunsplit((scheme, netloc, path, query, ""))
+
+    def key(self, url: str) -> str:
+        return self._key(*self._split(url))
+
+    def canonicalize_with_key(self, url: str) -> Tuple[str, str]:
+        # Both forms from a single parse; the hot path for every extracted link
+        scheme, host, netloc, path, query, rule = self._split(url)
+        return urlunsplit((scheme, netloc, path, query, "")), self._key(scheme, host, netloc, path, query, rule)
+
+    def _key(self, scheme: str, host: str, netloc: str, path: str, query: str, rule: HostRule) -> str:
+        if rule.fold_www and host.startswith("www."):
+            netloc = netloc.replace(host, host[4:], 1)
+        if rule.fold_index:
+            head, _, last = path.rpartition("/")
+            if last.lower() in INDEX_FILES:
+                path = head + "/"
+        if rule.fold_trailing_slash and path.endswith("/"):
+            path = path.rstrip("/")
+        if rule.fold_case:
+            path = path.lower()
+        if rule.fold_scheme and scheme in _DEFAULT_PORTS:
+            scheme = "http"
+        return urlunsplit((scheme, netloc, path or "/", query, ""))
+
+
+def _rule_from_json(data: Dict[str, object]) -> HostRule:
+    known = {f.name for f in fields(HostRule)}
+    values = {k: tuple(v) if isinstance(v, list) else v for k, v in data.items() if k in known}
+    return HostRule(**values)
+
+
+def load_canonicalizer(rules_path: str = "", strip_params: str = "") -> Canonicalizer:
+    # rules_path: JSON object of host (or ".suffix", or "*" for the default) -> HostRule fields
+    rules: Dict[str, HostRule] = {}
+    default_rule = HostRule()
+    if rules_path:
+        raw = json.loads(Path(rules_path).read_text(encoding="utf-8"))
+        for host, data in raw.items():
+            if host == "*":
+                default_rule = _rule_from_json(data)
+            else:
+                rules[host] = _rule_from_json(data)
+    extra = tuple(p.strip() for p in strip_params.split(",") if p.strip())
+    return Canonicalizer(rules, TRACKING_PARAMS + SESSION_PARAMS + extra, default_rule)
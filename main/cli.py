@@ -1,44 +1,128 @@
 from __future__ import annotations
 
 import asyncio
+import json
+from dataclasses import replace
 from pathlib import Path
 from typing import Optional
 
 import typer
 from rich import print
 
-from .config import Settings, load_settings
+from .config import load_settings
 from .crawler import Crawler
-from .db import init_db
+from .db import get_engine, init_db
+from .frontier import get_run, list_runs, settings_overrides
+from .metrics import profile_summary
 
 app = typer.Typer(add_completion=False, help="AI-Based Data Acquisition Agent")
 
 
 @app.command()
 def crawl(
-    url: str = typer.Option(..., "--url", help="Starting landing URL"),
+    url: Optional[str] = typer.Option(None, "--url", help="Starting landing URL"),
     depth: int = typer.Option(2, "--depth", min=0, help="Crawl depth (0..3)"),
-    concurrency: int = typer.Option(8, "--concurrency", min=1, help="Max concurrent downloads"),
+    concurrency: int = typer.Option(8, "--concurrency", min=1, help="Max concurrent page fetches"),
+    download_concurrency: int = typer.Option(8, "--download-concurrency", min=1, help="Max concurrent downloads"),
     output: Path = typer.Option(Path("downloads"), "--output", help="Directory to store downloads"),
     enable_ai: bool = typer.Option(False, "--enable-ai", help="Enable AI page prioritization"),
-    ai_model: str = typer.Option("gpt-4o-mini", "--ai-model", help="AI model if --enable-ai"),
+    ai_model: str = typer.Option("gpt-4o-mini", "--ai-model", help='AI model if --enable-ai ("fake" scores offline)'),
+    link_extractor: Optional[str] = typer.Option(
+        None, "--link-extractor", help="Link extraction engine: bs4 or streaming (default: LINK_EXTRACTOR or bs4)"
+    ),
+    resume: Optional[int] = typer.Option(
+        None, "--resume", help="Resume an interrupted run by id (see `runs`); other options are taken from the run"
+    ),
+    warc_record: Optional[Path] = typer.Option(
+        None, "--warc-record", help="Append every HTTP exchange to this WARC file (.warc.gz)"
+    ),
+    warc_replay: Optional[Path] = typer.Option(
+        None, "--warc-replay", help="Serve the crawl from a recorded WARC file instead of the network"
+    ),
+    profile: Optional[Path] = typer.Option(
+        None, "--profile", help="Write per-phase latency percentiles and error counts to this JSON file"
+    ),
+    worker: bool = typer.Option(
+        False,
+        "--worker",
+        help="Share the run's frontier in the database with other workers; join a run with --resume <id> --worker",
+    ),
 ):
+    if resume is not None:
+        _resume(resume, profile, worker)
+        return
+    if not url:
+        raise typer.BadParameter("--url is required unless --resume is given", param_hint="--url")
+
     settings = load_settings()
-    settings = Settings(
+    settings = replace(
+        settings,
         start_url=url,
         max_depth=depth,
         max_concurrency=concurrency,
+        download_concurrency=download_concurrency,
         output_dir=output.resolve(),
-        db_url=settings.db_url,
         enable_ai=enable_ai,
         ai_model=ai_model,
-        request_timeout_seconds=settings.request_timeout_seconds,
-        user_agent=settings.user_agent,
+        link_extractor=link_extractor or settings.link_extractor,
+        warc_record=str(warc_record.resolve()) if warc_record else settings.warc_record,
+        warc_replay=str(warc_replay.resolve()) if warc_replay else settings.warc_replay,
+        distributed=worker or settings.distributed,
     )
 
-    print(f"[bold green]Starting crawl[/bold green]: {url} (depth={depth}, concurrency={concurrency})")
+    print(
+        f"[bold green]Starting crawl[/bold green]: {url} "
+        f"(depth={depth}, concurrency={concurrency}, download_concurrency={download_concurrency})"
+    )
     crawler = Crawler(settings)
     asyncio.run(crawler.run(url))
+    print(f"[bold green]Done[/bold green] (run {crawler.run_id}): {crawler.stats}")
+    if profile is not None:
+        _write_profile(profile, crawler)
+
+
+def _write_profile(path: Path, crawler: Crawler) -> None:
+    summary = profile_summary()
+    path.write_text(json.dumps({"run_id": crawler.run_id, **summary, "stats": crawler.stats}, indent=2), encoding="utf-8")
+    print(f"{'phase':<12}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'total s':>10}")
+    for phase, row in summary["phases"].items():
+        print(
+            f"{phase:<12}{row['count']:>8}{row['p50_seconds'] * 1000:>10.1f}{row['p95_seconds'] * 1000:>10.1f}"
+            f"{row['p99_seconds'] * 1000:>10.1f}{row['total_seconds']:>10.2f}"
+        )
+    for key, count in summary["errors"].items():
+        print(f"[red]errors[/red] {key}: {int(count)}")
+    print(f"Profile written to {path}")
+
+
+def _resume(run_id: int, profile: Optional[Path] = None, worker: bool = False) -> None:
+    engine = get_engine()
+    init_db(engine)
+    info = get_run(run_id, engine=engine)
+    if info is None:
+        raise typer.BadParameter(f"No crawl run with id {run_id}", param_hint="--resume")
+    if info.status == "completed":
+        print(f"[yellow]Run {run_id} already completed[/yellow]")
+        return
+    settings = replace(load_settings(), **settings_overrides(info))
+    if worker:
+        settings = replace(settings, distributed=True)
+        print(f"[bold green]Joining run {run_id}[/bold green] as a worker: {info.start_url}")
+    else:
+        print(f"[bold green]Resuming run {run_id}[/bold green]: {info.start_url} (last status: {info.status})")
+    crawler = Crawler(settings)
+    asyncio.run(crawler.run(info.start_url, resume_run_id=run_id))
+    print(f"[bold green]Done[/bold green] (run {run_id}): {crawler.stats}")
+    if profile is not None:
+        _write_profile(profile, crawler)
+
+
+@app.command()
+def runs(limit: int = typer.Option(20, "--limit", min=1, help="Number of recent runs to list")):
+    engine = get_engine()
+    init_db(engine)
+    for info in list_runs(limit=limit, engine=engine):
+        print(f"{info.id:>5}  {info.status:<12} {info.updated_at:%Y-%m-%d %H:%M:%S}  {info.start_url}")
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -33,12 +33,82 @@ class Settings:
     per_host_concurrency: int = 2
     output_dir: Path = Path("downloads")
 
+    # Adaptive per-host limits (AIMD on latency and 429/503); per_host_* values are the starting points
+    adaptive_concurrency: bool = True
+    max_per_host_concurrency: int = 16
+    max_retry_after_seconds: float = 120.0
+
+    # Download stage
+    download_concurrency: int = 8
+    per_host_download_concurrency: int = 2
+    download_queue_size: int = 1000
+    # Parallel byte-range segments per large file when the server supports ranges; 1 disables
+    download_segments: int = 1
+    segment_min_size_kb: int = 16384
+    # Files are stored once per content hash under <output>/objects; optionally hardlinked by URL file name
+    named_links: bool = False
+    # Hosts (comma-separated, "*" for all, ".example.org" for subdomains) that get a HEAD size check before the GET
+    head_preflight_hosts: str = ""
+    # Download bodies are written from writer threads in coalesced blocks; 0 threads writes on the event loop
+    disk_writer_threads: int = 1
+    disk_write_block_kb: int = 1024
+    disk_max_pending_mb: int = 64
+    fsync_downloads: bool = False
+
     # Database
     db_url: str | None = None
+    db_batch_size: int = 500
+    db_flush_interval_seconds: float = 1.0
 
     # AI controls
     enable_ai: bool = False
-    ai_model: str = "gpt-4o-mini"
+    ai_model: str = "gpt-4o-mini"  # "fake" uses an offline stand-in
+    ai_concurrency: int = 4
+    ai_rate_per_second: float = 2.0
+    ai_cache: bool = True
+
+    # Page parsing: "inline" runs on the event loop, "thread"/"process" use a pool
+    parse_executor: str = "inline"
+    parse_workers: int = 0  # 0 = one per CPU
+    parse_max_pending: int = 0  # 0 = twice the worker count
+    link_extractor: str = "bs4"  # "bs4" or "streaming"
+
+    # URL canonicalization before dedupe: tracking/session parameters (plus STRIP_PARAMS patterns) are
+    # dropped, and CANONICAL_RULES may point at a JSON file of per-host canonical.HostRule fields
+    canonicalize_urls: bool = True
+    strip_params: str = ""
+    canonical_rules: str = ""
+
+    # Seen-URL set: "exact" (64-bit fingerprints) or "bloom" (fixed memory, small false-positive rate)
+    seen_set: str = "exact"
+    seen_capacity: int = 0  # expected URLs: pre-sizes the exact set, sizes the bloom filter (1M when 0)
+    bloom_error_rate: float = 0.001
+
+    # WARC archive paths: record every HTTP exchange, or serve the crawl from an earlier recording
+    warc_record: str = ""
+    warc_replay: str = ""
+
+    # Frontier checkpoints for crawl --resume; 0 disables persistence
+    checkpoint_interval_seconds: float = 10.0
+
+    # Distributed crawling (crawl --worker): workers share the run's frontier in the database. Hosts hash
+    # to frontier shards and each shard is leased to one worker at a time; shard and URL leases expire
+    # after lease_seconds unless renewed, so the work of a dead worker is taken over
+    distributed: bool = False
+    frontier_shards: int = 64
+    lease_seconds: float = 60.0
+    claim_batch_size: int = 200  # URLs a worker keeps queued locally
+    claim_interval_seconds: float = 1.0
+
+    # Conditional re-crawl: send stored ETag/Last-Modified and skip unchanged bodies
+    http_cache: bool = True
+
+    # Shared connection pool: global and per-host socket caps (0 = unlimited), DNS TTL, keep-alive
+    http_pool_limit: int = 100
+    http_pool_limit_per_host: int = 32
+    dns_cache_ttl_seconds: int = 300
+    keepalive_timeout_seconds: float = 30.0
+    local_resolver_cache: bool = False  # resolver cache kept by the pool across crawls
 
     # Networking / crawling
     request_timeout_seconds: int = 20
@@ -47,11 +117,20 @@ class Settings:
         "(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
     )
     respect_robots: bool = True
+    max_crawl_delay_seconds: float = 30.0  # robots.txt Crawl-delay values above this are capped
+    use_sitemaps: bool = True  # seed new runs from the start host's sitemaps (robots.txt Sitemap lines or /sitemap.xml)
+    sitemap_max_urls: int = 50000
+    sitemap_max_files: int = 50  # sitemap files read per run, index children included
     max_file_size_kb: int = 51200  # 50 MB
+    sniff_content: bool = True  # classify responses by their first bytes and switch page/download pipeline mid-stream
+    max_page_size_kb: int = 5120  # decoded HTML read per page; larger declared sizes are skipped, larger streams cut off
     max_retries: int = 3
     backoff_base_seconds: float = 0.5
     allow_render_js: bool = False  # placeholder, not implemented
 
+    # Web service: crawl jobs run this many at a time; the rest wait in the queue
+    max_concurrent_jobs: int = 2
+
 
 def load_settings() -> Settings:
     start_url = os.environ.get("START_URL")
@@ -60,10 +139,59 @@ def load_settings() -> Settings:
     per_host_concurrency = _to_int(os.environ.get("PER_HOST_CONCURRENCY"), 2)
     output_dir = Path(os.environ.get("OUTPUT_DIR", "downloads")).resolve()
 
+    adaptive_concurrency = _to_bool(os.environ.get("ADAPTIVE_CONCURRENCY"), True)
+    max_per_host_concurrency = _to_int(os.environ.get("MAX_PER_HOST_CONCURRENCY"), 16)
+    max_retry_after_seconds = _to_float(os.environ.get("MAX_RETRY_AFTER_SECONDS"), 120.0)
+
+    download_concurrency = _to_int(os.environ.get("DOWNLOAD_CONCURRENCY"), 8)
+    per_host_download_concurrency = _to_int(os.environ.get("PER_HOST_DOWNLOAD_CONCURRENCY"), 2)
+    download_queue_size = _to_int(os.environ.get("DOWNLOAD_QUEUE_SIZE"), 1000)
+    download_segments = _to_int(os.environ.get("DOWNLOAD_SEGMENTS"), 1)
+    segment_min_size_kb = _to_int(os.environ.get("SEGMENT_MIN_SIZE_KB"), 16384)
+    named_links = _to_bool(os.environ.get("NAMED_LINKS"), False)
+    head_preflight_hosts = os.environ.get("HEAD_PREFLIGHT_HOSTS", "")
+    disk_writer_threads = _to_int(os.environ.get("DISK_WRITER_THREADS"), 1)
+    disk_write_block_kb = _to_int(os.environ.get("DISK_WRITE_BLOCK_KB"), 1024)
+    disk_max_pending_mb = _to_int(os.environ.get("DISK_MAX_PENDING_MB"), 64)
+    fsync_downloads = _to_bool(os.environ.get("FSYNC_DOWNLOADS"), False)
+
     db_url = os.environ.get("DB_URL")
+    db_batch_size = _to_int(os.environ.get("DB_BATCH_SIZE"), 500)
+    db_flush_interval_seconds = _to_float(os.environ.get("DB_FLUSH_INTERVAL_SECONDS"), 1.0)
 
     enable_ai = _to_bool(os.environ.get("ENABLE_AI"), False)
     ai_model = os.environ.get("AI_MODEL", "gpt-4o-mini")
+    ai_concurrency = _to_int(os.environ.get("AI_CONCURRENCY"), 4)
+    ai_rate_per_second = _to_float(os.environ.get("AI_RATE_PER_SECOND"), 2.0)
+    ai_cache = _to_bool(os.environ.get("AI_CACHE"), True)
+
+    parse_executor = os.environ.get("PARSE_EXECUTOR", "inline").strip().lower()
+    parse_workers = _to_int(os.environ.get("PARSE_WORKERS"), 0)
+    parse_max_pending = _to_int(os.environ.get("PARSE_MAX_PENDING"), 0)
+    link_extractor = os.environ.get("LINK_EXTRACTOR", "bs4").strip().lower()
+
+    canonicalize_urls = _to_bool(os.environ.get("CANONICALIZE_URLS"), True)
+    strip_params = os.environ.get("STRIP_PARAMS", "")
+    canonical_rules = os.environ.get("CANONICAL_RULES", "")
+    seen_set = os.environ.get("SEEN_SET", "exact").strip().lower()
+    seen_capacity = _to_int(os.environ.get("SEEN_CAPACITY"), 0)
+    bloom_error_rate = _to_float(os.environ.get("BLOOM_ERROR_RATE"), 0.001)
+
+    checkpoint_interval_seconds = _to_float(os.environ.get("CHECKPOINT_INTERVAL_SECONDS"), 10.0)
+    distributed = _to_bool(os.environ.get("DISTRIBUTED"), False)
+    frontier_shards = _to_int(os.environ.get("FRONTIER_SHARDS"), 64)
+    lease_seconds = _to_float(os.environ.get("LEASE_SECONDS"), 60.0)
+    claim_batch_size = _to_int(os.environ.get("CLAIM_BATCH_SIZE"), 200)
+    claim_interval_seconds = _to_float(os.environ.get("CLAIM_INTERVAL_SECONDS"), 1.0)
+    warc_record = os.environ.get("WARC_RECORD", "")
+    warc_replay = os.environ.get("WARC_REPLAY", "")
+    http_cache = _to_bool(os.environ.get("HTTP_CACHE"), True)
+
+    http_pool_limit = _to_int(os.environ.get("HTTP_POOL_LIMIT"), 100)
+    http_pool_limit_per_host = _to_int(os.environ.get("HTTP_POOL_LIMIT_PER_HOST"), 32)
+    dns_cache_ttl_seconds = _to_int(os.environ.get("DNS_CACHE_TTL_SECONDS"), 300)
+    keepalive_timeout_seconds = _to_float(os.environ.get("KEEPALIVE_TIMEOUT_SECONDS"), 30.0)
+    local_resolver_cache = _to_bool(os.environ.get("LOCAL_RESOLVER_CACHE"), False)
 
     request_timeout_seconds = _to_int(os.environ.get("REQUEST_TIMEOUT_SECONDS"), 20)
     user_agent = os.environ.get(
@@ -73,25 +201,83 @@ def load_settings() -> Settings:
     )
 
     respect_robots = _to_bool(os.environ.get("RESPECT_ROBOTS"), True)
+    max_crawl_delay_seconds = _to_float(os.environ.get("MAX_CRAWL_DELAY_SECONDS"), 30.0)
+    use_sitemaps = _to_bool(os.environ.get("USE_SITEMAPS"), True)
+    sitemap_max_urls = _to_int(os.environ.get("SITEMAP_MAX_URLS"), 50000)
+    sitemap_max_files = _to_int(os.environ.get("SITEMAP_MAX_FILES"), 50)
     max_file_size_kb = _to_int(os.environ.get("MAX_FILE_SIZE_KB"), 51200)
+    sniff_content = _to_bool(os.environ.get("SNIFF_CONTENT"), True)
+    max_page_size_kb = _to_int(os.environ.get("MAX_PAGE_SIZE_KB"), 5120)
     max_retries = _to_int(os.environ.get("MAX_RETRIES"), 3)
     backoff_base_seconds = _to_float(os.environ.get("BACKOFF_BASE_SECONDS"), 0.5)
     allow_render_js = _to_bool(os.environ.get("ALLOW_RENDER_JS"), False)
 
+    max_concurrent_jobs = _to_int(os.environ.get("MAX_CONCURRENT_JOBS"), 2)
+
     return Settings(
         start_url=start_url,
         max_depth=max_depth,
         max_concurrency=max_concurrency,
         per_host_concurrency=per_host_concurrency,
         output_dir=output_dir,
+        adaptive_concurrency=adaptive_concurrency,
+        max_per_host_concurrency=max_per_host_concurrency,
+        max_retry_after_seconds=max_retry_after_seconds,
+        download_concurrency=download_concurrency,
+        per_host_download_concurrency=per_host_download_concurrency,
+        download_queue_size=download_queue_size,
+        download_segments=download_segments,
+        segment_min_size_kb=segment_min_size_kb,
+        named_links=named_links,
+        head_preflight_hosts=head_preflight_hosts,
+        disk_writer_threads=disk_writer_threads,
+        disk_write_block_kb=disk_write_block_kb,
+        disk_max_pending_mb=disk_max_pending_mb,
+        fsync_downloads=fsync_downloads,
         db_url=db_url,
+        db_batch_size=db_batch_size,
+        db_flush_interval_seconds=db_flush_interval_seconds,
         enable_ai=enable_ai,
         ai_model=ai_model,
+        ai_concurrency=ai_concurrency,
+        ai_rate_per_second=ai_rate_per_second,
+        ai_cache=ai_cache,
+        parse_executor=parse_executor,
+        parse_workers=parse_workers,
+        parse_max_pending=parse_max_pending,
+        link_extractor=link_extractor,
+        canonicalize_urls=canonicalize_urls,
+        strip_params=strip_params,
+        canonical_rules=canonical_rules,
+        seen_set=seen_set,
+        seen_capacity=seen_capacity,
+        bloom_error_rate=bloom_error_rate,
+        checkpoint_interval_seconds=checkpoint_interval_seconds,
+        distributed=distributed,
+        frontier_shards=frontier_shards,
+        lease_seconds=lease_seconds,
+        claim_batch_size=claim_batch_size,
+        claim_interval_seconds=claim_interval_seconds,
+        warc_record=warc_record,
+        warc_replay=warc_replay,
+        http_cache=http_cache,
+        http_pool_limit=http_pool_limit,
+        http_pool_limit_per_host=http_pool_limit_per_host,
+        dns_cache_ttl_seconds=dns_cache_ttl_seconds,
+        keepalive_timeout_seconds=keepalive_timeout_seconds,
+        local_resolver_cache=local_resolver_cache,
         request_timeout_seconds=request_timeout_seconds,
         user_agent=user_agent,
         respect_robots=respect_robots,
+        max_crawl_delay_seconds=max_crawl_delay_seconds,
+        use_sitemaps=use_sitemaps,
+        sitemap_max_urls=sitemap_max_urls,
+        sitemap_max_files=sitemap_max_files,
         max_file_size_kb=max_file_size_kb,
+        sniff_content=sniff_content,
+        max_page_size_kb=max_page_size_kb,
         max_retries=max_retries,
         backoff_base_seconds=backoff_base_seconds,
         allow_render_js=allow_render_js,
+        max_concurrent_jobs=max_concurrent_jobs,
     )
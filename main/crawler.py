@@ -1,20 +1,59 @@
 from __future__ import annotations
 
 import asyncio
+import time
+import weakref
 from collections import defaultdict, deque
-from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from functools import partial
 from datetime import datetime
 from pathlib import Path
-from typing import Deque, Dict, Optional, Set, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
 
 import aiohttp
+from sqlalchemy.engine import Engine
 
+from .canonical import Canonicalizer, load_canonicalizer
 from .config import Settings
-from .link_utils import extract_links
-from .file_detector import is_downloadable_url
-from .downloader import fetch_html, download_file
-from .ai_reasoner import combined_score
-from .db import AcquisitionRecord, init_db, insert_metadata, get_engine
+from .file_detector import VerdictCache, is_downloadable_url
+from .downloader import (
+    DownloadResult,
+    DownloadSkipped,
+    FileInstead,
+    PageFetch,
+    PageInstead,
+    fetch_page,
+    download_file,
+    parse_retry_after,
+    store_stream,
+)
+from .disk_writer import DiskWriter
+from .distributed import SharedFrontier
+from .host_control import THROTTLE_STATUSES, AdaptiveHostController
+from .http_cache import Validators, get_validators, put_validators
+from .http_pool import HttpPool
+from .page_analysis import PageAnalyzer
+from .ai_reasoner import AIScorer, blend_scores
+from .robots import RobotsCache
+from .seen import SeenSet, make_seen_set
+from .scheduler import HostScheduler, HostSlots, Lease
+from .sitemap import SITEMAP, iter_sitemap, lastmod_priority
+from .frontier import FILE, PAGE, FrontierEntry, FrontierStore, create_run, load_frontier, set_run_status
+from .db import AcquisitionRecord, MetadataSink, init_db, get_engine
+from .metrics import ERRORS, PHASE_SECONDS, error_kind, registry
+from .warc import RecordingSession, ReplaySession, WarcArchive, WarcWriter
+
+
+# crawler_in_flight stage -> the stat it reports
+IN_FLIGHT_STATS = (
+    ("fetch", "pages_in_flight"),
+    ("parse", "parse_in_flight"),
+    ("download", "downloads_in_flight"),
+    ("db", "db_pending"),
+    ("disk", "disk_pending_blocks"),
+)
 
 
 @dataclass
@@ -22,77 +61,757 @@ class QueueItem:
     url: str
     depth: int
     priority: float
+    retries: int = 0
 
 
-class Crawler:
+def make_host_controller(settings: Settings, initial_limit: int) -> AdaptiveHostController:
+    return AdaptiveHostController(
+        initial_limit=initial_limit,
+        max_limit=settings.max_per_host_concurrency,
+        max_backoff_seconds=settings.max_retry_after_seconds,
+        adaptive=settings.adaptive_concurrency,
+    )
+
+
+# Per-host state that crawlers running in one process share (see jobs.JobManager): adaptive limits
+# and backoff, in-flight slots, robots.txt and Crawl-delay, so concurrent jobs on the same portal
+# are together as polite as a single crawl. A standalone crawler builds a private one. It also
+# serializes transfers of the same URL, whose resume state lives in one shared .parts file.
+class HostPoliteness:
     def __init__(self, settings: Settings) -> None:
+        self.page_control = make_host_controller(settings, settings.per_host_concurrency)
+        self.download_control = make_host_controller(settings, settings.per_host_download_concurrency)
+        self.page_slots = HostSlots(self.page_control.limit_for)
+        self.download_slots = HostSlots(self.download_control.limit_for)
+        self.robots = RobotsCache(settings.user_agent, settings.request_timeout_seconds)
+        self.max_crawl_delay_seconds = settings.max_crawl_delay_seconds
+        self.crawl_delays: Dict[str, float] = {}
+        self._schedulers: "weakref.WeakSet[HostScheduler[Any]]" = weakref.WeakSet()
+        self._transfers: Dict[str, Tuple[asyncio.Lock, int]] = {}  # url -> (lock, holders and waiters)
+
+    def attach(self, *schedulers: HostScheduler[Any]) -> None:
+        self._schedulers.update(schedulers)
+
+    def crawl_delay(self, host: str, requested: float) -> float:
+        delay = self.crawl_delays[host] = min(requested, self.max_crawl_delay_seconds)
+        return delay
+
+    def space(self, host: str, source: HostScheduler[Any]) -> None:
+        # Crawl-delay covers every request to the host: a dispatch by one scheduler holds back the others
+        delay = self.crawl_delays.get(host)
+        if delay:
+            for scheduler in list(self._schedulers):
+                if scheduler is not source:
+                    scheduler.delay_host(host, delay)
+
+    @asynccontextmanager
+    async def transfer(self, url: str) -> AsyncIterator[None]:
+        lock, users = self._transfers.get(url) or (asyncio.Lock(), 0)
+        self._transfers[url] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._transfers[url]
+            if users > 1:
+                self._transfers[url] = (lock, users - 1)
+            else:
+                del self._transfers[url]
+
+    def close(self) -> None:
+        self.robots.close()
+
+
+class Crawler:
+    def __init__(
+        self,
+        settings: Settings,
+        pool: Optional[HttpPool] = None,
+        politeness: Optional[HostPoliteness] = None,
+        register_metrics: bool = True,
+        engine: Optional[Engine] = None,
+    ) -> None:
         self.settings = settings
-        self.visited_pages: Set[str] = set()
-        self.engine = get_engine()
-        init_db(self.engine)
-        self._queue: asyncio.PriorityQueue[Tuple[float, QueueItem]] = asyncio.PriorityQueue()
-        self._host_semaphores: Dict[str, asyncio.Semaphore] = defaultdict(
-            lambda: asyncio.Semaphore(self.settings.per_host_concurrency)
+        # A pool passed in is shared (web UI); otherwise the crawler owns one for the length of run()
+        self.pool = pool or HttpPool(settings)
+        self._owns_pool = pool is None
+        # Marked on enqueue, not on fetch, so a URL linked from many pages is queued once
+        self.seen: SeenSet = make_seen_set(
+            self.settings.seen_set,
+            capacity=self.settings.seen_capacity,
+            error_rate=self.settings.bloom_error_rate,
+        )
+        # Links are rewritten to a canonical form, and the seen-set stores a looser dedupe key
+        self._canonical: Optional[Canonicalizer] = None
+        if self.settings.canonicalize_urls:
+            self._canonical = load_canonicalizer(self.settings.canonical_rules, self.settings.strip_params)
+        # Likewise the engine: a shared one (web service) is already initialised and stays open
+        self._owns_engine = engine is None
+        if engine is None:
+            engine = get_engine()
+            init_db(engine)
+        self.engine = engine
+        self._politeness = politeness or HostPoliteness(settings)
+        self._owns_politeness = politeness is None
+        # Per-host limits start at the configured values and adapt to latency and 429/503s
+        self._page_control = self._politeness.page_control
+        self._download_control = self._politeness.download_control
+        # Per-host scheduling: workers are only handed URLs whose host has a free slot
+        self._queue: HostScheduler[QueueItem] = HostScheduler(
+            self._page_control.limit_for,
+            slots=self._politeness.page_slots,
+        )
+        # Download stage: own queue, workers and per-host limits so page workers never wait on transfers
+        self._download_queue: HostScheduler[QueueItem] = HostScheduler(
+            self._download_control.limit_for,
+            maxsize=self.settings.download_queue_size,
+            slots=self._politeness.download_slots,
+        )
+        self._politeness.attach(self._queue, self._download_queue)
+        # Removed again at the end of run(): the controllers may outlive this crawler
+        self._listeners = [
+            (self._page_control, self._host_listener(self._queue)),
+            (self._download_control, self._host_listener(self._download_queue)),
+        ]
+        for control, listener in self._listeners:
+            control.listeners.append(listener)
+        self._register_metrics = register_metrics
+        self._sink = MetadataSink(
+            self.engine,
+            batch_size=self.settings.db_batch_size,
+            flush_interval_seconds=self.settings.db_flush_interval_seconds,
         )
-        self._stats: Dict[str, int] = defaultdict(int)  # fetched_pages, downloaded_files, errors
+        self._analyzer = PageAnalyzer(
+            self.settings.parse_executor,
+            workers=self.settings.parse_workers,
+            max_pending=self.settings.parse_max_pending,
+            link_extractor=self.settings.link_extractor,
+        )
+        self._writer: Optional[DiskWriter] = None
+        if self.settings.disk_writer_threads > 0:
+            self._writer = DiskWriter(
+                threads=self.settings.disk_writer_threads,
+                block_size_kb=self.settings.disk_write_block_kb,
+                max_pending_mb=self.settings.disk_max_pending_mb,
+                fsync=self.settings.fsync_downloads,
+            )
+        self._ai: Optional[AIScorer] = None
+        if self.settings.enable_ai:
+            self._ai = AIScorer(
+                self.settings.ai_model,
+                engine=self.engine,
+                concurrency=self.settings.ai_concurrency,
+                rate_per_second=self.settings.ai_rate_per_second,
+                persistent_cache=self.settings.ai_cache,
+            )
+        self.run_id: Optional[int] = None
+        self._frontier: Optional[FrontierStore] = None
+        # Distributed runs: the frontier lives in the database and is shared with the run's other workers
+        self._shared: Optional[SharedFrontier] = None
+        self._seeding = False
+        self._checkpoint_task: Optional[asyncio.Task[None]] = None
+        self._stats: Dict[str, int] = defaultdict(int)  # fetched_pages, downloaded_files, errors, ...
+        self._warc: Optional[WarcWriter] = None
+        self._archive: Optional[WarcArchive] = None
+        # robots.txt is fetched once per origin; replays skip it, the archive only holds what was allowed
+        self._robots: Optional[RobotsCache] = None
+        if self.settings.respect_robots and not self.settings.warc_replay:
+            self._robots = self._politeness.robots
+        self._spaced_hosts: Set[str] = set()
+        # Responses are classified from Content-Type plus their first bytes and can switch pipelines
+        # mid-stream; the verdicts, kept per URL shape, route later links before they are requested
+        self._verdicts: Optional[VerdictCache] = VerdictCache() if self.settings.sniff_content else None
+        self._head_hosts = [h.strip().lower() for h in self.settings.head_preflight_hosts.split(",") if h.strip()]
+
+    def _error(self, stage: str, error: Optional[BaseException] = None, status: Optional[int] = None) -> None:
+        self._stats["errors"] += 1
+        ERRORS.inc(stage, error_kind(error, status))
+
+    def _gauges(self) -> Dict[str, Dict[Tuple[str, ...], float]]:
+        # Read by metrics.registry at scrape time while this crawler is running
+        stats = self.stats
+        return {
+            "crawler_frontier_depth": {
+                ("pages",): stats["pages_queued"],
+                ("downloads",): stats["downloads_queued"],
+            },
+            "crawler_in_flight": {(stage,): stats.get(stat, 0) for stage, stat in IN_FLIGHT_STATS},
+            "crawler_stat": {(name,): value for name, value in stats.items()},
+        }
+
+    def _wants_head(self, host: str) -> bool:
+        host = host.lower()
+        for pattern in self._head_hosts:
+            if pattern == "*" or host == pattern or (pattern.startswith(".") and host.endswith(pattern)):
+                return True
+        return False
+
+    def _host_listener(self, own: HostScheduler[QueueItem]) -> Callable[[str, float], None]:
+        def listener(host: str, delay: float) -> None:
+            own.refresh(host)
+            if delay > 0:
+                # Retry-After and backoff apply to the whole host, not just the stage that saw them
+                self._queue.refresh(host, delay)
+                self._download_queue.refresh(host, delay)
+
+        return listener
+
+    def host_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for stage, control, scheduler in (
+            ("pages", self._page_control, self._queue),
+            ("downloads", self._download_control, self._download_queue),
+        ):
+            snapshot = control.snapshot()
+            for host, values in snapshot.items():
+                queued, active, _ = scheduler.host_state(host)
+                values["queued"] = queued
+                values["active"] = active
+            result[stage] = snapshot
+        return result
 
     @property
-    def stats(self) -> Dict[str, int]:
-        return dict(self._stats)
+    def stats(self) -> Dict[str, float]:
+        stats: Dict[str, float] = dict(self._stats)
+        stats["pages_queued"] = self._queue.qsize()
+        stats["downloads_queued"] = self._download_queue.qsize()
+        stats["page_hosts"] = self._queue.hosts
+        stats["download_hosts"] = self._download_queue.hosts
+        stats["parse_in_flight"] = self._analyzer.in_flight
+        if self._ai is not None:
+            stats["ai_calls"] = self._ai.calls
+            stats["ai_cache_hits"] = self._ai.cache_hits
+            stats["ai_failures"] = self._ai.failures
+        stats["seen_urls"] = len(self.seen)
+        stats["seen_memory_bytes"] = self.seen.memory_bytes
+        stats["seen_bytes_per_url"] = round(self.seen.memory_bytes / max(1, len(self.seen)), 2)
+        if self._frontier is not None:
+            stats["frontier_persisted"] = self._frontier.persisted
+            stats["frontier_dirty"] = self._frontier.dirty
+        if self._shared is not None:
+            stats["frontier_claimed"] = self._shared.claimed
+            stats["frontier_reclaimed"] = self._shared.reclaimed
+            stats["frontier_shards_owned"] = len(self._shared.owned)
+            stats["frontier_workers"] = self._shared.workers
+        stats.update(self.pool.stats())
+        if self._writer is not None:
+            stats["disk_pending_blocks"] = self._writer.pending_blocks
+            stats["disk_bytes_written"] = self._writer.bytes_written
+            stats["disk_fsyncs"] = self._writer.fsyncs
+        if self._warc is not None:
+            stats["warc_records"] = self._warc.records
+            stats["warc_errors"] = self._warc.errors
+        if self._archive is not None:
+            stats["warc_replay_misses"] = self._archive.misses
+        if self._verdicts is not None:
+            stats["verdict_shapes"] = self._verdicts.shapes
+        if self._robots is not None:
+            stats["robots_fetched"] = self._robots.fetched
+            stats["robots_errors"] = self._robots.errors
+        stats["db_pending"] = self._sink.pending
+        stats["db_written"] = self._sink.written
+        stats["db_failed"] = self._sink.failed
+        return stats
 
-    async def run(self, start_url: str) -> None:
+    async def run(self, start_url: str, resume_run_id: Optional[int] = None) -> None:
         headers = {"User-Agent": self.settings.user_agent}
         timeout = aiohttp.ClientTimeout(total=self.settings.request_timeout_seconds)
-        connector = aiohttp.TCPConnector(limit=None)
-        async with aiohttp.ClientSession(headers=headers, timeout=timeout, connector=connector) as session:
-            await self._submit(QueueItem(url=start_url, depth=0, priority=0.0))
-            workers = [asyncio.create_task(self._worker(session)) for _ in range(self.settings.max_concurrency)]
+        self._sink.start()
+        if self._register_metrics:
+            registry.register_collector("crawler", self._gauges)
+        completed = False
+        try:
+            pending = await self._open_run(start_url, resume_run_id)
+            async with self.pool.session(headers=headers, timeout=timeout) as session:
+                await self._crawl(await self._wrap_session(session), start_url if resume_run_id is None else None, pending)
+            completed = True
+        finally:
+            self._analyzer.close()
+            for control, listener in self._listeners:
+                control.listeners.remove(listener)
+            if self._owns_politeness:
+                self._politeness.close()
+            if self._ai is not None:
+                await self._ai.aclose()
+            if self._owns_pool:
+                await self.pool.close()
+            if self._writer is not None:
+                await self._writer.aclose()
+            if self._warc is not None:
+                await asyncio.to_thread(self._warc.close)
+            await asyncio.shield(self._close_run(completed))
+            # The flush runs on the sink thread, so it completes even if this task is cancelled again
+            await asyncio.shield(asyncio.to_thread(self._sink.close))
+            if self._owns_engine:
+                self.engine.dispose()
+            if self._register_metrics:
+                registry.unregister_collector("crawler")
+
+    async def _wrap_session(self, session: aiohttp.ClientSession) -> Any:
+        # Replay serves every request from the archive; recording tees the live session into one
+        if self.settings.warc_replay:
+            self._archive = await asyncio.to_thread(WarcArchive, Path(self.settings.warc_replay))
+            return ReplaySession(self._archive)
+        if self.settings.warc_record:
+            self._warc = await asyncio.to_thread(WarcWriter, Path(self.settings.warc_record))
+            return RecordingSession(session, self._warc)
+        return session
+
+    async def _open_run(self, start_url: str, resume_run_id: Optional[int]) -> List[FrontierEntry]:
+        # Returns the entries a resumed run still has to process; a new run starts empty
+        if self.settings.distributed:
+            return await self._open_shared_run(start_url, resume_run_id)
+        pending: List[FrontierEntry] = []
+        if resume_run_id is None:
+            self.run_id = await asyncio.to_thread(create_run, start_url, self.settings, self.engine)
+        else:
+            self.run_id = resume_run_id
+            seen, pending = await asyncio.to_thread(load_frontier, resume_run_id, self.engine)
+            for url in seen:
+                self.seen.add(self._seen_key(url))
+            await asyncio.to_thread(set_run_status, resume_run_id, "running", self.engine)
+        if self.settings.checkpoint_interval_seconds > 0:
+            self._frontier = FrontierStore(self.engine, self.run_id, shards=self.settings.frontier_shards)
+        return pending
+
+    async def _open_shared_run(self, start_url: str, resume_run_id: Optional[int]) -> List[FrontierEntry]:
+        # Joining a run (resume_run_id) loads nothing: URLs are claimed from the database as workers need them
+        if resume_run_id is None:
+            self.run_id = await asyncio.to_thread(create_run, start_url, self.settings, self.engine)
+        else:
+            self.run_id = resume_run_id
+            await asyncio.to_thread(set_run_status, resume_run_id, "running", self.engine)
+        self._shared = SharedFrontier(
+            self.engine, self.run_id, self.settings.frontier_shards, lease_seconds=self.settings.lease_seconds
+        )
+        await asyncio.to_thread(self._shared.open)
+        self._frontier = FrontierStore(self.engine, self.run_id, shards=self.settings.frontier_shards)
+        return []
+
+    async def _close_run(self, completed: bool) -> None:
+        if self._checkpoint_task is not None:
+            self._checkpoint_task.cancel()
+            await asyncio.gather(self._checkpoint_task, return_exceptions=True)
+        await self._checkpoint()
+        if self._shared is not None:
+            try:
+                await asyncio.to_thread(self._shared.close)
+                if not completed and await asyncio.to_thread(self._shared.others_alive):
+                    return  # the run goes on in the other workers
+            except Exception as e:
+                self._error("frontier", e)
+        if self.run_id is not None:
+            try:
+                await asyncio.to_thread(
+                    set_run_status, self.run_id, "completed" if completed else "interrupted", self.engine
+                )
+            except Exception as e:
+                self._error("checkpoint", e)
+
+    async def _checkpoint(self) -> None:
+        if self._frontier is None:
+            return
+        batch = self._frontier.take()
+        if not batch:
+            return
+        try:
+            with PHASE_SECONDS.time("checkpoint"):
+                await asyncio.to_thread(self._frontier.write, batch)
+        except Exception as e:
+            self._frontier.restore(batch)
+            self._stats["checkpoint_errors"] += 1
+            ERRORS.inc("checkpoint", error_kind(e))
+
+    async def _checkpoint_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.checkpoint_interval_seconds)
+            await self._checkpoint()
+
+    async def _claim_loop(self) -> None:
+        # Distributed runs: publish discovered links and finished URLs, keep this worker's shard and URL
+        # leases alive and top up the local queues. Returns once no URL of the run is left in any worker.
+        shared = self._shared
+        while True:
+            await self._checkpoint()
+            backlog = self._queue.qsize() + self._download_queue.qsize()
+            limit = max(0, self.settings.claim_batch_size - backlog)
+            try:
+                entries = await asyncio.to_thread(shared.sync, dict(shared.outstanding), limit)
+            except Exception as e:
+                self._error("frontier", e)
+                entries = []
+            for entry in entries:
+                self.seen.add(self._seen_key(entry.url))
+                shared.hold(entry.url)
+                item = QueueItem(url=entry.url, depth=entry.depth, priority=entry.priority)
+                if entry.kind == FILE:
+                    # Bounded by the claim size rather than the download queue size
+                    self._download_queue.put_nowait(urlsplit(item.url).netloc, item, item.priority)
+                else:
+                    self._enqueue_page(item)
+            idle = not entries and backlog == 0 and not shared.outstanding and not self._seeding
+            if idle and self._frontier.dirty == 0:
+                try:
+                    if await asyncio.to_thread(shared.remaining) == 0:
+                        return
+                except Exception as e:
+                    self._error("frontier", e)
+            await asyncio.sleep(self.settings.claim_interval_seconds)
+
+    async def _crawl(
+        self,
+        session: aiohttp.ClientSession,
+        start_url: Optional[str],
+        pending: List[FrontierEntry],
+    ) -> None:
+        workers = [asyncio.create_task(self._worker(session)) for _ in range(self.settings.max_concurrency)]
+        download_workers = [
+            asyncio.create_task(self._download_worker(session))
+            for _ in range(max(1, self.settings.download_concurrency))
+        ]
+        claims: Optional[asyncio.Task[None]] = None
+        if self._shared is not None:
+            claims = asyncio.create_task(self._claim_loop())
+        elif self._frontier is not None:
+            self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
+        try:
+            # Workers are already running, so seeding a large resumed frontier cannot stall on the bounded queue
+            for entry in pending:
+                item = QueueItem(url=entry.url, depth=entry.depth, priority=entry.priority)
+                if entry.kind == FILE:
+                    await self._enqueue_download(item)
+                else:
+                    self._enqueue_page(item)
+            if start_url is not None:
+                start_url = self._canonical_url(start_url)
+                await self._submit(QueueItem(url=start_url, depth=0, priority=0.0))
+                if self.settings.use_sitemaps:
+                    # Seeds while the start page is crawled; must finish before the queues can be joined
+                    self._seeding = True
+                    try:
+                        await self._seed_from_sitemaps(session, start_url)
+                    finally:
+                        self._seeding = False
+            if claims is not None:
+                await claims
+            # Pages feed downloads, never the reverse: once the page queue drains no new files can appear
             await self._queue.join()
-            for w in workers:
-                w.cancel()
-            await asyncio.gather(*workers, return_exceptions=True)
+            await self._download_queue.join()
+        finally:
+            tasks = workers + download_workers + ([claims] if claims is not None else [])
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _seed_from_sitemaps(self, session: aiohttp.ClientSession, start_url: str) -> None:
+        parts = urlsplit(start_url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        # Sitemap lines are read even when the rules are not enforced (or the crawl is a replay)
+        robots = self._robots or RobotsCache(self.settings.user_agent, self.settings.request_timeout_seconds)
+        try:
+            listed = list((await robots.get(session, start_url)).sitemaps)
+        finally:
+            if robots is not self._robots:
+                robots.close()
+        guessed = "" if listed else f"{origin}/sitemap.xml"
+        pending = deque(listed or [guessed])
+        read: Set[str] = set()
+        urls = 0
+        while pending and urls < self.settings.sitemap_max_urls and len(read) < self.settings.sitemap_max_files:
+            sitemap_url = pending.popleft()
+            if sitemap_url in read:
+                continue
+            read.add(sitemap_url)
+            try:
+                async for entry in iter_sitemap(
+                    session, sitemap_url, self.settings.request_timeout_seconds, max_bytes=50 * 1024 * 1024
+                ):
+                    if entry.kind == SITEMAP:
+                        pending.append(entry.url)
+                        continue
+                    url, key = entry.url, None
+                    if self._canonical is not None:
+                        url, key = self._canonical.canonicalize_with_key(url)
+                    if urlsplit(url).netloc != parts.netloc:
+                        continue  # a sitemap may only list URLs of its own host
+                    urls += 1
+                    # Listed pages count as one hop from the start page
+                    item = QueueItem(url=url, depth=1, priority=lastmod_priority(entry.lastmod))
+                    if self._is_file_link(url):
+                        await self._submit_download(item, key)
+                    elif self.settings.max_depth >= 1:
+                        await self._submit(item, key)
+                    if urls >= self.settings.sitemap_max_urls:
+                        break
+                self._stats["sitemap_files"] += 1
+            except Exception as e:
+                # A guessed /sitemap.xml that does not exist is normal, not an error
+                if sitemap_url != guessed:
+                    self._error("sitemap", e, e.status if isinstance(e, aiohttp.ClientResponseError) else None)
+        self._stats["sitemap_urls"] += urls
+
+    async def _robots_allows(self, session: aiohttp.ClientSession, url: str) -> bool:
+        if self._robots is None:
+            return True
+        rules = await self._robots.get(session, url)
+        host = urlsplit(url).netloc
+        if rules.crawl_delay and host not in self._spaced_hosts:
+            self._spaced_hosts.add(host)
+            delay = self._politeness.crawl_delay(host, rules.crawl_delay)
+            self._queue.set_interval(host, delay)
+            self._download_queue.set_interval(host, delay)
+        if rules.allowed(url):
+            return True
+        self._stats["robots_blocked"] += 1
+        return False
+
+    def _is_file_link(self, url: str) -> bool:
+        guess = is_downloadable_url(url)
+        verdict = self._verdicts.get(url) if self._verdicts is not None else None
+        if verdict is None:
+            return guess
+        if (verdict == FILE) != guess:
+            self._stats["routed_by_verdict"] += 1
+        return verdict == FILE
+
+    def _verdict(self, url: str, kind: str) -> None:
+        if self._verdicts is not None:
+            self._verdicts.put(url, kind)
+
+    def _canonical_url(self, url: str) -> str:
+        return self._canonical.canonicalize(url) if self._canonical is not None else url
+
+    def _seen_key(self, url: str) -> str:
+        return self._canonical.key(url) if self._canonical is not None else url
+
+    async def _submit(self, item: QueueItem, key: Optional[str] = None) -> None:
+        if not self.seen.add(key or self._seen_key(item.url)):
+            self._stats["duplicate_page_links"] += 1
+            return
+        self._record(item, PAGE)
+        if self._shared is None:
+            self._enqueue_page(item)
+
+    async def _submit_download(self, item: QueueItem, key: Optional[str] = None) -> None:
+        # The same file is often linked from every page of a listing; fetch it once per run
+        if not self.seen.add(key or self._seen_key(item.url)):
+            self._stats["duplicate_file_links"] += 1
+            return
+        self._record(item, FILE)
+        if self._shared is None:
+            await self._enqueue_download(item)
+
+    def _enqueue_page(self, item: QueueItem) -> None:
+        self._queue.put_nowait(urlsplit(item.url).netloc, item, item.priority)
 
-    async def _submit(self, item: QueueItem) -> None:
-        await self._queue.put((-item.priority, item))
+    async def _enqueue_download(self, item: QueueItem) -> None:
+        # Only blocks when the download backlog is full, which throttles discovery to transfer speed
+        await self._download_queue.put(urlsplit(item.url).netloc, item, item.priority)
+
+    def _record(self, item: QueueItem, kind: str) -> None:
+        if self._frontier is not None:
+            self._frontier.add(FrontierEntry(url=item.url, kind=kind, depth=item.depth, priority=item.priority))
+
+    def _mark_done(self, item: QueueItem, kind: str) -> None:
+        if self._frontier is not None:
+            self._frontier.mark_done(item.url, kind)
+        if self._shared is not None:
+            self._shared.settle(item.url)
+
+    async def _load_validators(self, url: str) -> Optional[Validators]:
+        if not self.settings.http_cache:
+            return None
+        try:
+            return await asyncio.to_thread(get_validators, url, self.engine)
+        except Exception as e:
+            self._stats["http_cache_errors"] += 1
+            ERRORS.inc("http_cache", error_kind(e))
+            return None
+
+    async def _store_validators(self, validators: Validators) -> None:
+        if not self.settings.http_cache:
+            return
+        try:
+            await asyncio.to_thread(put_validators, validators, self.engine)
+        except Exception as e:
+            self._stats["http_cache_errors"] += 1
+            ERRORS.inc("http_cache", error_kind(e))
 
     async def _worker(self, session: aiohttp.ClientSession) -> None:
         while True:
             try:
-                _, item = await self._queue.get()
-                await self._process_item(session, item)
+                lease = await self._queue.get()
             except asyncio.CancelledError:
                 break
-            except Exception:
-                self._stats["errors"] += 1
+            self._politeness.space(lease.host, self._queue)
+            item = lease.item
+            self._stats["pages_in_flight"] += 1
+            try:
+                if await self._process_item(session, lease):
+                    self._mark_done(item, PAGE)
+            except asyncio.CancelledError:
+                # Left pending in the persisted frontier so a resume picks it up again
+                break
+            except Exception as e:
+                self._error("page", e)
+                self._mark_done(item, PAGE)
             finally:
+                lease.release()
+                self._stats["pages_in_flight"] -= 1
                 self._queue.task_done()
 
-    async def _process_item(self, session: aiohttp.ClientSession, item: QueueItem) -> None:
-        if item.url in self.visited_pages:
-            return
-        self.visited_pages.add(item.url)
+    async def _download_worker(self, session: aiohttp.ClientSession) -> None:
+        while True:
+            try:
+                lease = await self._download_queue.get()
+            except asyncio.CancelledError:
+                break
+            self._politeness.space(lease.host, self._download_queue)
+            item = lease.item
+            self._stats["downloads_in_flight"] += 1
+            try:
+                await self._download_and_log(session, item.url, item.depth, self.settings.output_dir)
+                self._mark_done(item, FILE)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self._error("download", e)
+                self._mark_done(item, FILE)
+            finally:
+                lease.release()
+                self._stats["downloads_in_flight"] -= 1
+                self._download_queue.task_done()
 
-        # Per-host throttle
-        from urllib.parse import urlsplit
+    async def _process_item(self, session: aiohttp.ClientSession, lease: Lease[QueueItem]) -> bool:
+        # False when the page went back on the queue for another attempt
+        item = lease.item
+        if not await self._robots_allows(session, item.url):
+            return True
+        cached = await self._load_validators(item.url)
+        if cached is not None and cached.links is None:
+            cached = None  # nothing to reuse on a 304, so ask for the full page
+        # Streaming parses while the body arrives, so only a bounded prefix of each page is held in memory
+        stream = self._analyzer.stream(item.url) if self._analyzer.streams else None
+        started = time.monotonic()
+        try:
+            page = await fetch_page(
+                session,
+                item.url,
+                self.settings.request_timeout_seconds,
+                etag=cached.etag if cached is not None else None,
+                last_modified=cached.last_modified if cached is not None else None,
+                max_bytes=self.settings.max_page_size_kb * 1024,
+                stream=stream,
+                divert=self._divert if self._verdicts is not None else None,
+            )
+            elapsed = time.monotonic() - started
+            self._page_control.on_success(lease.host, elapsed)
+            PHASE_SECONDS.observe(elapsed, "fetch")
+            self._stats["fetched_pages"] += 1
+            if page.truncated:
+                self._stats["truncated_pages"] += 1
+        except FileInstead as e:
+            # Stored from the same response; no second request through the download queue
+            self._page_control.on_success(lease.host, time.monotonic() - started)
+            self._stats["rerouted_to_download"] += 1
+            self._verdict(item.url, FILE)
+            await self._log_download(item.url, item.depth, self.settings.output_dir, e.result)
+            return True
+        except DownloadSkipped:
+            # Not HTML, or too large to be a page: the server answered fine, so this is not a host error
+            self._page_control.on_success(lease.host, time.monotonic() - started)
+            self._stats["skipped_pages"] += 1
+            return True
+        except aiohttp.ClientResponseError as e:
+            retry_after = parse_retry_after(e.headers.get("Retry-After")) if e.headers else None
+            self._page_control.observe(lease.host, e.status, time.monotonic() - started, retry_after)
+            if e.status in THROTTLE_STATUSES and self._retry_page(item):
+                return False
+            self._error("fetch", e, e.status)
+            return True
+        except asyncio.TimeoutError as e:
+            self._page_control.observe(lease.host, None, time.monotonic() - started, None)
+            if self._retry_page(item):
+                return False
+            self._error("fetch", e)
+            return True
+        except Exception as e:
+            self._page_control.on_error(lease.host)
+            self._error("fetch", e)
+            return True
+        finally:
+            # The host slot only covers the fetch; parsing and scoring don't load the server
+            lease.release()
+        if not page.not_modified:
+            self._verdict(item.url, PAGE)
+        await self._handle_page(item, page, cached, stream)
+        return True
 
-        host = urlsplit(item.url).netloc
-        host_sem = self._host_semaphores[host]
-        async with host_sem:
-            try:
-                html = await fetch_html(session, item.url, self.settings.request_timeout_seconds)
-                self._stats["fetched_pages"] += 1
-            except Exception:
-                self._stats["errors"] += 1
-                return
+    def _retry_page(self, item: QueueItem) -> bool:
+        # Throttled and timed-out pages go back behind the host's backoff delay, up to max_retries times;
+        # the frontier entry (and in distributed runs the URL lease) stays open meanwhile
+        if item.retries >= self.settings.max_retries:
+            return False
+        self._stats["retried_pages"] += 1
+        self._enqueue_page(replace(item, retries=item.retries + 1))
+        return True
 
-        score = combined_score(html, item.url, self.settings.enable_ai, self.settings.ai_model)
-        links = extract_links(html, item.url)
+    async def _divert(self, url: str, resp: aiohttp.ClientResponse, body: AsyncIterator[bytes]) -> DownloadResult:
+        async with self._politeness.transfer(url):
+            return await store_stream(
+                url,
+                resp,
+                body,
+                self.settings.output_dir,
+                max_file_size_kb=self.settings.max_file_size_kb,
+                named_links=self.settings.named_links,
+                writer=self._writer,
+            )
+
+    async def _handle_page(
+        self,
+        item: QueueItem,
+        page: PageFetch,
+        cached: Optional[Validators],
+        stream: Any,
+    ) -> None:
+        if cached is not None and (page.not_modified or page.content_hash == cached.content_hash):
+            # Same content as the last crawl: reuse its links and score instead of parsing and scoring again
+            links, score = cached.links or [], cached.score or 0.0
+            self._stats["unchanged_pages"] += 1
+            if (page.etag, page.last_modified) != (cached.etag, cached.last_modified):
+                cached.etag, cached.last_modified = page.etag, page.last_modified
+                await self._store_validators(cached)
+        else:
+            with PHASE_SECONDS.time("parse"):
+                if stream is not None:
+                    links, score, html = stream.finish()
+                else:
+                    html = page.html or ""
+                    links, score = await self._analyzer.analyze(html, item.url)
+            if self._ai is not None:
+                with PHASE_SECONDS.time("score"):
+                    score = blend_scores(score, await self._ai.score(html))
+            await self._store_validators(
+                Validators(
+                    url=item.url,
+                    kind=PAGE,
+                    etag=page.etag,
+                    last_modified=page.last_modified,
+                    content_hash=page.content_hash,
+                    links=links,
+                    score=score,
+                )
+            )
 
         for href in links:
-            if is_downloadable_url(href):
-                await self._download_and_log(session, href, item.depth + 1, self.settings.output_dir)
-            elif item.depth + 1 <= self.settings.max_depth and href not in self.visited_pages:
-                await self._submit(QueueItem(url=href, depth=item.depth + 1, priority=score))
+            key: Optional[str] = None
+            if self._canonical is not None:
+                href, key = self._canonical.canonicalize_with_key(href)
+            if self._is_file_link(href):
+                await self._submit_download(QueueItem(url=href, depth=item.depth + 1, priority=score), key)
+            elif item.depth + 1 <= self.settings.max_depth:
+                await self._submit(QueueItem(url=href, depth=item.depth + 1, priority=score), key)
 
     async def _download_and_log(
         self,
@@ -101,27 +820,105 @@ class Crawler:
         depth: int,
         output_dir: Path,
     ) -> None:
+        if not await self._robots_allows(session, url):
+            return
+        cached = await self._load_validators(url)
+        if cached is not None and not (cached.file_name and (output_dir / cached.file_name).exists()):
+            cached = None  # the earlier copy is gone, so the body is needed again
+        started = time.monotonic()
         try:
-            dest, content_type, size_kb = await download_file(
-                session,
-                url,
-                output_dir,
-                self.settings.request_timeout_seconds,
-                max_file_size_kb=self.settings.max_file_size_kb,
-                max_retries=self.settings.max_retries,
-                backoff_base_seconds=self.settings.backoff_base_seconds,
+            async with self._politeness.transfer(url):
+                result = await download_file(
+                    session,
+                    url,
+                    output_dir,
+                    self.settings.request_timeout_seconds,
+                    max_file_size_kb=self.settings.max_file_size_kb,
+                    max_retries=self.settings.max_retries,
+                    backoff_base_seconds=self.settings.backoff_base_seconds,
+                    observer=partial(self._download_control.observe, urlsplit(url).netloc),
+                    max_retry_after_seconds=self.settings.max_retry_after_seconds,
+                    etag=cached.etag if cached is not None else None,
+                    last_modified=cached.last_modified if cached is not None else None,
+                    segments=self.settings.download_segments,
+                    segment_min_size_kb=self.settings.segment_min_size_kb,
+                    named_links=self.settings.named_links,
+                    head_preflight=self._wants_head(urlsplit(url).hostname or ""),
+                    writer=self._writer,
+                    page_max_bytes=self.settings.max_page_size_kb * 1024 if self._verdicts is not None else 0,
+                )
+        except PageInstead as e:
+            # An HTML page behind a file link (landing page, extension-less URL): parse it instead
+            self._stats["rerouted_to_page"] += 1
+            self._verdict(url, PAGE)
+            if depth <= self.settings.max_depth:
+                self._stats["fetched_pages"] += 1
+                await self._handle_page(QueueItem(url=url, depth=depth, priority=0.0), e.page, None, None)
+            return
+        except DownloadSkipped:
+            self._stats["skipped_files"] += 1
+            return
+        except Exception as e:
+            self._error("download", e, e.status if isinstance(e, aiohttp.ClientResponseError) else None)
+            self._stats["download_errors"] += 1
+            return
+        finally:
+            PHASE_SECONDS.observe(time.monotonic() - started, "download")
+        if cached is not None and (result.not_modified or result.sha256 == cached.content_hash):
+            await self._log_unchanged(url, depth, cached, result)
+            return
+        if result.path is None:
+            # 304 to a request that carried no validators: nothing was stored
+            self._stats["download_errors"] += 1
+            return
+        self._verdict(url, FILE)
+        await self._log_download(url, depth, output_dir, result)
+
+    async def _log_download(self, url: str, depth: int, output_dir: Path, result: DownloadResult) -> None:
+        file_name = result.path.relative_to(output_dir).as_posix()
+        self._sink.put(
+            AcquisitionRecord(
+                url=url,
+                file_name=file_name,
+                depth=depth,
+                content_type=result.content_type,
+                file_size_kb=result.size_kb,
+                ai_score=None,
+                timestamp=datetime.utcnow(),
+                status="duplicate" if result.duplicate else "downloaded",
+                sha256=result.sha256,
             )
-            record = AcquisitionRecord(
+        )
+        self._stats["duplicate_files" if result.duplicate else "downloaded_files"] += 1
+        await self._store_validators(
+            Validators(
                 url=url,
-                file_name=str(dest.name),
+                kind=FILE,
+                etag=result.etag,
+                last_modified=result.last_modified,
+                content_hash=result.sha256,
+                file_name=file_name,
+                content_type=result.content_type,
+                file_size_kb=result.size_kb,
+            )
+        )
+
+    async def _log_unchanged(self, url: str, depth: int, cached: Validators, result: DownloadResult) -> None:
+        # Either a 304, or the same bytes, which the content store has already collapsed onto the earlier copy
+        self._sink.put(
+            AcquisitionRecord(
+                url=url,
+                file_name=cached.file_name,
                 depth=depth,
-                content_type=content_type,
-                file_size_kb=size_kb,
+                content_type=cached.content_type,
+                file_size_kb=cached.file_size_kb,
                 ai_score=None,
                 timestamp=datetime.utcnow(),
+                status="unchanged",
+                sha256=cached.content_hash,
             )
-            insert_metadata(record, engine=self.engine)
-            self._stats["downloaded_files"] += 1
-        except Exception:
-            self._stats["errors"] += 1
-            return
+        )
+        self._stats["unchanged_files"] += 1
+        if (result.etag, result.last_modified) != (cached.etag, cached.last_modified):
+            cached.etag, cached.last_modified = result.etag, result.last_modified
+            await self._store_validators(cached)
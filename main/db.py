@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import queue
+import threading
+import time
 from contextlib import contextmanager
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Iterator, Optional, List, Dict, Any
+from typing import Iterator, Optional, List, Dict, Any, Tuple
 
 from sqlalchemy import (
     create_engine,
@@ -17,14 +20,20 @@ from sqlalchemy import (
     DateTime,
     Text,
     Numeric,
+    UniqueConstraint,
+    Index,
     insert,
     select,
     delete,
+    inspect,
+    text,
 )
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 
 from .config import load_settings
+from .metrics import ERRORS, PHASE_SECONDS, error_kind
 
 
 metadata = MetaData()
@@ -40,6 +49,90 @@ acquisition_metadata = Table(
     Column("file_size_kb", Numeric, nullable=True),
     Column("ai_score", Float, nullable=True),
     Column("timestamp", DateTime, nullable=False),
+    Column("status", String(16), nullable=True),
+    Column("sha256", String(64), nullable=True),
+)
+
+
+# Persistent AI score cache, keyed by model and the SHA-256 of the scored snippet
+ai_score_cache = Table(
+    "ai_score_cache",
+    metadata,
+    Column("model", String(255), primary_key=True),
+    Column("snippet_hash", String(64), primary_key=True),
+    Column("score", Float, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+)
+
+
+# Crawl runs and their persisted frontier (pages and files), used for checkpoint/resume
+crawl_runs = Table(
+    "crawl_runs",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("start_url", Text, nullable=False),
+    Column("status", String(32), nullable=False),
+    Column("settings", Text, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+crawl_frontier = Table(
+    "crawl_frontier",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("run_id", Integer, nullable=False),
+    Column("kind", String(8), nullable=False),
+    Column("url_hash", String(16), nullable=False),
+    Column("url", Text, nullable=False),
+    Column("depth", Integer, nullable=False),
+    Column("priority", Float, nullable=False),
+    Column("state", String(8), nullable=False),
+    # Distributed runs: the URL's host shard and, while a worker holds it, that worker and the lease expiry
+    Column("shard", Integer, nullable=True),
+    Column("leased_by", String(64), nullable=True),
+    Column("lease_expires", DateTime, nullable=True),
+    UniqueConstraint("run_id", "kind", "url_hash", name="uq_crawl_frontier_url"),
+    Index("ix_crawl_frontier_state", "run_id", "state"),
+    Index("ix_crawl_frontier_shard", "run_id", "shard", "state"),
+)
+
+# Which worker holds each frontier shard of a distributed run, and the workers' last heartbeats
+crawl_shards = Table(
+    "crawl_shards",
+    metadata,
+    Column("run_id", Integer, primary_key=True),
+    Column("shard", Integer, primary_key=True),
+    Column("owner", String(64), nullable=True),
+    Column("lease_expires", DateTime, nullable=True),
+)
+
+crawl_workers = Table(
+    "crawl_workers",
+    metadata,
+    Column("run_id", Integer, primary_key=True),
+    Column("worker_id", String(64), primary_key=True),
+    Column("heartbeat_at", DateTime, nullable=False),
+)
+
+
+# HTTP validators per URL from the last successful fetch, used for conditional re-crawls.
+# Pages also keep their extracted links and score so a 304 can skip the parse entirely.
+http_validators = Table(
+    "http_validators",
+    metadata,
+    Column("url_hash", String(16), primary_key=True),
+    Column("url", Text, nullable=False),
+    Column("kind", String(8), nullable=False),
+    Column("etag", Text, nullable=True),
+    Column("last_modified", String(64), nullable=True),
+    Column("content_hash", String(64), nullable=True),
+    Column("file_name", Text, nullable=True),
+    Column("content_type", String(255), nullable=True),
+    Column("file_size_kb", Numeric, nullable=True),
+    Column("links", Text, nullable=True),
+    Column("score", Float, nullable=True),
+    Column("updated_at", DateTime, nullable=False),
 )
 
 
@@ -52,6 +145,8 @@ class AcquisitionRecord:
     file_size_kb: Optional[float]
     ai_score: Optional[float]
     timestamp: datetime
+    status: Optional[str] = "downloaded"  # "unchanged" on a re-crawl, "duplicate" when the content was already stored
+    sha256: Optional[str] = None
 
 
 def _resolve_db_url() -> str:
@@ -64,13 +159,38 @@ def _resolve_db_url() -> str:
 
 def get_engine(echo: bool = False) -> Engine:
     url = _resolve_db_url()
-    engine = create_engine(url, echo=echo, future=True)
+    # SQLite: wait for other writers (crawl workers, the metadata sink) instead of failing after 5 s
+    connect_args = {"timeout": 30} if url.startswith("sqlite") else {}
+    engine = create_engine(url, echo=echo, future=True, connect_args=connect_args)
     return engine
 
 
 def init_db(engine: Optional[Engine] = None) -> None:
     engine = engine or get_engine()
     metadata.create_all(engine)
+    _add_missing_columns(engine)
+    _add_missing_indexes(engine)
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    # create_all() never alters existing tables; add nullable columns introduced since the database was created
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def _add_missing_indexes(engine: Engine) -> None:
+    # Likewise for indexes added to existing tables
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
 
 @contextmanager
@@ -95,6 +215,126 @@ def insert_metadata(record: AcquisitionRecord, engine: Optional[Engine] = None)
         conn.execute(insert(acquisition_metadata).values(**values))
 
 
+def insert_metadata_many(records: List[AcquisitionRecord], engine: Optional[Engine] = None) -> None:
+    if not records:
+        return
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        conn.execute(insert(acquisition_metadata), [asdict(r) for r in records])
+
+
+_STOP = object()
+
+
+# Write-behind buffer: records are queued without blocking and a background thread
+# flushes them as multi-row inserts by size or time; close() drains what is left.
+class MetadataSink:
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        batch_size: int = 500,
+        flush_interval_seconds: float = 1.0,
+    ) -> None:
+        self.engine = engine or get_engine()
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_seconds = max(0.01, flush_interval_seconds)
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        # Non-daemon so interpreter shutdown still waits for the final flush
+        self._thread = threading.Thread(target=self._run, name="metadata-sink", daemon=False)
+        self._started = False
+        self._buffered = 0  # taken off the queue by the flush thread but not written yet
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() + self._buffered
+
+    def start(self) -> None:
+        if not self._started:
+            self._started = True
+            self._thread.start()
+
+    def put(self, record: AcquisitionRecord) -> None:
+        self._queue.put(record)
+
+    def close(self) -> None:
+        if not self._started:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        buffer: List[AcquisitionRecord] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if buffer else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._flush(buffer)
+                self._buffered = 0
+                return
+            if item is not None:
+                if not buffer:
+                    deadline = time.monotonic() + self.flush_interval_seconds
+                buffer.append(item)
+                self._buffered = len(buffer)
+                if len(buffer) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            self._flush(buffer)
+            buffer = []
+            self._buffered = 0
+
+    def _flush(self, records: List[AcquisitionRecord]) -> None:
+        if not records:
+            return
+        started = time.perf_counter()
+        try:
+            insert_metadata_many(records, engine=self.engine)
+            self.written += len(records)
+            return
+        except Exception:
+            pass
+        finally:
+            PHASE_SECONDS.observe(time.perf_counter() - started, "db_insert")
+        # Fall back to row-by-row so a single bad record does not drop the whole batch
+        for record in records:
+            try:
+                with PHASE_SECONDS.time("db_insert"):
+                    insert_metadata(record, engine=self.engine)
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                ERRORS.inc("db", error_kind(e))
+
+
+def get_cached_ai_score(model: str, snippet_hash: str, engine: Optional[Engine] = None) -> Tuple[bool, Optional[float]]:
+    engine = engine or get_engine()
+    stmt = select(ai_score_cache.c.score).where(
+        ai_score_cache.c.model == model,
+        ai_score_cache.c.snippet_hash == snippet_hash,
+    )
+    with engine.connect() as conn:
+        row = conn.execute(stmt).first()
+    if row is None:
+        return False, None
+    return True, row[0]
+
+
+def put_cached_ai_score(model: str, snippet_hash: str, score: Optional[float], engine: Optional[Engine] = None) -> None:
+    engine = engine or get_engine()
+    values = {"model": model, "snippet_hash": snippet_hash, "score": score, "created_at": datetime.utcnow()}
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(ai_score_cache).values(**values))
+    except IntegrityError:
+        # Another run cached the same snippet first
+        pass
+
+
 def get_latest_records(limit: int = 50, engine: Optional[Engine] = None) -> List[Dict[str, Any]]:
     engine = engine or get_engine()
     stmt = (
@@ -107,6 +347,8 @@ def get_latest_records(limit: int = 50, engine: Optional[Engine] = None) -> List
             acquisition_metadata.c.file_size_kb,
             acquisition_metadata.c.ai_score,
             acquisition_metadata.c.timestamp,
+            acquisition_metadata.c.status,
+            acquisition_metadata.c.sha256,
         )
         .order_by(acquisition_metadata.c.timestamp.desc())
         .limit(limit)
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, List, Optional, Tuple
+
+from .metrics import PHASE_SECONDS
+
+_STOP = object()
+_FSYNC_BATCH = 16
+
+
+# Writes download bodies from dedicated threads so a slow or network-mounted output volume never
+# blocks the event loop. Coroutines hand over coalesced blocks; a byte budget shared by all files
+# makes writers wait (and so stop reading from the network) when the disk falls behind.
+class DiskWriter:
+    def __init__(
+        self,
+        threads: int = 1,
+        block_size_kb: int = 1024,
+        max_pending_mb: int = 64,
+        fsync: bool = False,
+    ) -> None:
+        self.threads = max(1, threads)
+        self.block_size = max(64, block_size_kb) * 1024
+        self.max_blocks = max(2, (max(1, max_pending_mb) * 1024 * 1024) // self.block_size)
+        self.fsync = fsync
+        self._queues: List["queue.Queue[Any]"] = []
+        self._workers: List[threading.Thread] = []
+        self._next = itertools.count()
+        self._slots: Any = None  # asyncio.Semaphore, created on the loop that first opens a file
+        self._loop: Any = None
+        self._stats_lock = threading.Lock()  # writer threads update the counters concurrently
+        self.blocks_written = 0
+        self.bytes_written = 0
+        self.fsyncs = 0
+
+    @property
+    def pending_blocks(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def _start(self) -> None:
+        if self._workers:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_blocks)
+        for i in range(self.threads):
+            q: "queue.Queue[Any]" = queue.Queue()
+            worker = threading.Thread(target=self._run, args=(q,), name=f"disk-writer-{i}", daemon=True)
+            self._queues.append(q)
+            self._workers.append(worker)
+            worker.start()
+
+    async def open(self, path: Path, mode: str = "wb") -> "WriterFile":
+        self._start()
+        # All operations on one file go to the same thread, which keeps them in order
+        q = self._queues[next(self._next) % len(self._queues)]
+        handle = WriterFile(self, q)
+        await handle._call("open", (path, mode))
+        return handle
+
+    async def aclose(self) -> None:
+        for q in self._queues:
+            q.put(_STOP)
+        for worker in self._workers:
+            await asyncio.to_thread(worker.join)
+        self._queues, self._workers = [], []
+
+    def _resolve(self, future: "asyncio.Future[Any]", error: Optional[BaseException]) -> None:
+        self._loop.call_soon_threadsafe(_set_future, future, error)
+
+    def _run(self, q: "queue.Queue[Any]") -> None:
+        syncing: List[Tuple[BinaryIO, "asyncio.Future[Any]"]] = []
+        while True:
+            item = q.get()
+            if item is _STOP:
+                self._finish(syncing)
+                return
+            handle, op, arg, future = item
+            try:
+                if op == "open":
+                    handle._file = open(arg[0], arg[1])
+                elif op == "write":
+                    try:
+                        if handle.error is None:
+                            with PHASE_SECONDS.time("disk_write"):
+                                handle._file.write(arg)
+                            with self._stats_lock:
+                                self.blocks_written += 1
+                                self.bytes_written += len(arg)
+                    finally:
+                        self._loop.call_soon_threadsafe(self._slots.release)
+                elif op == "close":
+                    handle._file.flush()
+                    if arg:
+                        # Closes that arrive together share one pass of fsyncs before any of them resolves
+                        syncing.append((handle._file, future))
+                        future = None
+                    else:
+                        handle._file.close()
+            except BaseException as e:
+                handle.error = handle.error or e
+                if op == "close":
+                    _close_quietly(handle._file)
+            if future is not None:
+                self._resolve(future, handle.error if op != "write" else None)
+            if syncing and (q.empty() or len(syncing) >= _FSYNC_BATCH):
+                self._finish(syncing)
+                syncing = []
+
+    def _finish(self, syncing: List[Tuple[BinaryIO, "asyncio.Future[Any]"]]) -> None:
+        for f, future in syncing:
+            error: Optional[BaseException] = None
+            try:
+                with PHASE_SECONDS.time("fsync"):
+                    os.fsync(f.fileno())
+                with self._stats_lock:
+                    self.fsyncs += 1
+            except OSError as e:
+                error = e
+            _close_quietly(f)
+            self._resolve(future, error)
+
+
+def _set_future(future: "asyncio.Future[Any]", error: Optional[BaseException]) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(None)
+
+
+def _close_quietly(f: Optional[BinaryIO]) -> None:
+    try:
+        if f is not None:
+            f.close()
+    except Exception:
+        pass
+
+
+class WriterFile:
+    def __init__(self, writer: DiskWriter, q: "queue.Queue[Any]") -> None:
+        self._writer = writer
+        self._queue = q
+        self._file: Optional[BinaryIO] = None
+        self._buffer = bytearray()
+        self._closed = False
+        self.error: Optional[BaseException] = None
+
+    def _put(self, op: str, arg: Any) -> "asyncio.Future[Any]":
+        future = self._writer._loop.create_future()
+        self._queue.put((self, op, arg, future))
+        return future
+
+    async def _call(self, op: str, arg: Any) -> None:
+        await self._put(op, arg)
+
+    async def write(self, data: bytes) -> None:
+        if self.error is not None:
+            raise self.error
+        self._buffer += data
+        if len(self._buffer) >= self._writer.block_size:
+            await self._submit()
+
+    async def _submit(self) -> None:
+        if not self._buffer:
+            return
+        # Backpressure: wait for the disk to catch up before taking more bytes off the network
+        await self._writer._slots.acquire()
+        block, self._buffer = bytes(self._buffer), bytearray()
+        self._queue.put((self, "write", block, None))
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        try:
+            await self._submit()
+        finally:
+            # Queued even when the caller is cancelled waiting for a block slot, so the thread always
+            # closes the file; once queued, the close runs whether or not anyone awaits it
+            done = self._put("close", self._writer.fsync)
+            self._closed = True
+        await done
+        if self.error is not None:
+            raise self.error
+
+
+# Same interface, writing on the calling thread; used when no DiskWriter is supplied
+class InlineWriter:
+    async def open(self, path: Path, mode: str = "wb") -> "InlineFile":
+        return InlineFile(open(path, mode))
+
+
+class InlineFile:
+    def __init__(self, f: BinaryIO) -> None:
+        self._file = f
+
+    async def write(self, data: bytes) -> None:
+        self._file.write(data)
+
+    async def close(self) -> None:
+        self._file.close()
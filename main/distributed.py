@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import math
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from .db import crawl_frontier, crawl_shards, crawl_workers
+from .frontier import LEASED, PENDING, FrontierEntry, host_shard
+
+_BACKFILL_CHUNK = 1000
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"[:64]
+
+
+# One worker's handle on the frontier of a distributed run (crawl --worker). Every host hashes to one
+# of `shards` shards and each shard is leased to a single worker at a time, so per-host limits, backoff
+# and Crawl-delay are enforced by exactly one process. Workers lease URLs from their own shards in
+# batches and renew both kinds of lease on every sync; a worker that stops renewing (crashed, lost its
+# network) has its shards and URLs taken over once the leases expire.
+# Claims use SELECT ... FOR UPDATE SKIP LOCKED on Postgres; SQLite ignores the row lock and relies
+# on every claim being a single UPDATE, which holds the database write lock.
+# All methods block on the database and are meant for asyncio.to_thread.
+class SharedFrontier:
+    def __init__(
+        self,
+        engine: Engine,
+        run_id: int,
+        shards: int,
+        lease_seconds: float = 60.0,
+        worker_id: Optional[str] = None,
+    ) -> None:
+        self.engine = engine
+        self.run_id = run_id
+        self.shards = max(1, shards)
+        self.lease = timedelta(seconds=max(1.0, lease_seconds))
+        self.worker_id = worker_id or make_worker_id()
+        self.owned: Set[int] = set()
+        self.workers = 1
+        self.claimed = 0
+        self.reclaimed = 0
+        # URLs claimed by this worker and not finished yet, per shard; only touched on the event loop
+        self.outstanding: Dict[int, int] = {}
+
+    def shard_of(self, url: str) -> int:
+        return host_shard(url, self.shards)
+
+    def hold(self, url: str) -> None:
+        shard = self.shard_of(url)
+        self.outstanding[shard] = self.outstanding.get(shard, 0) + 1
+
+    def settle(self, url: str) -> None:
+        shard = self.shard_of(url)
+        left = self.outstanding.get(shard, 0) - 1
+        if left > 0:
+            self.outstanding[shard] = left
+        else:
+            self.outstanding.pop(shard, None)
+
+    def open(self) -> None:
+        if self.engine.dialect.name == "sqlite":
+            # Readers no longer block the writer, which matters with several local worker processes
+            with self.engine.connect() as conn:
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        with self.engine.begin() as conn:
+            stmt = select(crawl_shards.c.shard).where(crawl_shards.c.run_id == self.run_id)
+            existing = set(conn.execute(stmt).scalars())
+            missing = [{"run_id": self.run_id, "shard": s} for s in range(self.shards) if s not in existing]
+        if missing:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(crawl_shards), missing)
+            except IntegrityError:
+                pass  # another worker of the run created them first
+        self._backfill_shards()
+
+    def _backfill_shards(self) -> None:
+        # Rows persisted before the run went distributed have no shard yet
+        stmt = (
+            select(crawl_frontier.c.id, crawl_frontier.c.url)
+            .where(crawl_frontier.c.run_id == self.run_id, crawl_frontier.c.shard.is_(None))
+            .limit(_BACKFILL_CHUNK)
+        )
+        while True:
+            with self.engine.begin() as conn:
+                rows = conn.execute(stmt).all()
+                by_shard: Dict[int, List[int]] = {}
+                for row in rows:
+                    by_shard.setdefault(self.shard_of(row.url), []).append(row.id)
+                for shard, ids in by_shard.items():
+                    conn.execute(update(crawl_frontier).where(crawl_frontier.c.id.in_(ids)).values(shard=shard))
+            if len(rows) < _BACKFILL_CHUNK:
+                return
+
+    def sync(self, outstanding: Dict[int, int], limit: int) -> List[FrontierEntry]:
+        # Heartbeat, rebalance shards, reclaim expired URL leases, renew ours and claim up to `limit`
+        # URLs. The first statement is a write so SQLite takes the write lock for the whole transaction.
+        now = datetime.utcnow()
+        expires = now + self.lease
+        with self.engine.begin() as conn:
+            self._heartbeat(conn, now)
+            self.workers = max(1, self._live_workers(conn, now))
+            busy = set(
+                conn.execute(
+                    select(crawl_frontier.c.shard)
+                    .where(
+                        crawl_frontier.c.run_id == self.run_id,
+                        crawl_frontier.c.state.in_((PENDING, LEASED)),
+                        crawl_frontier.c.shard.isnot(None),
+                    )
+                    .distinct()
+                ).scalars()
+            )
+            owned = set(
+                conn.execute(
+                    select(crawl_shards.c.shard).where(
+                        crawl_shards.c.run_id == self.run_id,
+                        crawl_shards.c.owner == self.worker_id,
+                    )
+                ).scalars()
+            )
+            # Shards with work are split evenly across live workers. Over that share, the shards with
+            # the least local work stop taking URLs and are handed back once they have none in flight.
+            fair = max(1, math.ceil(len(busy) / self.workers))
+            ranked = sorted((s for s in owned if s in busy), key=lambda s: -outstanding.get(s, 0))
+            keep = set(ranked[:fair])
+            release = {s for s in owned if s not in keep and not outstanding.get(s)}
+            if release:
+                mine = self._shards_of_mine().where(crawl_shards.c.shard.in_(release))
+                conn.execute(mine.values(owner=None, lease_expires=None))
+                owned -= release
+            conn.execute(self._shards_of_mine().values(lease_expires=expires))
+            if len(owned) < fair and busy - owned:
+                taken = self._take_shards(conn, busy - owned, fair - len(owned), now, expires)
+                owned |= taken
+                keep |= taken
+            self.owned = owned
+            conn.execute(
+                update(crawl_frontier)
+                .where(
+                    crawl_frontier.c.run_id == self.run_id,
+                    crawl_frontier.c.leased_by == self.worker_id,
+                    crawl_frontier.c.state == LEASED,
+                )
+                .values(lease_expires=expires)
+            )
+            if not keep or limit <= 0:
+                return []
+
+            # URL leases in our shards that nobody renewed belong to a worker that is gone
+            reclaimed = conn.execute(
+                update(crawl_frontier)
+                .where(
+                    crawl_frontier.c.run_id == self.run_id,
+                    crawl_frontier.c.shard.in_(keep),
+                    crawl_frontier.c.state == LEASED,
+                    crawl_frontier.c.leased_by != self.worker_id,
+                    crawl_frontier.c.lease_expires < now,
+                )
+                .values(state=PENDING, leased_by=None, lease_expires=None)
+            )
+            self.reclaimed += reclaimed.rowcount or 0
+            candidates = (
+                select(crawl_frontier.c.id)
+                .where(
+                    crawl_frontier.c.run_id == self.run_id,
+                    crawl_frontier.c.shard.in_(keep),
+                    crawl_frontier.c.state == PENDING,
+                )
+                .order_by(crawl_frontier.c.priority.desc(), crawl_frontier.c.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            rows = conn.execute(
+                update(crawl_frontier)
+                .where(crawl_frontier.c.id.in_(candidates), crawl_frontier.c.state == PENDING)
+                .values(state=LEASED, leased_by=self.worker_id, lease_expires=expires)
+                .returning(
+                    crawl_frontier.c.url, crawl_frontier.c.kind, crawl_frontier.c.depth, crawl_frontier.c.priority
+                )
+            ).all()
+        self.claimed += len(rows)
+        return [FrontierEntry(url=r.url, kind=r.kind, depth=r.depth, priority=r.priority) for r in rows]
+
+    def _take_shards(
+        self, conn: Any, candidates: Set[int], count: int, now: datetime, expires: datetime
+    ) -> Set[int]:
+        free = or_(crawl_shards.c.owner.is_(None), crawl_shards.c.lease_expires < now)
+        choice = (
+            select(crawl_shards.c.shard)
+            .where(crawl_shards.c.run_id == self.run_id, crawl_shards.c.shard.in_(candidates), free)
+            .order_by(func.random())  # workers starting together don't all race for the same shards
+            .limit(count)
+            .with_for_update(skip_locked=True)
+        )
+        result = conn.execute(
+            update(crawl_shards)
+            .where(crawl_shards.c.run_id == self.run_id, crawl_shards.c.shard.in_(choice), free)
+            .values(owner=self.worker_id, lease_expires=expires)
+            .returning(crawl_shards.c.shard)
+        )
+        return set(result.scalars())
+
+    def _shards_of_mine(self) -> Any:
+        return update(crawl_shards).where(crawl_shards.c.run_id == self.run_id, crawl_shards.c.owner == self.worker_id)
+
+    def _heartbeat(self, conn: Any, now: datetime) -> None:
+        mine = and_(crawl_workers.c.run_id == self.run_id, crawl_workers.c.worker_id == self.worker_id)
+        if conn.execute(update(crawl_workers).where(mine).values(heartbeat_at=now)).rowcount == 0:
+            conn.execute(insert(crawl_workers).values(run_id=self.run_id, worker_id=self.worker_id, heartbeat_at=now))
+
+    def _live_workers(self, conn: Any, now: datetime, others: bool = False) -> int:
+        stmt = select(func.count()).select_from(crawl_workers).where(
+            crawl_workers.c.run_id == self.run_id,
+            crawl_workers.c.heartbeat_at > now - self.lease,
+        )
+        if others:
+            stmt = stmt.where(crawl_workers.c.worker_id != self.worker_id)
+        return int(conn.execute(stmt).scalar() or 0)
+
+    def remaining(self) -> int:
+        # URLs of the run that some worker still has to finish
+        stmt = select(func.count()).select_from(crawl_frontier).where(
+            crawl_frontier.c.run_id == self.run_id,
+            crawl_frontier.c.state.in_((PENDING, LEASED)),
+        )
+        with self.engine.connect() as conn:
+            return int(conn.execute(stmt).scalar() or 0)
+
+    def others_alive(self) -> bool:
+        with self.engine.connect() as conn:
+            return self._live_workers(conn, datetime.utcnow(), others=True) > 0
+
+    def close(self) -> None:
+        # Hands unfinished URLs and our shards back right away instead of after the lease expires
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(crawl_frontier)
+                .where(
+                    crawl_frontier.c.run_id == self.run_id,
+                    crawl_frontier.c.leased_by == self.worker_id,
+                    crawl_frontier.c.state == LEASED,
+                )
+                .values(state=PENDING, leased_by=None, lease_expires=None)
+            )
+            conn.execute(self._shards_of_mine().values(owner=None, lease_expires=None))
+            conn.execute(
+                delete(crawl_workers).where(
+                    crawl_workers.c.run_id == self.run_id, crawl_workers.c.worker_id == self.worker_id
+                )
+            )
+        self.owned = set()
@@ -2,23 +2,71 @@ from __future__ import annotations
 
 import asyncio
 import hashlib
+import json
 import math
+import os
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 
 import aiohttp
 
+from .disk_writer import DiskWriter, InlineWriter
+from .file_detector import FILE, HTML_CONTENT_TYPES, PAGE, classify_response
+
 
 class DownloadError(Exception):
     pass
 
 
+# Decided from the response itself (too large, HTML instead of a file); retrying would not change it
+class DownloadSkipped(DownloadError):
+    pass
+
+
+# The partial file cannot be resumed (size limit, or the resource changed under If-Range)
+class _DiscardPart(DownloadError):
+    pass
+
+
+class _SwitchToSegments(Exception):
+    pass
+
+
 _DEFAULT_HEADERS = {
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,\n        image/avif,image/webp,*/*;q=0.8",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
     "Accept-Language": "en-US,en;q=0.9",
 }
 
 
+# Called once per HTTP attempt with (status or None on timeout, seconds to response headers, Retry-After seconds)
+ResponseObserver = Callable[[Optional[int], float, Optional[float]], None]
+
+RETRY_AFTER_STATUSES = {429, 503}
+
+_CHUNK_SIZE = 1024 * 64
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either delta-seconds or an HTTP-date
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
 async def head_request(session: aiohttp.ClientSession, url: str, timeout_seconds: int) -> Optional[aiohttp.ClientResponse]:
     try:
         timeout = aiohttp.ClientTimeout(total=timeout_seconds)
@@ -28,11 +76,208 @@ async def head_request(session: aiohttp.ClientSession, url: str, timeout_seconds
         return None
 
 
-async def fetch_html(session: aiohttp.ClientSession, url: str, timeout_seconds: int) -> str:
+@dataclass
+class PageFetch:
+    html: Optional[str]  # None on 304, or when the body went to a stream instead
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+    not_modified: bool = False
+    size_bytes: int = 0
+    truncated: bool = False  # the body hit max_bytes and the rest was not read
+    charset: Optional[str] = None
+
+
+@dataclass
+class DownloadResult:
+    path: Optional[Path]  # None when the server answered 304 Not Modified
+    content_type: Optional[str]
+    size_kb: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    sha256: Optional[str] = None
+    duplicate: bool = False  # the content was already in the store; nothing new was written
+
+    @property
+    def not_modified(self) -> bool:
+        return self.path is None
+
+
+# The response turned out to belong to the other pipeline, which consumed it without a second request
+class FileInstead(DownloadSkipped):
+    def __init__(self, result: DownloadResult) -> None:
+        super().__init__("File instead of an HTML page")
+        self.result = result
+
+
+class PageInstead(DownloadSkipped):
+    def __init__(self, page: PageFetch) -> None:
+        super().__init__("HTML page instead of a file")
+        self.page = page
+
+
+# Called by fetch_page with (url, response, decoded body) to store a response that sniffed as a file
+Divert = Callable[[str, aiohttp.ClientResponse, AsyncIterator[bytes]], Awaitable[DownloadResult]]
+
+
+def _request_headers(etag: Optional[str], last_modified: Optional[str]) -> Dict[str, str]:
+    headers = dict(_DEFAULT_HEADERS)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+# Pages are requested with aiohttp's decompression off and inflated here in bounded steps:
+# aiohttp inflates a whole network read at once, which lets a small gzip bomb expand in memory
+_PAGE_ENCODINGS = "gzip, deflate"
+
+# Files are requested unencoded: Range offsets and Content-Length then count the bytes that are stored,
+# which resume, segmenting and the size check rely on
+_FILE_ENCODINGS = "identity"
+
+
+class _BoundedDecoder:
+    def __init__(self, content_encoding: Optional[str]) -> None:
+        encoding = (content_encoding or "identity").strip().lower()
+        if encoding not in ("identity", "gzip", "x-gzip", "deflate"):
+            raise DownloadSkipped(f"Unsupported Content-Encoding: {content_encoding}")
+        self.encoding = encoding
+        self._z: Any = None
+        if encoding in ("gzip", "x-gzip"):
+            self._z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        if self.encoding == "identity":
+            yield data
+            return
+        if self._z is None:
+            # "deflate" is meant to be zlib-wrapped, but some servers send a raw stream
+            wrapped = len(data) >= 2 and (data[0] & 0x0F) == 8 and ((data[0] << 8) | data[1]) % 31 == 0
+            self._z = zlib.decompressobj(zlib.MAX_WBITS if wrapped else -zlib.MAX_WBITS)
+        while data:
+            out = self._z.decompress(data, _CHUNK_SIZE)
+            if out:
+                yield out
+            data = self._z.unconsumed_tail
+
+
+async def _decoded_chunks(resp: aiohttp.ClientResponse, decoder: _BoundedDecoder) -> AsyncIterator[bytes]:
+    async for raw in resp.content.iter_chunked(_CHUNK_SIZE):
+        for chunk in decoder.feed(raw):
+            if chunk:
+                yield chunk
+
+
+async def _first_chunk(body: AsyncIterator[bytes]) -> bytes:
+    async for chunk in body:
+        return chunk
+    return b""
+
+
+async def _prepend(first: bytes, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    if first:
+        yield first
+    async for chunk in body:
+        yield chunk
+
+
+def decode_body(body: bytes, charset: Optional[str]) -> str:
+    if charset:
+        try:
+            return body.decode(charset, errors="ignore")
+        except LookupError:
+            pass
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError:
+        return body.decode("cp1252", errors="ignore")
+
+
+async def fetch_page(
+    session: aiohttp.ClientSession,
+    url: str,
+    timeout_seconds: int,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    max_bytes: int = 0,
+    stream: Any = None,
+    divert: Optional[Divert] = None,
+) -> PageFetch:
+    # stream: optional object with start(charset) and feed(chunk) (see page_analysis.PageStream).
+    # When given, chunks are handed over as they arrive and the body is not kept here.
+    # divert: when given, the first chunk is sniffed and a body that is really a file is handed
+    # to it mid-stream (raising FileInstead with its result) instead of being skipped.
     timeout = aiohttp.ClientTimeout(total=timeout_seconds)
-    async with session.get(url, timeout=timeout, headers=_DEFAULT_HEADERS) as resp:
+    headers = _request_headers(etag, last_modified)
+    headers["Accept-Encoding"] = _PAGE_ENCODINGS
+    async with session.get(url, timeout=timeout, headers=headers, auto_decompress=False) as resp:
+        if resp.status == 304:
+            return PageFetch(
+                html=None,
+                etag=resp.headers.get("ETag") or etag,
+                last_modified=resp.headers.get("Last-Modified") or last_modified,
+                content_hash=None,
+                not_modified=True,
+            )
         resp.raise_for_status()
-        return await resp.text(errors="ignore")
+        content_type = resp.headers.get("Content-Type")
+        decoder = _BoundedDecoder(resp.headers.get("Content-Encoding"))
+        body = _decoded_chunks(resp, decoder)
+        if divert is not None:
+            first = await _first_chunk(body)
+            if classify_response(content_type, first, PAGE) == FILE:
+                raise FileInstead(await divert(url, resp, _prepend(first, body)))
+            body = _prepend(first, body)
+        elif content_type and content_type.split(";", 1)[0].strip().lower() not in HTML_CONTENT_TYPES:
+            # Decide from the headers before reading anything: a mislinked dataset served as a page never gets buffered
+            raise DownloadSkipped(f"Not an HTML page: {content_type}")
+        content_length = resp.headers.get("Content-Length")
+        # Content-Length counts encoded bytes, so only an uncompressed length can be trusted up front
+        if (
+            max_bytes > 0
+            and content_length is not None
+            and content_length.isdigit()
+            and int(content_length) > max_bytes
+            and not resp.headers.get("Content-Encoding")
+        ):
+            raise DownloadSkipped("Page larger than max_page_size_kb (content-length)")
+
+        charset = resp.charset
+        if stream is not None:
+            stream.start(charset)
+        digest = hashlib.sha256()
+        chunks: List[bytes] = []
+        size_bytes = 0
+        truncated = False
+        # Counted after decompression, so the cap also holds for gzip/deflate bombs
+        async for chunk in body:
+            if max_bytes > 0 and size_bytes + len(chunk) > max_bytes:
+                chunk = chunk[: max_bytes - size_bytes]
+                truncated = True
+            size_bytes += len(chunk)
+            digest.update(chunk)
+            if stream is not None:
+                stream.feed(chunk)
+            else:
+                chunks.append(chunk)
+            if truncated:
+                break
+        return PageFetch(
+            html=decode_body(b"".join(chunks), charset) if stream is None else None,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            content_hash=digest.hexdigest(),
+            size_bytes=size_bytes,
+            truncated=truncated,
+            charset=charset,
+        )
+
+
+async def fetch_html(session: aiohttp.ClientSession, url: str, timeout_seconds: int) -> str:
+    page = await fetch_page(session, url, timeout_seconds)
+    return page.html or ""
 
 
 def _safe_filename_from_url(url: str, fallback_ext: str = "") -> str:
@@ -49,6 +294,269 @@ def _safe_filename_from_url(url: str, fallback_ext: str = "") -> str:
     return f"download_{digest}{fallback_ext}"
 
 
+# Sidecar for a .part file: the entity it belongs to, so a later attempt (or a later
+# process) can resume it with Range + If-Range instead of starting from byte zero
+@dataclass
+class _PartState:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_type: Optional[str] = None
+    total: Optional[int] = None
+    segments: int = 1
+
+    @property
+    def validator(self) -> Optional[str]:
+        # If-Range needs a strong ETag; fall back to Last-Modified
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+
+def _part_paths(output_dir: Path, url: str) -> Tuple[Path, Path]:
+    digest = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+    parts_dir = output_dir / ".parts"
+    return parts_dir / f"{digest}.part", parts_dir / f"{digest}.json"
+
+
+def _segment_path(part: Path, index: int) -> Path:
+    return part.with_name(f"{part.stem}.seg{index}")
+
+
+def _load_part_state(path: Path, url: str) -> Optional[_PartState]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        state = _PartState(**data)
+    except Exception:
+        return None
+    return state if state.url == url else None
+
+
+def _save_part_state(path: Path, state: _PartState) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(asdict(state)), encoding="utf-8")
+
+
+def _discard_part(part: Path, state_path: Path) -> None:
+    for segment in part.parent.glob(f"{part.stem}.seg*"):
+        segment.unlink(missing_ok=True)
+    part.unlink(missing_ok=True)
+    state_path.unlink(missing_ok=True)
+
+
+def _hash_file(path: Path, digest: Any) -> None:
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+
+def _join_segments(segments: List[Path], part: Path) -> str:
+    digest = hashlib.sha256()
+    with part.open("wb") as out:
+        for segment in segments:
+            with segment.open("rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    out.write(block)
+                    digest.update(block)
+    for segment in segments:
+        segment.unlink(missing_ok=True)
+    return digest.hexdigest()
+
+
+def _parse_content_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    # "bytes 100-199/1000" -> (100, 1000); the total may be "*"
+    if not value or not value.startswith("bytes "):
+        return None, None
+    try:
+        span, _, total = value[6:].partition("/")
+        start = int(span.split("-", 1)[0])
+        return start, int(total) if total.isdigit() else None
+    except ValueError:
+        return None, None
+
+
+def _object_path(output_dir: Path, sha256: str) -> Path:
+    # Content-addressed: objects/ab/<sha256>, so identical bytes from any URL land on one path.
+    # The URL's name and extension only appear on the NAMED_LINKS hardlink and in the metadata row.
+    return output_dir / "objects" / sha256[:2] / sha256
+
+
+def _link_by_name(obj: Path, output_dir: Path, url: str, sha256: str) -> None:
+    # Human-readable hardlink next to the store; a name already taken by other content gets a hash suffix
+    link = output_dir / _safe_filename_from_url(url)
+    if link.exists():
+        if os.path.samefile(link, obj):
+            return
+        link = link.with_name(f"{link.stem}.{sha256[:12]}{link.suffix}")
+        if link.exists():
+            return
+    try:
+        os.link(obj, link)
+    except OSError:
+        # Filesystems without hardlinks still have the object and its metadata row
+        pass
+
+
+def _finalize_part(
+    part: Path,
+    state_path: Path,
+    output_dir: Path,
+    url: str,
+    sha256: str,
+    named_links: bool,
+) -> Tuple[Path, bool]:
+    obj = _object_path(output_dir, sha256)
+    duplicate = obj.exists()
+    if duplicate:
+        part.unlink(missing_ok=True)
+    else:
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        part.replace(obj)
+    state_path.unlink(missing_ok=True)
+    if named_links:
+        _link_by_name(obj, output_dir, url, sha256)
+    return obj, duplicate
+
+
+async def _fetch_segment(
+    session: aiohttp.ClientSession,
+    url: str,
+    segment: Path,
+    start: int,
+    end: int,
+    validator: str,
+    timeout_seconds: int,
+    observer: Optional[ResponseObserver],
+    writer: Any,
+) -> None:
+    have = segment.stat().st_size if segment.exists() else 0
+    if start + have > end:
+        return
+    headers = dict(_DEFAULT_HEADERS)
+    headers["Accept-Encoding"] = _FILE_ENCODINGS
+    headers["Range"] = f"bytes={start + have}-{end}"
+    headers["If-Range"] = validator
+    timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+    started = time.monotonic()
+    async with session.get(url, timeout=timeout, headers=headers) as resp:
+        if observer is not None:
+            retry_after = parse_retry_after(resp.headers.get("Retry-After")) if resp.status in RETRY_AFTER_STATUSES else None
+            observer(resp.status, time.monotonic() - started, retry_after)
+        resp.raise_for_status()
+        range_start, _ = _parse_content_range(resp.headers.get("Content-Range"))
+        if resp.status != 206 or range_start != start + have:
+            raise _DiscardPart("Range ignored or entity changed during segmented download")
+        f = await writer.open(segment, "ab")
+        try:
+            async for chunk in resp.content.iter_chunked(_CHUNK_SIZE):
+                await f.write(chunk)
+                have += len(chunk)
+                if start + have > end + 1:
+                    raise DownloadError("Segment longer than requested range")
+        finally:
+            await f.close()
+    if start + have != end + 1:
+        raise DownloadError("Segment ended early")
+
+
+async def _download_segmented(
+    session: aiohttp.ClientSession,
+    url: str,
+    part: Path,
+    total: int,
+    count: int,
+    validator: str,
+    timeout_seconds: int,
+    observer: Optional[ResponseObserver],
+    writer: Any,
+) -> str:
+    step = -(-total // count)
+    segments = [_segment_path(part, i) for i in range(count)]
+    tasks = [
+        _fetch_segment(
+            session,
+            url,
+            segments[i],
+            i * step,
+            min(total, (i + 1) * step) - 1,
+            validator,
+            timeout_seconds,
+            observer,
+            writer,
+        )
+        for i in range(count)
+    ]
+    # Segments finished by an earlier attempt return immediately, so a retry only re-requests what is missing
+    await asyncio.gather(*tasks)
+    return await asyncio.to_thread(_join_segments, segments, part)
+
+
+async def _read_page(resp: aiohttp.ClientResponse, first: bytes, max_bytes: int, state: _PartState) -> PageFetch:
+    # The rest of a download that sniffed as HTML, read as a page
+    body = bytearray(first)
+    if len(body) <= max_bytes:
+        async for chunk in resp.content.iter_chunked(_CHUNK_SIZE):
+            body += chunk
+            if len(body) > max_bytes:
+                break
+    truncated = len(body) > max_bytes
+    data = bytes(body[:max_bytes])
+    return PageFetch(
+        html=decode_body(data, resp.charset),
+        etag=state.etag,
+        last_modified=state.last_modified,
+        content_hash=hashlib.sha256(data).hexdigest(),
+        size_bytes=len(data),
+        truncated=truncated,
+        charset=resp.charset,
+    )
+
+
+async def store_stream(
+    url: str,
+    resp: aiohttp.ClientResponse,
+    body: AsyncIterator[bytes],
+    output_dir: Path,
+    max_file_size_kb: int = 51200,
+    named_links: bool = False,
+    writer: Optional[DiskWriter] = None,
+) -> DownloadResult:
+    # Stores a body that is already being read elsewhere (a "page" that sniffed as a file) without
+    # requesting it again. No resume state is kept: a failed transfer is discarded.
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if writer is None:
+        writer = InlineWriter()
+    part, state_path = _part_paths(output_dir, url)
+    part.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size_bytes = 0
+    try:
+        f = await writer.open(part, "wb")
+        try:
+            async for chunk in body:
+                await f.write(chunk)
+                digest.update(chunk)
+                size_bytes += len(chunk)
+                if size_bytes > max_file_size_kb * 1024:
+                    raise DownloadSkipped("File too large (stream)")
+        finally:
+            await f.close()
+    except BaseException:
+        _discard_part(part, state_path)
+        raise
+    sha256 = digest.hexdigest()
+    dest, duplicate = _finalize_part(part, state_path, output_dir, url, sha256, named_links)
+    return DownloadResult(
+        path=dest,
+        content_type=resp.headers.get("Content-Type"),
+        size_kb=round(size_bytes / 1024.0, 3),
+        etag=resp.headers.get("ETag"),
+        last_modified=resp.headers.get("Last-Modified"),
+        sha256=sha256,
+        duplicate=duplicate,
+    )
+
+
 async def download_file(
     session: aiohttp.ClientSession,
     url: str,
@@ -57,57 +565,180 @@ async def download_file(
     max_file_size_kb: int = 51200,
     max_retries: int = 3,
     backoff_base_seconds: float = 0.5,
-) -> Tuple[Path, Optional[str], float]:
+    observer: Optional[ResponseObserver] = None,
+    max_retry_after_seconds: float = 120.0,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    segments: int = 1,
+    segment_min_size_kb: int = 16384,
+    named_links: bool = False,
+    head_preflight: bool = False,
+    writer: Optional[DiskWriter] = None,
+    page_max_bytes: int = 0,
+) -> DownloadResult:
+    # page_max_bytes > 0: a body that sniffs as HTML is read (up to that size) and raised as
+    # PageInstead so the caller can parse it, instead of being skipped
     output_dir.mkdir(parents=True, exist_ok=True)
+    if writer is None:
+        writer = InlineWriter()
+    part, state_path = _part_paths(output_dir, url)
+    part.parent.mkdir(parents=True, exist_ok=True)
 
-    head_resp = await head_request(session, url, timeout_seconds)
-    if head_resp is not None:
-        try:
-            head_resp.raise_for_status()
-        except Exception:
-            pass
-        content_length = head_resp.headers.get("Content-Length") if head_resp else None
-        if content_length is not None:
-            try:
-                size_bytes = int(content_length)
-                if size_bytes > max_file_size_kb * 1024:
-                    raise DownloadError("File too large by preflight check")
-            except Exception:
-                pass
+    if head_preflight:
+        # Opt-in for hosts known to serve huge files; otherwise the GET headers decide (see below)
+        head_resp = await head_request(session, url, timeout_seconds)
+        content_length = head_resp.headers.get("Content-Length") if head_resp is not None and head_resp.ok else None
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_file_size_kb * 1024:
+            raise DownloadSkipped("File too large by preflight check")
 
     attempt = 0
     while True:
+        retry_after: Optional[float] = None
+        started = time.monotonic()
         try:
+            state = _load_part_state(state_path, url)
+            if state is not None and state.segments > 1 and state.total and state.validator:
+                sha256 = await _download_segmented(
+                    session, url, part, state.total, state.segments, state.validator, timeout_seconds, observer, writer
+                )
+                dest, duplicate = _finalize_part(part, state_path, output_dir, url, sha256, named_links)
+                return DownloadResult(
+                    path=dest,
+                    content_type=state.content_type,
+                    size_kb=round(state.total / 1024.0, 3),
+                    etag=state.etag,
+                    last_modified=state.last_modified,
+                    sha256=sha256,
+                    duplicate=duplicate,
+                )
+
+            # Resume what an earlier attempt left behind, but only if If-Range can prove it is the same entity
+            offset = part.stat().st_size if part.exists() else 0
+            if offset and (state is None or state.validator is None):
+                _discard_part(part, state_path)
+                offset, state = 0, None
+            headers = _request_headers(etag, last_modified)
+            headers["Accept-Encoding"] = _FILE_ENCODINGS
+            if offset and state is not None and state.validator is not None:
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = state.validator
+
             timeout = aiohttp.ClientTimeout(total=timeout_seconds)
-            async with session.get(url, timeout=timeout, headers=_DEFAULT_HEADERS) as resp:
+            async with session.get(url, timeout=timeout, headers=headers) as resp:
+                if resp.status in RETRY_AFTER_STATUSES:
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                if observer is not None:
+                    observer(resp.status, time.monotonic() - started, retry_after)
+                if resp.status == 304:
+                    _discard_part(part, state_path)
+                    return DownloadResult(
+                        path=None,
+                        content_type=resp.headers.get("Content-Type"),
+                        size_kb=0.0,
+                        etag=resp.headers.get("ETag") or etag,
+                        last_modified=resp.headers.get("Last-Modified") or last_modified,
+                    )
+                if resp.status == 416 and offset:
+                    raise _DiscardPart("Stored partial download no longer matches the resource")
                 resp.raise_for_status()
-                content_type = resp.headers.get("Content-Type")
-                content_length = resp.headers.get("Content-Length")
-                if content_length is not None:
-                    try:
-                        if int(content_length) > max_file_size_kb * 1024:
-                            raise DownloadError("File too large (content-length)")
-                    except Exception:
-                        pass
-                filename = _safe_filename_from_url(url)
-                dest = output_dir / filename
-                counter = 1
-                while dest.exists() and counter < 1000:
-                    dest = output_dir / f"{dest.stem}_{counter}{dest.suffix}"
-                    counter += 1
-                size_bytes = 0
-                with dest.open("wb") as f:
-                    async for chunk in resp.content.iter_chunked(1024 * 64):
+
+                range_start, range_total = _parse_content_range(resp.headers.get("Content-Range"))
+                encoded = False
+                if resp.status == 206 and offset and state is not None:
+                    if range_start != offset:
+                        raise _DiscardPart("Unexpected Content-Range on resume")
+                    total = range_total if range_total is not None else state.total
+                else:
+                    # Full body: either a fresh download or the entity changed and If-Range sent it all
+                    offset = 0
+                    content_length = resp.headers.get("Content-Length")
+                    encoded = resp.headers.get("Content-Encoding", "identity").lower() != "identity"
+                    if encoded:
+                        # Sent encoded anyway and inflated on the way in: the encoded length says nothing about
+                        # the stored bytes, and a Range resume would point into the encoded entity
+                        content_length = None
+                    total = int(content_length) if content_length and content_length.isdigit() else None
+                    state = _PartState(
+                        url=url,
+                        etag=resp.headers.get("ETag"),
+                        last_modified=resp.headers.get("Last-Modified"),
+                        content_type=resp.headers.get("Content-Type"),
+                        total=total,
+                    )
+                if total is not None and total > max_file_size_kb * 1024:
+                    raise DownloadSkipped("File too large (content-length)")
+                # A "file" link that answers with an HTML page is usually a login wall or an error page,
+                # or a dataset landing page behind an extension-less URL
+                sniff = offset == 0
+
+                if (
+                    offset == 0
+                    and segments > 1
+                    and total is not None
+                    and total >= segment_min_size_kb * 1024
+                    and resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+                    and state.validator is not None
+                ):
+                    # Leave this body unread and fetch the file as parallel byte ranges instead
+                    state.segments = segments
+                    _discard_part(part, state_path)
+                    _save_part_state(state_path, state)
+                    resp.close()
+                    raise _SwitchToSegments()
+
+                if offset == 0 and encoded:
+                    state_path.unlink(missing_ok=True)  # a failed transfer restarts from zero
+                else:
+                    _save_part_state(state_path, state)
+                digest = hashlib.sha256()
+                if offset:
+                    await asyncio.to_thread(_hash_file, part, digest)
+                size_bytes = offset
+                f = await writer.open(part, "ab" if offset else "wb")
+                try:
+                    async for chunk in resp.content.iter_chunked(_CHUNK_SIZE):
                         if chunk:
-                            f.write(chunk)
+                            if sniff:
+                                sniff = False
+                                if classify_response(state.content_type, chunk, FILE) == PAGE:
+                                    if page_max_bytes > 0:
+                                        raise PageInstead(await _read_page(resp, chunk, page_max_bytes, state))
+                                    raise DownloadSkipped("HTML page instead of a file")
+                            await f.write(chunk)
+                            digest.update(chunk)
                             size_bytes += len(chunk)
                             if size_bytes > max_file_size_kb * 1024:
-                                raise DownloadError("File too large (stream)")
-                size_kb = round(size_bytes / 1024.0, 3)
-                return dest, content_type, size_kb
+                                raise DownloadSkipped("File too large (stream)")
+                finally:
+                    # Also on failure: whatever arrived stays in the .part file for the next attempt to resume
+                    await f.close()
+                if total is not None and size_bytes != total:
+                    raise DownloadError("Body ended before Content-Length")
+            sha256 = digest.hexdigest()
+            dest, duplicate = _finalize_part(part, state_path, output_dir, url, sha256, named_links)
+            return DownloadResult(
+                path=dest,
+                content_type=state.content_type,
+                size_kb=round(size_bytes / 1024.0, 3),
+                etag=state.etag,
+                last_modified=state.last_modified,
+                sha256=sha256,
+                duplicate=duplicate,
+            )
+        except _SwitchToSegments:
+            continue
         except Exception as e:
+            if observer is not None and isinstance(e, asyncio.TimeoutError):
+                observer(None, time.monotonic() - started, None)
+            if isinstance(e, (_DiscardPart, DownloadSkipped)):
+                _discard_part(part, state_path)
+            if isinstance(e, DownloadSkipped):
+                raise
             attempt += 1
             if attempt > max_retries:
                 raise
-            delay = backoff_base_seconds * (2 ** (attempt - 1))
-            await asyncio.sleep(min(delay, 10))
+            delay = min(backoff_base_seconds * (2 ** (attempt - 1)), 10)
+            if retry_after is not None:
+                # The server told us when to come back; retrying earlier just burns an attempt
+                delay = max(delay, min(retry_after, max_retry_after_seconds))
+            await asyncio.sleep(delay)
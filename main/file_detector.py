@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import mimetypes
-from typing import Optional
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 ALLOWED_EXTENSIONS = {
     ".csv",
@@ -50,3 +53,150 @@ def is_downloadable_url(url: str, content_type_hint: Optional[str] = None) -> bo
 def guess_mime_from_url(url: str) -> Optional[str]:
     mime, _ = mimetypes.guess_type(url)
     return mime
+
+
+# Verdicts for a response: parse it as a page or store it as a file (same strings as the frontier kinds)
+PAGE = "page"
+FILE = "file"
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+# Bodies these sniff as can still be a page when the server says it sent HTML (fragments, XHTML)
+_TEXTUAL_TYPES = ("", "text/plain", "text/xml", "application/xml")
+_SNIFF_BYTES = 2048
+
+# Used when libmagic is not available; anything binary that is not listed is still "not a page"
+_SIGNATURES = (
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\x1f\x8b", "application/gzip"),
+    (b"PAR1", "application/vnd.apache.parquet"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/vnd.ms-excel"),
+    (b"BZh", "application/x-bzip2"),
+    (b"\xfd7zXZ\x00", "application/x-xz"),
+    (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+)
+
+_magic: Any = None  # libmagic handle once loaded, False if python-magic or libmagic is missing
+
+
+def _libmagic() -> Any:
+    global _magic
+    if _magic is None:
+        try:
+            import magic
+
+            _magic = magic.Magic(mime=True)
+        except Exception:
+            _magic = False
+    return _magic or None
+
+
+def looks_like_html(head: bytes) -> bool:
+    text = head[:1024].lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith((b"<!doctype html", b"<html", b"<head", b"<body")):
+        return True
+    # After an XML declaration or a leading comment
+    return text.startswith((b"<?xml", b"<!--")) and (b"<!doctype html" in text or b"<html" in text)
+
+
+def sniff_mime(head: bytes) -> str:
+    # MIME type of a body judged from its first bytes
+    head = head[:_SNIFF_BYTES]
+    if not head:
+        return ""
+    if looks_like_html(head):
+        return "text/html"
+    detector = _libmagic()
+    if detector is not None:
+        try:
+            return detector.from_buffer(head) or "application/octet-stream"
+        except Exception:
+            pass
+    for signature, mime in _SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    if b"\x00" in head:
+        return "application/octet-stream"
+    stripped = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if stripped.startswith(b"<?xml"):
+        return "application/xml"
+    if stripped[:1] in (b"{", b"["):
+        return "application/json"
+    return "text/plain"
+
+
+def classify_response(content_type: Optional[str], head: bytes, default: str) -> str:
+    # The Content-Type header says what the server meant to send; the first bytes say what it sent.
+    # An HTML error page served as text/plain or application/octet-stream is a page, and a CSV
+    # behind /download?id=123 is a file. default covers an empty body.
+    declared = (content_type or "").split(";", 1)[0].strip().lower()
+    sniffed = sniff_mime(head)
+    if sniffed in HTML_CONTENT_TYPES:
+        return PAGE
+    if not head:
+        return PAGE if declared in HTML_CONTENT_TYPES else default
+    if declared in HTML_CONTENT_TYPES and sniffed in _TEXTUAL_TYPES:
+        return PAGE
+    return FILE
+
+
+_ID_SEGMENT = re.compile(r"\d+|[0-9a-f]{8,}|[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}", re.IGNORECASE)
+
+
+def url_shape(url: str) -> Tuple[str, str]:
+    # (host, shape): ID-like path segments and file names become "*", query values are dropped,
+    # so /dataset/42, /dataset/43 and /download?id=1, /download?id=2 share a shape
+    parts = urlsplit(url)
+    segments = parts.path.split("/")
+    shaped = ["*" if _ID_SEGMENT.fullmatch(segment) else segment for segment in segments[:-1]]
+    last = segments[-1]
+    stem, dot, ext = last.rpartition(".")
+    if dot and stem:
+        shaped.append("*." + ext.lower())
+    else:
+        shaped.append("*" if _ID_SEGMENT.fullmatch(last) else last)
+    names = sorted({pair.split("=", 1)[0] for pair in parts.query.split("&") if pair})
+    return parts.netloc.lower(), "/".join(shaped) + ("?" + "&".join(names) if names else "")
+
+
+class VerdictCache:
+    # What responses under each URL shape of a host turned out to be, so later links of that
+    # shape are routed to the right pipeline before they are requested. A shape gets a verdict
+    # after min_agree matching responses and loses it for good on the first disagreement.
+    def __init__(self, min_agree: int = 2, max_shapes: int = 10000) -> None:
+        self.min_agree = max(1, min_agree)
+        self.max_shapes = max_shapes
+        self._shapes: "OrderedDict[Tuple[str, str], List[int]]" = OrderedDict()  # shape -> [pages, files]
+
+    @property
+    def shapes(self) -> int:
+        return len(self._shapes)
+
+    def get(self, url: str) -> Optional[str]:
+        counts = self._shapes.get(url_shape(url))
+        if counts is None:
+            return None
+        pages, files = counts
+        if pages and files:
+            return None  # mixed: this shape has to be decided per response
+        if pages >= self.min_agree:
+            return PAGE
+        if files >= self.min_agree:
+            return FILE
+        return None
+
+    def put(self, url: str, verdict: str) -> None:
+        shape = url_shape(url)
+        counts = self._shapes.get(shape)
+        if counts is None:
+            counts = self._shapes[shape] = [0, 0]
+            if len(self._shapes) > self.max_shapes:
+                self._shapes.popitem(last=False)
+        else:
+            self._shapes.move_to_end(shape)
+        counts[0 if verdict == PAGE else 1] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {f"{host}{shape}": {"pages": counts[0], "files": counts[1]} for (host, shape), counts in self._shapes.items()}
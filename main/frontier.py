@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from sqlalchemy import and_, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from .config import Settings
+from .db import crawl_frontier, crawl_runs, get_engine
+from .seen import url_fingerprint
+
+PAGE = "page"
+FILE = "file"
+
+PENDING = "pending"
+LEASED = "leased"  # claimed by a worker of a distributed run
+DONE = "done"
+
+# Settings that describe the shape of a crawl and are restored on resume.
+# Everything else (DB URL, credentials, timeouts) comes from the current environment.
+RESUMABLE_FIELDS = (
+    "start_url",
+    "max_depth",
+    "max_concurrency",
+    "per_host_concurrency",
+    "download_concurrency",
+    "per_host_download_concurrency",
+    "output_dir",
+    "enable_ai",
+    "ai_model",
+    "link_extractor",
+    "frontier_shards",
+)
+
+_UPDATE_CHUNK = 500
+
+
+@dataclass
+class FrontierEntry:
+    url: str
+    kind: str
+    depth: int
+    priority: float
+
+
+@dataclass
+class RunInfo:
+    id: int
+    start_url: str
+    status: str
+    settings: Dict[str, Any]
+    created_at: datetime
+    updated_at: datetime
+
+
+def url_hash(url: str) -> str:
+    return f"{url_fingerprint(url):016x}"
+
+
+def host_shard(url: str, shards: int) -> int:
+    # Stable across processes and machines (unlike hash()), so a host always lands in the same shard
+    return url_fingerprint(urlsplit(url).netloc.lower()) % max(1, shards)
+
+
+def _settings_to_json(settings: Settings) -> str:
+    values = asdict(settings)
+    data = {k: values[k] for k in RESUMABLE_FIELDS}
+    data["output_dir"] = str(data["output_dir"])
+    return json.dumps(data)
+
+
+def settings_overrides(info: RunInfo) -> Dict[str, Any]:
+    overrides = {k: v for k, v in info.settings.items() if k in RESUMABLE_FIELDS}
+    if "output_dir" in overrides:
+        overrides["output_dir"] = Path(overrides["output_dir"])
+    return overrides
+
+
+def create_run(start_url: str, settings: Settings, engine: Optional[Engine] = None) -> int:
+    engine = engine or get_engine()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        result = conn.execute(
+            insert(crawl_runs).values(
+                start_url=start_url,
+                status="running",
+                settings=_settings_to_json(settings),
+                created_at=now,
+                updated_at=now,
+            )
+        )
+        return int(result.inserted_primary_key[0])
+
+
+def set_run_status(run_id: int, status: str, engine: Optional[Engine] = None) -> None:
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        conn.execute(
+            update(crawl_runs).where(crawl_runs.c.id == run_id).values(status=status, updated_at=datetime.utcnow())
+        )
+
+
+def _row_to_run(row: Any) -> RunInfo:
+    try:
+        settings = json.loads(row.settings or "{}")
+    except ValueError:
+        settings = {}
+    return RunInfo(
+        id=row.id,
+        start_url=row.start_url,
+        status=row.status,
+        settings=settings,
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+    )
+
+
+def get_run(run_id: int, engine: Optional[Engine] = None) -> Optional[RunInfo]:
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        row = conn.execute(select(crawl_runs).where(crawl_runs.c.id == run_id)).first()
+    return _row_to_run(row) if row is not None else None
+
+
+def list_runs(limit: int = 20, engine: Optional[Engine] = None) -> List[RunInfo]:
+    engine = engine or get_engine()
+    stmt = select(crawl_runs).order_by(crawl_runs.c.id.desc()).limit(limit)
+    with engine.connect() as conn:
+        return [_row_to_run(row) for row in conn.execute(stmt)]
+
+
+def load_frontier(run_id: int, engine: Optional[Engine] = None) -> Tuple[List[str], List[FrontierEntry]]:
+    engine = engine or get_engine()
+    # Returns every URL the run has seen (to rebuild the seen-set) and the entries still pending
+    seen: List[str] = []
+    pending: List[FrontierEntry] = []
+    stmt = select(
+        crawl_frontier.c.url,
+        crawl_frontier.c.kind,
+        crawl_frontier.c.depth,
+        crawl_frontier.c.priority,
+        crawl_frontier.c.state,
+    ).where(crawl_frontier.c.run_id == run_id)
+    with engine.connect() as conn:
+        for row in conn.execute(stmt):
+            seen.append(row.url)
+            if row.state != DONE:
+                # Leased rows were in flight in a worker of a distributed run
+                pending.append(FrontierEntry(url=row.url, kind=row.kind, depth=row.depth, priority=row.priority))
+    return seen, pending
+
+
+class FrontierBatch:
+    def __init__(self, added: List[FrontierEntry], done: List[Tuple[str, str]]) -> None:
+        self.added = added
+        self.done = done
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.done)
+
+
+class FrontierStore:
+    # Buffers frontier changes in memory. The crawler takes a batch on the event loop
+    # and writes it in one transaction from a worker thread (asyncio.to_thread).
+    def __init__(self, engine: Engine, run_id: int, shards: int = 0) -> None:
+        self.engine = engine
+        self.run_id = run_id
+        self.shards = shards
+        self._added: List[FrontierEntry] = []
+        self._done: List[Tuple[str, str]] = []
+        self._write_lock = threading.Lock()  # keeps inserts ordered before later "done" updates
+        self.persisted = 0
+
+    @property
+    def dirty(self) -> int:
+        return len(self._added) + len(self._done)
+
+    def add(self, entry: FrontierEntry) -> None:
+        self._added.append(entry)
+
+    def mark_done(self, url: str, kind: str) -> None:
+        self._done.append((kind, url_hash(url)))
+
+    def take(self) -> FrontierBatch:
+        batch = FrontierBatch(self._added, self._done)
+        self._added, self._done = [], []
+        return batch
+
+    def restore(self, batch: FrontierBatch) -> None:
+        # Put a batch that failed to write back in front of newer changes
+        self._added[:0] = batch.added
+        self._done[:0] = batch.done
+
+    def write(self, batch: FrontierBatch) -> None:
+        if not batch:
+            return
+        rows = [
+            {
+                "run_id": self.run_id,
+                "kind": e.kind,
+                "url_hash": url_hash(e.url),
+                "url": e.url,
+                "depth": e.depth,
+                "priority": e.priority,
+                "state": PENDING,
+                "shard": host_shard(e.url, self.shards) if self.shards > 0 else None,
+            }
+            for e in batch.added
+        ]
+        with self._write_lock:
+            self._write_rows(rows, batch.done)
+        self.persisted += len(rows)
+
+    def _write_rows(self, rows: List[Dict[str, Any]], done: List[Tuple[str, str]]) -> None:
+        dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(self.engine.dialect.name)
+        if dialect is not None:
+            # Workers of a distributed run routinely add the same link; skip it in the same statement
+            with self.engine.begin() as conn:
+                if rows:
+                    conn.execute(dialect.insert(crawl_frontier).on_conflict_do_nothing(), rows)
+                self._write_done(conn, done)
+            return
+        try:
+            with self.engine.begin() as conn:
+                if rows:
+                    conn.execute(insert(crawl_frontier), rows)
+                self._write_done(conn, done)
+        except IntegrityError:
+            # A row already exists (e.g. re-added after resume); fall back to row-by-row
+            with self.engine.begin() as conn:
+                for row in rows:
+                    try:
+                        with conn.begin_nested():
+                            conn.execute(insert(crawl_frontier).values(**row))
+                    except IntegrityError:
+                        pass
+                self._write_done(conn, done)
+
+    def _write_done(self, conn: Any, done: List[Tuple[str, str]]) -> None:
+        by_kind: Dict[str, List[str]] = {}
+        for kind, h in done:
+            by_kind.setdefault(kind, []).append(h)
+        for kind, hashes in by_kind.items():
+            for i in range(0, len(hashes), _UPDATE_CHUNK):
+                conn.execute(
+                    update(crawl_frontier)
+                    .where(
+                        and_(
+                            crawl_frontier.c.run_id == self.run_id,
+                            crawl_frontier.c.kind == kind,
+                            crawl_frontier.c.url_hash.in_(hashes[i : i + _UPDATE_CHUNK]),
+                        )
+                    )
+                    .values(state=DONE)
+                )
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+THROTTLE_STATUSES = {429, 503}
+
+
+@dataclass
+class HostControl:
+    limit: float
+    latency_ewma: Optional[float] = None
+    baseline_latency: Optional[float] = None
+    successes: int = 0
+    throttles: int = 0
+    errors: int = 0
+    backoff_until: float = 0.0
+    last_status: Optional[int] = None
+    updated_at: float = field(default_factory=time.monotonic)
+
+
+class AdaptiveHostController:
+    # AIMD per host: the concurrency limit grows by roughly one slot per "window" of
+    # successful requests while latency stays near the host's best observed latency,
+    # and is cut multiplicatively on 429/503/timeouts, honoring Retry-After.
+    def __init__(
+        self,
+        initial_limit: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        base_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 120.0,
+        adaptive: bool = True,
+    ) -> None:
+        self.initial_limit = max(1, initial_limit)
+        self.min_limit = max(1, min(min_limit, self.initial_limit))
+        self.max_limit = max(self.initial_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.adaptive = adaptive
+        self._hosts: Dict[str, HostControl] = {}
+        # Called with (host, delay_seconds) on backoff and (host, 0.0) when a limit grows
+        self.listeners: List[Callable[[str, float], None]] = []
+
+    def _control(self, host: str) -> HostControl:
+        control = self._hosts.get(host)
+        if control is None:
+            control = self._hosts[host] = HostControl(limit=float(self.initial_limit))
+        return control
+
+    def limit_for(self, host: str) -> int:
+        control = self._hosts.get(host)
+        if control is None:
+            return self.initial_limit
+        return max(self.min_limit, int(control.limit))
+
+    def on_success(self, host: str, latency_seconds: float, status: Optional[int] = None) -> None:
+        control = self._control(host)
+        control.successes += 1
+        control.last_status = status
+        control.updated_at = time.monotonic()
+        if control.latency_ewma is None:
+            control.latency_ewma = latency_seconds
+        else:
+            control.latency_ewma = 0.8 * control.latency_ewma + 0.2 * latency_seconds
+        if control.baseline_latency is None or control.latency_ewma < control.baseline_latency:
+            control.baseline_latency = control.latency_ewma
+        if not self.adaptive:
+            return
+        if control.latency_ewma > control.baseline_latency * self.latency_tolerance:
+            return  # latency is climbing: hold the limit instead of adding load
+        before = int(control.limit)
+        control.limit = min(float(self.max_limit), control.limit + 1.0 / max(1.0, control.limit))
+        if int(control.limit) > before:
+            self._notify(host, 0.0)
+
+    def on_throttle(self, host: str, status: Optional[int] = None, retry_after: Optional[float] = None) -> float:
+        # 429/503 or a timeout: cut the limit and pause the host; returns the pause in seconds
+        control = self._control(host)
+        control.throttles += 1
+        control.last_status = status
+        control.updated_at = time.monotonic()
+        if self.adaptive:
+            control.limit = max(float(self.min_limit), control.limit * self.decrease_factor)
+        if retry_after is not None:
+            delay = min(max(0.0, retry_after), self.max_backoff_seconds)
+        else:
+            streak = min(control.throttles, 8)
+            delay = min(self.base_backoff_seconds * (2 ** (streak - 1)), self.max_backoff_seconds)
+        control.backoff_until = max(control.backoff_until, time.monotonic() + delay)
+        self._notify(host, delay)
+        return delay
+
+    def on_error(self, host: str) -> None:
+        # Non-load-related failure (DNS, 404, reset): recorded but does not move the limit
+        control = self._control(host)
+        control.errors += 1
+        control.updated_at = time.monotonic()
+
+    def observe(self, host: str, status: Optional[int], latency_seconds: float, retry_after: Optional[float]) -> None:
+        # Single entry point for request outcomes; status None means the request timed out
+        if status is None or status in THROTTLE_STATUSES:
+            self.on_throttle(host, status, retry_after)
+        elif status < 400:
+            self.on_success(host, latency_seconds, status)
+        else:
+            self.on_error(host)
+
+    def snapshot(self, limit: int = 50) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        hosts = sorted(self._hosts.items(), key=lambda kv: kv[1].updated_at, reverse=True)[:limit]
+        return {
+            host: {
+                "limit": self.limit_for(host),
+                "latency_ms": round(c.latency_ewma * 1000, 1) if c.latency_ewma is not None else None,
+                "baseline_ms": round(c.baseline_latency * 1000, 1) if c.baseline_latency is not None else None,
+                "successes": c.successes,
+                "throttles": c.throttles,
+                "errors": c.errors,
+                "backoff_seconds": round(max(0.0, c.backoff_until - now), 2),
+                "last_status": c.last_status,
+            }
+            for host, c in hosts
+        }
+
+    def _notify(self, host: str, delay: float) -> None:
+        for listener in self.listeners:
+            listener(host, delay)
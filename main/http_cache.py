@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from .db import get_engine, http_validators
+from .frontier import url_hash
+
+
+@dataclass
+class Validators:
+    url: str
+    kind: str  # frontier.PAGE or frontier.FILE
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    file_name: Optional[str] = None
+    content_type: Optional[str] = None
+    file_size_kb: Optional[float] = None
+    links: Optional[List[str]] = None
+    score: Optional[float] = None
+
+
+def get_validators(url: str, engine: Optional[Engine] = None) -> Optional[Validators]:
+    engine = engine or get_engine()
+    stmt = select(http_validators).where(http_validators.c.url_hash == url_hash(url))
+    with engine.connect() as conn:
+        row = conn.execute(stmt).mappings().first()
+    # The key is a 64-bit fingerprint; the stored URL rules out the rare collision
+    if row is None or row["url"] != url:
+        return None
+    return Validators(
+        url=row["url"],
+        kind=row["kind"],
+        etag=row["etag"],
+        last_modified=row["last_modified"],
+        content_hash=row["content_hash"],
+        file_name=row["file_name"],
+        content_type=row["content_type"],
+        file_size_kb=float(row["file_size_kb"]) if row["file_size_kb"] is not None else None,
+        links=json.loads(row["links"]) if row["links"] is not None else None,
+        score=row["score"],
+    )
+
+
+def put_validators(validators: Validators, engine: Optional[Engine] = None) -> None:
+    engine = engine or get_engine()
+    key = url_hash(validators.url)
+    values = {
+        "url": validators.url,
+        "kind": validators.kind,
+        "etag": validators.etag,
+        "last_modified": validators.last_modified,
+        "content_hash": validators.content_hash,
+        "file_name": validators.file_name,
+        "content_type": validators.content_type,
+        "file_size_kb": validators.file_size_kb,
+        "links": json.dumps(validators.links) if validators.links is not None else None,
+        "score": validators.score,
+        "updated_at": datetime.utcnow(),
+    }
+    # Re-crawls mostly refresh existing rows, so try the update first
+    with engine.begin() as conn:
+        result = conn.execute(update(http_validators).where(http_validators.c.url_hash == key).values(**values))
+        if result.rowcount:
+            return
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(http_validators).values(url_hash=key, **values))
+    except IntegrityError:
+        # Inserted concurrently by another worker; last writer wins
+        with engine.begin() as conn:
+            conn.execute(update(http_validators).where(http_validators.c.url_hash == key).values(**values))
+
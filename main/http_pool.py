@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+
+from .config import Settings
+from .metrics import PHASE_SECONDS
+
+
+# Resolver-level cache kept by a pool across its connectors, so a new crawl on a shared pool (every
+# web crawl uses the same one) does not start with cold DNS. Entries live for the configured TTL and
+# at most max_entries are kept; the wrapped resolver is created on first use and dropped on close.
+class CachingResolver(AbstractResolver):
+    def __init__(
+        self, ttl_seconds: float, resolver: Optional[AbstractResolver] = None, max_entries: int = 4096
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._resolver = resolver
+        # Every entry gets the same TTL, so insertion order is expiry order
+        self._cache: "OrderedDict[Tuple[str, int, int], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, host: str, port: int = 0, family: int = 0) -> List[Dict[str, Any]]:
+        key = (host, port, family)
+        entry = self._cache.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        if self._resolver is None:
+            self._resolver = DefaultResolver()
+        addresses = await self._resolver.resolve(host, port, family)
+        self._cache[key] = (now + self.ttl_seconds, addresses)
+        self._cache.move_to_end(key)
+        while self._cache:
+            oldest = next(iter(self._cache.values()))
+            if oldest[0] > now and len(self._cache) <= self.max_entries:
+                break
+            self._cache.popitem(last=False)
+        return addresses
+
+    async def close(self) -> None:
+        if self._resolver is not None:
+            await self._resolver.close()
+            self._resolver = None
+
+
+# One connector for every session that shares it: global and per-host socket caps, DNS TTL
+# caching and keep-alive, plus counters fed by an aiohttp TraceConfig. Occupancy is counted from
+# the same signals: a connection is active from the moment a request gets it until the response
+# releases it (body read or closed) or the request fails.
+class HttpPool:
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._resolver: Optional[CachingResolver] = None
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_connection_create_start.append(self._on_create_start)
+        self.trace_config.on_connection_create_end.append(self._on_created)
+        self.trace_config.on_dns_resolvehost_start.append(self._on_dns_start)
+        self.trace_config.on_dns_resolvehost_end.append(self._on_dns_end)
+        self.trace_config.on_connection_reuseconn.append(self._on_reused)
+        self.trace_config.on_request_end.append(self._on_request_done)
+        self.trace_config.on_request_exception.append(self._on_request_done)
+        self.trace_config.on_connection_queued_start.append(self._on_queued)
+        self.trace_config.on_dns_cache_hit.append(self._on_dns_hit)
+        self.trace_config.on_dns_cache_miss.append(self._on_dns_miss)
+        self.created = 0
+        self.reused = 0
+        self.queued = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self.active = 0
+        self.peak_active = 0
+
+    @property
+    def connector(self) -> aiohttp.TCPConnector:
+        # Built lazily: aiohttp binds a connector to the running event loop
+        if self._connector is None or self._connector.closed:
+            if self.settings.local_resolver_cache and self._resolver is None:
+                self._resolver = CachingResolver(self.settings.dns_cache_ttl_seconds)
+            self._connector = aiohttp.TCPConnector(
+                limit=max(0, self.settings.http_pool_limit),
+                limit_per_host=max(0, self.settings.http_pool_limit_per_host),
+                use_dns_cache=self.settings.dns_cache_ttl_seconds > 0,
+                ttl_dns_cache=self.settings.dns_cache_ttl_seconds or None,
+                keepalive_timeout=self.settings.keepalive_timeout_seconds,
+                resolver=self._resolver,
+            )
+        return self._connector
+
+    def session(self, **kwargs: Any) -> aiohttp.ClientSession:
+        # Sessions borrow the pool; closing one leaves the connector open for the next crawler
+        return aiohttp.ClientSession(
+            connector=self.connector,
+            connector_owner=False,
+            trace_configs=[self.trace_config],
+            **kwargs,
+        )
+
+    async def close(self) -> None:
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+        if self._resolver is not None:
+            await self._resolver.close()
+
+    def stats(self) -> Dict[str, float]:
+        active = self.active
+        dns_hits = self.dns_hits + (self._resolver.hits if self._resolver is not None else 0)
+        dns_misses = self.dns_misses if self._resolver is None else self._resolver.misses
+        return {
+            "pool_limit": self.settings.http_pool_limit,
+            "pool_active": active,
+            "pool_peak_active": self.peak_active,
+            "pool_occupancy": round(active / self.settings.http_pool_limit, 3) if self.settings.http_pool_limit > 0 else 0.0,
+            "pool_connections_created": self.created,
+            "pool_connections_reused": self.reused,
+            "pool_reuse_ratio": round(self.reused / max(1, self.created + self.reused), 3),
+            "pool_waits": self.queued,
+            "dns_cache_hits": dns_hits,
+            "dns_cache_misses": dns_misses,
+            "dns_hit_rate": round(dns_hits / max(1, dns_hits + dns_misses), 3),
+        }
+
+    async def _on_create_start(self, session: aiohttp.ClientSession, ctx: Any, params: Any) -> None:
+        ctx.connect_started = time.perf_counter()
+
+    async def _on_created(self, session: aiohttp.ClientSession, ctx: Any, params: Any) -> None:
+        self.created += 1
+        self._acquired(ctx)
+        # Includes DNS when the lookup missed the cache; the dns phase is recorded separately
+        started = getattr(ctx, "connect_started", None)
+        if started is not None:
+            PHASE_SECONDS.observe(time.perf_counter() - started, "connect")
+
+    async def _on_dns_start(self, session: aiohttp.ClientSession, ctx: Any, params: Any) -> None:
+        ctx.dns_started = time.perf_counter()
+
+    async def _on_dns_end(self, session: aiohttp.ClientSession, ctx: Any, params: Any) -> None:
+        started = getattr(ctx, "dns_started", None)
+        if started is not None:
+            PHASE_SECONDS.observe(time.perf_counter() - started, "dns")
+
+    async def _on_reused(self, session: aiohttp.ClientSession, ctx: Any, params: Any) -> None:
+        self.reused += 1
+        self._acquired(ctx)
+
+    def _acquired(self, ctx: Any) -> None:
+        # A redirect reuses the trace context, so each request holds at most one count
+        if not getattr(ctx, "holds_connection", False):
+            ctx.holds_connection = True
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    async def _on_request_done(self, session: aiohttp.ClientSession, ctx: Any, params: Any) -> None:
+        if not getattr(ctx, "holds_connection", False):
+            return
+        ctx.holds_connection = False
+        response = getattr(params, "response", None)
+        connection = response.connection if response is not None else None
+        if connection is not None:
+            # The body is still being read: count the connection until the response lets it go
+            connection.add_callback(self._released)
+        else:
+            self._released()
+
+    def _released(self) -> None:
+        self.active -= 1
+
+    async def _on_queued(self, session: aiohttp.ClientSession, ctx: Any, params: Any) -> None:
+        self.queued += 1
+
+    async def _on_dns_hit(self, session: aiohttp.ClientSession, ctx: Any, params: Any) -> None:
+        self.dns_hits += 1
+
+    async def _on_dns_miss(self, session: aiohttp.ClientSession, ctx: Any, params: Any) -> None:
+        self.dns_misses += 1
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+
+from .config import Settings
+from .crawler import IN_FLIGHT_STATS, Crawler, HostPoliteness
+from .db import get_engine, init_db
+from .http_pool import HttpPool
+from .metrics import registry
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+_FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    id: int
+    start_url: str
+    settings: Settings
+    resume_run_id: Optional[int] = None
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    run_id: Optional[int] = None
+    stats: Dict[str, float] = field(default_factory=dict)  # final snapshot once the job has finished
+    crawler: Optional[Crawler] = None
+    task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def live_stats(self) -> Dict[str, float]:
+        return self.crawler.stats if self.crawler is not None else self.stats
+
+    @property
+    def live_run_id(self) -> Optional[int]:
+        # Assigned by the crawler once it has opened (or reopened) its run
+        run_id = self.crawler.run_id if self.crawler is not None else self.run_id
+        return run_id if run_id is not None else self.resume_run_id
+
+    def snapshot(self, hosts: bool = False) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "id": self.id,
+            "start_url": self.start_url,
+            "status": self.status,
+            "run_id": self.live_run_id,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "stats": self.live_stats,
+            "settings": {
+                "max_depth": self.settings.max_depth,
+                "max_concurrency": self.settings.max_concurrency,
+                "download_concurrency": self.settings.download_concurrency,
+                "enable_ai": self.settings.enable_ai,
+            },
+        }
+        if hosts:
+            data["hosts"] = self.crawler.host_stats() if self.crawler is not None else {}
+        return data
+
+
+# Queue of crawl jobs run max_jobs at a time on the current event loop. Every job borrows one
+# HTTP pool (sockets, DNS) and one HostPoliteness, so per-host limits, backoff, robots.txt and
+# Crawl-delay hold across jobs that reach the same host.
+class JobManager:
+    def __init__(
+        self,
+        settings: Settings,
+        max_jobs: int = 2,
+        pool: Optional[HttpPool] = None,
+        history: int = 200,
+        engine: Optional[Engine] = None,
+    ) -> None:
+        self.settings = settings
+        self.max_jobs = max(1, max_jobs)
+        self.history = history
+        self.pool = pool or HttpPool(settings)
+        # One engine (and connection pool) for every job; schema setup happens once, not per job
+        if engine is None:
+            engine = get_engine()
+            init_db(engine)
+        self.engine = engine
+        self.politeness = HostPoliteness(settings)
+        self._jobs: "OrderedDict[int, Job]" = OrderedDict()
+        self._queue: Deque[Job] = deque()
+        self._running: Dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        registry.register_collector("jobs", self._gauges)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def submit(self, start_url: str, settings: Settings, resume_run_id: Optional[int] = None) -> Optional[Job]:
+        # None when that run is already queued or running
+        if resume_run_id is not None and self._active_run(resume_run_id) is not None:
+            return None
+        job = Job(id=next(self._ids), start_url=start_url, settings=settings, resume_run_id=resume_run_id)
+        self._jobs[job.id] = job
+        self._queue.append(job)
+        self._start_ready()
+        return job
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: int) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.status in _FINISHED:
+            return False
+        if job.status == QUEUED:
+            self._queue.remove(job)
+            self._finish(job, CANCELLED)
+        elif job.task is not None:
+            # The crawler marks its run interrupted, so it can be resumed later
+            job.task.cancel()
+        return True
+
+    async def close(self) -> None:
+        for job in list(self._queue):
+            self._finish(job, CANCELLED)
+        self._queue.clear()
+        tasks = [job.task for job in self._running.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.politeness.close()
+        await self.pool.close()
+        self.engine.dispose()
+        registry.unregister_collector("jobs")
+
+    def _active_run(self, run_id: int) -> Optional[Job]:
+        for job in itertools.chain(self._queue, self._running.values()):
+            if job.live_run_id == run_id:
+                return job
+        return None
+
+    def _start_ready(self) -> None:
+        while self._queue and len(self._running) < self.max_jobs:
+            job = self._queue.popleft()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._running[job.id] = job
+            job.task = asyncio.create_task(self._run(job))
+
+    async def _run(self, job: Job) -> None:
+        status = FAILED
+        try:
+            job.crawler = Crawler(
+                job.settings, pool=self.pool, politeness=self.politeness, register_metrics=False, engine=self.engine
+            )
+            await job.crawler.run(job.start_url, resume_run_id=job.resume_run_id)
+            status = COMPLETED
+        except asyncio.CancelledError:
+            # Crawler.run has already marked the run interrupted and flushed its records
+            status = CANCELLED
+        except Exception as e:
+            job.error = str(e)[:300]
+        finally:
+            if job.crawler is not None:
+                job.run_id = job.crawler.run_id
+                job.stats = job.crawler.stats
+                job.crawler = None  # drops the seen-set and queues of a finished job
+            self._running.pop(job.id, None)
+            self._finish(job, status)
+            self._start_ready()
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        finished = [j for j in self._jobs.values() if j.status in _FINISHED]
+        for old in finished[: max(0, len(finished) - self.history)]:
+            del self._jobs[old.id]
+
+    def _gauges(self) -> Dict[str, Dict[Tuple[str, ...], float]]:
+        counts = {status: 0 for status in (QUEUED, RUNNING) + _FINISHED}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        gauges: Dict[str, Dict[Tuple[str, ...], float]] = {
+            "crawler_jobs": {(status,): count for status, count in counts.items()},
+            "crawler_frontier_depth": {},
+            "crawler_in_flight": {(stage,): 0 for stage, _ in IN_FLIGHT_STATS},
+            "crawler_job_stat": {},
+        }
+        # Summed over running jobs, so dashboards built on the single-crawler gauges keep working
+        depth, in_flight = gauges["crawler_frontier_depth"], gauges["crawler_in_flight"]
+        for job in list(self._running.values()):
+            stats = job.live_stats
+            gauges["crawler_job_stat"].update({(str(job.id), name): value for name, value in stats.items()})
+            for stage, stat in (("pages", "pages_queued"), ("downloads", "downloads_queued")):
+                depth[(stage,)] = depth.get((stage,), 0) + stats.get(stat, 0)
+            for stage, stat in IN_FLIGHT_STATS:
+                in_flight[(stage,)] += stats.get(stat, 0)
+        return gauges
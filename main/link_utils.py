@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from typing import Iterable, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional
 from urllib.parse import urljoin, urlsplit, urlunsplit
 
 from bs4 import BeautifulSoup
+from lxml import etree
 
 
 def normalize_url(base_url: str, href: str) -> Optional[str]:
@@ -29,3 +30,98 @@ def extract_links(html: str, base_url: str) -> List[str]:
         if normalized:
             links.append(normalized)
     return links
+
+
+# Tags whose href points at another resource; <base> is handled separately
+LINK_TAGS = ("a", "area", "link")
+# data-* attributes that carry a link on real sites; similar names (data-file-size, data-url-template,
+# data-download-count) hold sizes, counters or templates and are left alone
+DATA_LINK_ATTRS = frozenset(("data-href", "data-url", "data-src", "data-download", "data-download-url", "data-file"))
+
+
+def _looks_like_link(value: str) -> bool:
+    # Absolute URLs and paths only: no whitespace or template braces, and a "/" or "." somewhere
+    value = value.strip()
+    if not value or any(c.isspace() or c in "{}<>" for c in value):
+        return False
+    return "/" in value or "." in value
+
+
+class StreamingLinkExtractor:
+    # lxml parser target: receives start-tag events only, so no DOM is ever built.
+    # Can be fed incrementally with feed() and finished with close().
+    def __init__(
+        self,
+        base_url: str,
+        tags: Iterable[str] = LINK_TAGS,
+        data_attrs: bool = True,
+        encoding: Optional[str] = None,
+    ) -> None:
+        self.base_url = base_url
+        self.tags = frozenset(tags)
+        self.data_attrs = data_attrs
+        self.links: List[str] = []
+        self._base_seen = False
+        # encoding applies to bytes fed in; without it lxml sniffs a BOM or <meta charset>
+        self._parser = etree.HTMLParser(
+            target=self, recover=True, no_network=True, remove_comments=True, encoding=encoding
+        )
+
+    def feed(self, data: str | bytes) -> None:
+        self._parser.feed(data)
+
+    def close(self) -> List[str]:
+        try:
+            self._parser.close()
+        except etree.LxmlError:
+            pass
+        return self.links
+
+    # lxml target interface
+    def start(self, tag: str, attrib: Dict[str, str]) -> None:
+        if tag == "base":
+            href = attrib.get("href")
+            if href and not self._base_seen:
+                self._base_seen = True
+                self.base_url = urljoin(self.base_url, href.strip())
+            return
+        if tag in self.tags:
+            self._add(attrib.get("href"))
+        if self.data_attrs:
+            for name, value in attrib.items():
+                if name in DATA_LINK_ATTRS and _looks_like_link(value):
+                    self._add(value)
+
+    def end(self, tag: str) -> None:
+        pass
+
+    def data(self, data: str) -> None:
+        pass
+
+    def comment(self, text: str) -> None:
+        pass
+
+    def _add(self, href: Optional[str]) -> None:
+        normalized = normalize_url(self.base_url, href)
+        if normalized:
+            self.links.append(normalized)
+
+
+def extract_links_streaming(html: str, base_url: str) -> List[str]:
+    extractor = StreamingLinkExtractor(base_url)
+    if html:
+        extractor.feed(html)
+    return extractor.close()
+
+
+LINK_EXTRACTORS: Dict[str, Callable[[str, str], List[str]]] = {
+    "bs4": extract_links,
+    "streaming": extract_links_streaming,
+}
+
+
+def get_link_extractor(name: str) -> Callable[[str, str], List[str]]:
+    try:
+        return LINK_EXTRACTORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown link extractor: {name!r}") from None
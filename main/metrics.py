@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond parses to minute-long downloads
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+# Updated from the event loop and from writer/DB threads, so every metric carries a lock
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Labels, _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            child = self._children.get(labels)
+            if child is None:
+                child = self._children[labels] = _HistogramChild(self.buckets)
+            index = 0
+            while index < len(self.buckets) and value > self.buckets[index]:
+                index += 1
+            child.counts[index] += 1
+            child.count += 1
+            child.sum += value
+            child.max = max(child.max, value)
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def quantile(self, q: float, *labels: str) -> float:
+        # Estimated from the buckets by linear interpolation, as Prometheus' histogram_quantile does
+        with self._lock:
+            child = self._children.get(labels)
+            if child is None or child.count == 0:
+                return 0.0
+            rank = q * child.count
+            seen = 0
+            lower = 0.0
+            for index, upper in enumerate(self.buckets + (child.max,)):
+                in_bucket = child.counts[index]
+                if in_bucket and seen + in_bucket >= rank:
+                    upper = min(upper, child.max)
+                    return lower + (upper - lower) * (rank - seen) / in_bucket
+                seen += in_bucket
+                lower = upper
+            return child.max
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            children = sorted(self._children.items())
+        for labels, child in children:
+            result["/".join(labels) or self.name] = {
+                "count": child.count,
+                "total_seconds": round(child.sum, 6),
+                "mean_seconds": round(child.sum / child.count, 6) if child.count else 0.0,
+                "p50_seconds": round(self.quantile(0.5, *labels), 6),
+                "p95_seconds": round(self.quantile(0.95, *labels), 6),
+                "p99_seconds": round(self.quantile(0.99, *labels), 6),
+                "max_seconds": round(child.max, 6),
+            }
+        return result
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, child in sorted(self._children.items()):
+                cumulative = 0
+                for upper, count in zip(self.buckets + (math.inf,), child.counts):
+                    cumulative += count
+                    le = _format_labels(self.labelnames, labels, f'le="{_format_value(upper)}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                plain = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{plain} {_format_value(child.sum)}")
+                lines.append(f"{self.name}_count{plain} {child.count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            return {"/".join(labels): value for labels, value in sorted(self._values.items())}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+# Gauges are read at scrape time from collectors (e.g. the running Crawler), never stored
+GaugeCollector = Callable[[], Dict[str, Dict[Labels, float]]]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+        self._gauge_help: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+        self._collectors: Dict[str, GaugeCollector] = {}
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def describe_gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self._gauge_help[name] = (help, tuple(labelnames))
+
+    def register_collector(self, key: str, collector: GaugeCollector) -> None:
+        self._collectors[key] = collector
+
+    def unregister_collector(self, key: str) -> None:
+        self._collectors.pop(key, None)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        gauges: Dict[str, Dict[Labels, float]] = {}
+        for collector in list(self._collectors.values()):
+            try:
+                for name, values in collector().items():
+                    gauges.setdefault(name, {}).update(values)
+            except Exception:
+                continue
+        for name in sorted(gauges):
+            help, labelnames = self._gauge_help.get(name, (name, ()))
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in sorted(gauges[name].items()):
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry: crawlers started one after another (or from the web UI) report into it
+registry = MetricsRegistry()
+
+PHASE_SECONDS = registry.histogram(
+    "crawler_phase_seconds",
+    "Time spent per crawl phase (dns, connect, fetch, parse, score, download, disk_write, fsync, db_insert, checkpoint, warc_write)",
+    ("phase",),
+)
+ERRORS = registry.counter("crawler_errors_total", "Errors by stage and class", ("stage", "kind"))
+registry.describe_gauge("crawler_frontier_depth", "URLs waiting in each queue", ("stage",))
+registry.describe_gauge("crawler_in_flight", "Work in progress per stage", ("stage",))
+registry.describe_gauge("crawler_stat", "Current value of each Crawler.stats entry", ("name",))
+registry.describe_gauge("crawler_jobs", "Web crawl jobs by status", ("status",))
+registry.describe_gauge("crawler_job_stat", "Current value of each Crawler.stats entry per running job", ("job", "name"))
+
+
+def error_kind(error: Optional[BaseException] = None, status: Optional[int] = None) -> str:
+    if status is not None:
+        return f"http_{status}"
+    return type(error).__name__ if error is not None else "unknown"
+
+
+def profile_summary() -> Dict[str, object]:
+    return {"phases": PHASE_SECONDS.summary(), "errors": ERRORS.summary()}
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from .ai_reasoner import default_scorer, heuristic_score
+from .downloader import decode_body
+from .link_utils import StreamingLinkExtractor, get_link_extractor
+
+EXECUTOR_MODES = {"inline", "thread", "process"}
+
+
+def analyze_page(html: str, url: str, link_extractor: str = "bs4") -> Tuple[List[str], float]:
+    # One job per page so a pool worker pays for parse and score together.
+    # AI scoring is network-bound and stays on the event loop (see AIScorer).
+    links = get_link_extractor(link_extractor)(html, url)
+    score = heuristic_score(html, url)
+    return links, score
+
+
+class PageStream:
+    # Incremental analysis for fetch_page(stream=...): bytes go straight into the lxml
+    # link extractor and only the prefix the scorers read is kept, so memory per page
+    # stays bounded no matter how large the body is.
+    def __init__(self, url: str, keep_bytes: int) -> None:
+        self.url = url
+        self.keep_bytes = keep_bytes
+        self._prefix = bytearray()
+        self._charset: Optional[str] = None
+        self._extractor: Optional[StreamingLinkExtractor] = None
+
+    def start(self, charset: Optional[str]) -> None:
+        self._charset = charset
+        self._extractor = StreamingLinkExtractor(self.url, encoding=charset)
+
+    def feed(self, chunk: bytes) -> None:
+        if len(self._prefix) < self.keep_bytes:
+            self._prefix += chunk[: self.keep_bytes - len(self._prefix)]
+        if self._extractor is not None:
+            self._extractor.feed(chunk)
+
+    def finish(self) -> Tuple[List[str], float, str]:
+        # Returns links, heuristic score and the kept text prefix (used for AI scoring)
+        links = self._extractor.close() if self._extractor is not None else []
+        text = decode_body(bytes(self._prefix), self._charset)
+        return links, heuristic_score(text, self.url), text
+
+
+class PageAnalyzer:
+    def __init__(
+        self,
+        mode: str = "inline",
+        workers: int = 0,
+        max_pending: int = 0,
+        link_extractor: str = "bs4",
+    ) -> None:
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown parse executor mode: {mode!r}")
+        get_link_extractor(link_extractor)  # fail fast on a bad name
+        self.mode = mode
+        self.link_extractor = link_extractor
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._executor: Optional[Executor] = None
+        if mode == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="page-parse")
+        elif mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Backpressure: page workers wait here instead of piling fetched HTML in front of the pool
+        self._slots = asyncio.Semaphore(max_pending if max_pending > 0 else self.workers * 2)
+        self.in_flight = 0
+
+    @property
+    def streams(self) -> bool:
+        # Streaming needs the lxml extractor and must run where the bytes arrive, on the event loop
+        return self.mode == "inline" and self.link_extractor == "streaming"
+
+    def stream(self, url: str) -> PageStream:
+        return PageStream(url, keep_bytes=default_scorer().max_chars)
+
+    async def analyze(self, html: str, url: str) -> Tuple[List[str], float]:
+        if self._executor is None:
+            return analyze_page(html, url, self.link_extractor)
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, analyze_page, html, url, self.link_extractor)
+            finally:
+                self.in_flight -= 1
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
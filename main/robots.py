@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+# RFC 9309: crawlers must read at least 500 KiB; anything past that is ignored
+_MAX_ROBOTS_BYTES = 512 * 1024
+
+
+def _compile_rule(pattern: str) -> "re.Pattern[str]":
+    # "*" matches any run of characters, a trailing "$" anchors the end; everything else is literal
+    anchored = pattern.endswith("$")
+    if anchored:
+        pattern = pattern[:-1]
+    regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+    return re.compile(regex + ("$" if anchored else ""))
+
+
+@dataclass
+class RobotsRules:
+    # (specificity, allow, compiled pattern), sorted so the first match is the longest rule,
+    # with Allow winning ties as in RFC 9309
+    rules: List[Tuple[int, bool, "re.Pattern[str]"]] = field(default_factory=list)
+    crawl_delay: Optional[float] = None
+    sitemaps: List[str] = field(default_factory=list)
+
+    def allowed(self, url: str) -> bool:
+        if not self.rules:
+            return True
+        parts = urlsplit(url)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        for _, allow, pattern in self.rules:
+            if pattern.match(target):
+                return allow
+        return True
+
+
+ALLOW_ALL = RobotsRules()
+DISALLOW_ALL = RobotsRules(rules=[(1, False, re.compile(""))])
+
+
+def parse_robots(text: str, user_agent: str) -> RobotsRules:
+    agent = user_agent.lower()
+    groups: Dict[str, List[Tuple[str, str]]] = {}
+    current: List[str] = []
+    in_rules = False
+    sitemaps: List[str] = []
+    for raw in text.splitlines():
+        line = raw.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        name, _, value = line.partition(":")
+        name, value = name.strip().lower(), value.strip()
+        if name == "sitemap":
+            if value:
+                sitemaps.append(value)
+            continue
+        if name == "user-agent":
+            if in_rules:
+                current, in_rules = [], False
+            current.append(value.lower())
+            for token in current:
+                groups.setdefault(token, [])
+            continue
+        if name in ("allow", "disallow", "crawl-delay"):
+            in_rules = True
+            for token in current:
+                groups.setdefault(token, []).append((name, value))
+
+    # The group whose name is the longest substring of our user agent, else "*"
+    matches = [token for token in groups if token != "*" and token and token in agent]
+    lines = groups.get(max(matches, key=len)) if matches else groups.get("*", [])
+    result = RobotsRules(sitemaps=sitemaps)
+    for name, value in lines or []:
+        if name == "crawl-delay":
+            try:
+                result.crawl_delay = max(0.0, float(value))
+            except ValueError:
+                pass
+        elif value:
+            # An empty Disallow allows everything and adds no rule
+            result.rules.append((len(value.rstrip("$")), name == "allow", _compile_rule(value)))
+    result.rules.sort(key=lambda rule: (-rule[0], not rule[1]))
+    return result
+
+
+# One robots.txt fetch per origin; concurrent callers for the same origin share it. Rules are
+# kept for max_age (RFC 9309 suggests at most a day) and failed fetches only for error_ttl, so a
+# long-lived cache shared by many crawls neither goes stale nor pins a transient outage.
+class RobotsCache:
+    def __init__(
+        self,
+        user_agent: str,
+        timeout_seconds: float = 10.0,
+        max_age_seconds: float = 86400.0,
+        error_ttl_seconds: float = 60.0,
+    ) -> None:
+        self.user_agent = user_agent
+        self.timeout_seconds = timeout_seconds
+        self.max_age_seconds = max_age_seconds
+        self.error_ttl_seconds = error_ttl_seconds
+        self._rules: Dict[str, "asyncio.Future[RobotsRules]"] = {}  # origin -> fetch task
+        self._expires: Dict[str, float] = {}
+        self.fetched = 0
+        self.errors = 0
+
+    def close(self) -> None:
+        for task in self._rules.values():
+            task.cancel()
+
+    async def get(self, session: aiohttp.ClientSession, url: str) -> RobotsRules:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        task = self._rules.get(origin)
+        if task is None or (task.done() and self._expires.get(origin, 0.0) <= time.monotonic()):
+            task = self._rules[origin] = asyncio.ensure_future(self._fetch(session, origin))
+        # Shielded: a worker cancelled while waiting does not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, session: aiohttp.ClientSession, origin: str) -> RobotsRules:
+        rules = await self._download(session, origin)
+        failed = rules is DISALLOW_ALL
+        self._expires[origin] = time.monotonic() + (self.error_ttl_seconds if failed else self.max_age_seconds)
+        return rules
+
+    async def _download(self, session: aiohttp.ClientSession, origin: str) -> RobotsRules:
+        timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
+        self.fetched += 1
+        try:
+            async with session.get(f"{origin}/robots.txt", timeout=timeout) as resp:
+                if 400 <= resp.status < 500:
+                    return ALLOW_ALL  # no robots.txt: everything is allowed
+                if resp.status >= 500:
+                    self.errors += 1
+                    return DISALLOW_ALL  # RFC 9309: an unreachable robots.txt means "disallow all"
+                body = bytearray()
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    body += chunk
+                    if len(body) >= _MAX_ROBOTS_BYTES:
+                        break
+        except Exception:
+            # Network errors, timeouts, or the session of the crawl that started the fetch closing
+            self.errors += 1
+            return DISALLOW_ALL
+        return parse_robots(bytes(body[:_MAX_ROBOTS_BYTES]).decode("utf-8", "replace"), self.user_agent)
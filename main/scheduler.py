@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _HostState(Generic[T]):
+    __slots__ = ("heap", "active", "ready_at")
+
+    def __init__(self) -> None:
+        self.heap: List[Tuple[float, int, T]] = []  # (-priority, seq, item)
+        self.active = 0
+        self.ready_at = 0.0
+
+
+class Lease(Generic[T]):
+    # A dequeued item plus the host slot it holds; release() is idempotent so the
+    # slot can be handed back early (e.g. right after the fetch) and again in a finally.
+    __slots__ = ("item", "host", "_scheduler", "_released")
+
+    def __init__(self, scheduler: "HostScheduler[T]", host: str, item: T) -> None:
+        self.item = item
+        self.host = host
+        self._scheduler = scheduler
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self.host)
+
+
+class HostSlots:
+    # In-flight requests per host, shared by several schedulers (e.g. concurrent crawl jobs) so a
+    # host's limit holds across all of them. A release re-offers the host to every scheduler.
+    def __init__(self, limit_for: Callable[[str], int]) -> None:
+        self.limit_for = limit_for
+        self._active: Dict[str, int] = {}
+        self._schedulers: "weakref.WeakSet[HostScheduler[Any]]" = weakref.WeakSet()
+
+    def attach(self, scheduler: "HostScheduler[Any]") -> None:
+        self._schedulers.add(scheduler)
+
+    def active(self, host: str) -> int:
+        return self._active.get(host, 0)
+
+    def full(self, host: str) -> bool:
+        return self._active.get(host, 0) >= max(1, self.limit_for(host))
+
+    def acquire(self, host: str) -> None:
+        self._active[host] = self._active.get(host, 0) + 1
+
+    def release(self, host: str, source: "HostScheduler[Any]") -> None:
+        remaining = self._active.get(host, 0) - 1
+        if remaining > 0:
+            self._active[host] = remaining
+        else:
+            self._active.pop(host, None)
+        for scheduler in list(self._schedulers):
+            if scheduler is not source and scheduler.host_state(host)[0]:
+                scheduler.refresh(host)
+
+
+class HostScheduler(Generic[T]):
+    # Priority frontier with one queue per host. get() only hands out an item whose
+    # host has a free slot and whose ready time has passed, picking the best such item
+    # across hosts, so busy hosts cannot block workers that could serve other hosts.
+    # Equal priorities are served in insertion order (monotonic sequence tiebreaker).
+    # With slots, a host also needs a free slot in that shared pool.
+    def __init__(self, limit_for: Callable[[str], int], maxsize: int = 0, slots: Optional[HostSlots] = None) -> None:
+        self.limit_for = limit_for
+        self.maxsize = maxsize
+        self._slots = slots
+        if slots is not None:
+            slots.attach(self)
+        self._hosts: Dict[str, _HostState[T]] = {}
+        self._ready: List[Tuple[float, int, str]] = []  # candidate (-priority, seq, host), validated lazily
+        self._delayed: List[Tuple[float, str]] = []  # (ready_at, host) for hosts waiting on politeness delays
+        # (ready_at, host) for hosts kept only for their delay (nothing queued or in flight); dropped once it passes
+        self._idle: List[Tuple[float, str]] = []
+        self._intervals: Dict[str, float] = {}  # host -> minimum seconds between dispatches (robots Crawl-delay)
+        self._seq = itertools.count()
+        self._size = 0
+        self._getters: Deque[asyncio.Future[None]] = deque()
+        self._putters: Deque[asyncio.Future[None]] = deque()
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self._size
+
+    @property
+    def hosts(self) -> int:
+        return sum(1 for state in self._hosts.values() if state.heap or state.active)
+
+    @property
+    def active(self) -> int:
+        return sum(state.active for state in self._hosts.values())
+
+    def host_state(self, host: str) -> Tuple[int, int, float]:
+        # (queued, active, seconds until ready) for one host
+        state = self._hosts.get(host)
+        if state is None:
+            return 0, 0, 0.0
+        return len(state.heap), state.active, max(0.0, state.ready_at - time.monotonic())
+
+    def delay_host(self, host: str, seconds: float) -> None:
+        # Push the host's next dispatch out by at least `seconds` (politeness, Retry-After, ...)
+        self._evict_idle()
+        state = self._state(host)
+        state.ready_at = max(state.ready_at, time.monotonic() + seconds)
+        if not state.heap and not state.active:
+            # Delays reach schedulers that never queued the host (shared politeness, other stages)
+            heapq.heappush(self._idle, (state.ready_at, host))
+
+    def set_interval(self, host: str, seconds: float) -> None:
+        # Every later dispatch for the host waits `seconds` after the previous one
+        if seconds > 0:
+            self._intervals[host] = seconds
+        else:
+            self._intervals.pop(host, None)
+
+    def refresh(self, host: str, delay: float = 0.0) -> None:
+        # Re-evaluate a host after its limit or ready time changed (e.g. by a host controller)
+        if delay > 0:
+            self.delay_host(host, delay)
+        self._offer(host)
+        self._wake(self._getters)
+
+    async def put(self, host: str, item: T, priority: float) -> None:
+        # Waits while the scheduler is at maxsize (backpressure for producers)
+        while self.full():
+            await self._wait(self._putters, None)
+        self.put_nowait(host, item, priority)
+
+    def put_nowait(self, host: str, item: T, priority: float) -> None:
+        self._evict_idle()
+        state = self._state(host)
+        entry = (-priority, next(self._seq), item)
+        heapq.heappush(state.heap, entry)
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        if state.heap[0] is entry:
+            heapq.heappush(self._ready, (entry[0], entry[1], host))
+        self._wake(self._getters)
+
+    async def get(self) -> Lease[T]:
+        while True:
+            lease = self._pop()
+            if lease is not None:
+                self._wake(self._putters)
+                if self._ready:
+                    # More hosts may be dispatchable; let another idle worker look
+                    self._wake(self._getters)
+                return lease
+            timeout = self._delayed[0][0] - time.monotonic() if self._delayed else None
+            await self._wait(self._getters, timeout)
+
+    async def _wait(self, waiters: Deque[asyncio.Future[None]], timeout: Optional[float]) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Hand a wakeup we consumed to the next waiter before bailing out
+                self._wake(waiters)
+            raise
+        finally:
+            try:
+                waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def task_done(self) -> None:
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+
+    async def join(self) -> None:
+        await self._finished.wait()
+
+    def _state(self, host: str) -> _HostState[T]:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState()
+        return state
+
+    def _pop(self) -> Optional[Lease[T]]:
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, host = heapq.heappop(self._delayed)
+            self._offer(host)
+        while self._ready:
+            neg_priority, seq, host = heapq.heappop(self._ready)
+            state = self._hosts.get(host)
+            if state is None or not state.heap or state.heap[0][1] != seq:
+                continue  # stale: that item was already taken
+            if state.active >= max(1, self.limit_for(host)):
+                continue  # re-offered by _release
+            if self._slots is not None and self._slots.full(host):
+                continue  # re-offered when another scheduler releases a slot
+            if state.ready_at > now:
+                heapq.heappush(self._delayed, (state.ready_at, host))
+                continue
+            _, _, item = heapq.heappop(state.heap)
+            state.active += 1
+            if self._slots is not None:
+                self._slots.acquire(host)
+            interval = self._intervals.get(host)
+            if interval:
+                state.ready_at = now + interval
+            self._size -= 1
+            self._offer(host)
+            return Lease(self, host, item)
+        return None
+
+    def _evict_idle(self) -> None:
+        now = time.monotonic()
+        while self._idle and self._idle[0][0] <= now:
+            _, host = heapq.heappop(self._idle)
+            state = self._hosts.get(host)
+            if state is not None and not state.heap and not state.active and state.ready_at <= now:
+                del self._hosts[host]
+
+    def _offer(self, host: str) -> None:
+        state = self._hosts.get(host)
+        if state is not None and state.heap:
+            neg_priority, seq, _ = state.heap[0]
+            heapq.heappush(self._ready, (neg_priority, seq, host))
+
+    def _release(self, host: str) -> None:
+        state = self._hosts[host]
+        state.active -= 1
+        if state.heap:
+            self._offer(host)
+            self._wake(self._getters)
+        elif state.active == 0:
+            if state.ready_at <= time.monotonic():
+                del self._hosts[host]
+            else:
+                heapq.heappush(self._idle, (state.ready_at, host))
+        if self._slots is not None:
+            self._slots.release(host, self)
+
+    @staticmethod
+    def _wake(waiters: Deque[asyncio.Future[None]]) -> None:
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
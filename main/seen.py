@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import hashlib
+import math
+from array import array
+from typing import Union
+
+
+def url_fingerprint(url: str) -> int:
+    # 64-bit fingerprint; 0 is reserved as the empty-slot marker
+    fp = int.from_bytes(hashlib.blake2b(url.encode("utf-8", errors="ignore"), digest_size=8).digest(), "little")
+    return fp or 1
+
+
+class FingerprintSet:
+    # Open-addressing hash table of 64-bit URL fingerprints in a flat array('Q'):
+    # 8 bytes per slot instead of a full str object plus set entry per URL.
+    # Collisions between distinct URLs are possible but vanishingly rare at crawl scale.
+    def __init__(self, initial_capacity: int = 1024, max_load: float = 0.6) -> None:
+        capacity = 1 << max(4, math.ceil(math.log2(max(1, initial_capacity) / max_load)))
+        self.max_load = max_load
+        self._slots = array("Q", bytes(8 * capacity))
+        self._mask = capacity - 1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, url: str) -> bool:
+        fp = url_fingerprint(url)
+        slots, mask = self._slots, self._mask
+        i = fp & mask
+        while True:
+            slot = slots[i]
+            if slot == fp:
+                return True
+            if slot == 0:
+                return False
+            i = (i + 1) & mask
+
+    def add(self, url: str) -> bool:
+        # Returns True when the URL was not seen before
+        return self.add_fingerprint(url_fingerprint(url))
+
+    def add_fingerprint(self, fp: int) -> bool:
+        slots, mask = self._slots, self._mask
+        i = fp & mask
+        while True:
+            slot = slots[i]
+            if slot == fp:
+                return False
+            if slot == 0:
+                break
+            i = (i + 1) & mask
+        slots[i] = fp
+        self._size += 1
+        if self._size > self.max_load * len(slots):
+            self._grow()
+        return True
+
+    def _grow(self) -> None:
+        old = self._slots
+        self._slots = array("Q", bytes(8 * len(old) * 2))
+        self._mask = len(self._slots) - 1
+        self._size = 0
+        for fp in old:
+            if fp:
+                self.add_fingerprint(fp)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._slots.itemsize * len(self._slots)
+
+
+class BloomSeenSet:
+    # Fixed-size Bloom filter: memory does not grow with the crawl, at the price of
+    # a bounded false-positive rate (a small fraction of new URLs are treated as seen).
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001) -> None:
+        capacity = max(1, capacity)
+        error_rate = min(max(error_rate, 1e-9), 0.5)
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self._bits = bytearray((bits + 7) // 8)
+        self._nbits = len(self._bits) * 8
+        self._hashes = max(1, round(bits / capacity * math.log(2)))
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _positions(self, url: str):
+        digest = hashlib.blake2b(url.encode("utf-8", errors="ignore"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        nbits = self._nbits
+        return [(h1 + i * h2) % nbits for i in range(self._hashes)]
+
+    def __contains__(self, url: str) -> bool:
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(url))
+
+    def add(self, url: str) -> bool:
+        bits = self._bits
+        new = False
+        for p in self._positions(url):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                new = True
+        if new:
+            self._size += 1
+        return new
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+
+SeenSet = Union[FingerprintSet, BloomSeenSet]
+SEEN_SET_MODES = {"exact", "bloom"}
+DEFAULT_BLOOM_CAPACITY = 1_000_000
+
+
+def make_seen_set(mode: str = "exact", capacity: int = 0, error_rate: float = 0.001) -> SeenSet:
+    # capacity is the expected number of URLs: it pre-sizes the exact set (which still grows past it)
+    # and sizes the Bloom filter. 0 means unknown: start small, or a 1M-URL filter.
+    if mode == "exact":
+        return FingerprintSet(capacity) if capacity > 0 else FingerprintSet()
+    if mode == "bloom":
+        return BloomSeenSet(capacity=capacity if capacity > 0 else DEFAULT_BLOOM_CAPACITY, error_rate=error_rate)
+    raise ValueError(f"Unknown seen-set mode: {mode!r}")
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, List, Optional
+
+import aiohttp
+from lxml import etree
+
+URL = "url"
+SITEMAP = "sitemap"
+
+
+@dataclass
+class SitemapEntry:
+    url: str
+    kind: str  # URL (a page or file) or SITEMAP (a child of a sitemap index)
+    lastmod: Optional[datetime] = None
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    # W3C datetime: 2024, 2024-05, 2024-05-01, or a full timestamp with Z or an offset
+    if not value:
+        return None
+    value = value.strip().replace("Z", "+00:00")
+    for fmt in ("%Y-%m-%d", "%Y-%m", "%Y"):
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def lastmod_priority(lastmod: Optional[datetime], weight: float = 50.0, now: Optional[datetime] = None) -> float:
+    # Recently modified entries first: weight for today, half of it a year ago; unknown dates sit at half
+    if lastmod is None:
+        return weight / 2
+    now = now or datetime.now(timezone.utc)
+    age_days = max(0.0, (now - lastmod).total_seconds() / 86400)
+    return weight / (1 + age_days / 365)
+
+
+class SitemapParser:
+    # Incremental parser for <urlset>, <sitemapindex> and plain-text sitemaps, gzipped or not.
+    # feed() returns the entries completed by that chunk; each finished element is cleared,
+    # so memory stays flat for 50,000-URL files.
+    def __init__(self, max_bytes: int = 0) -> None:
+        self.max_bytes = max_bytes
+        self.decoded = 0
+        self._inflate: Any = None
+        self._sniffed = False
+        self._text: Optional[bytearray] = None
+        self._xml = False
+        self._parser = etree.XMLPullParser(events=("end",), recover=True, resolve_entities=False, no_network=True)
+        self._loc: Optional[str] = None
+        self._lastmod: Optional[str] = None
+
+    @property
+    def exhausted(self) -> bool:
+        return 0 < self.max_bytes < self.decoded
+
+    def feed(self, data: bytes) -> List[SitemapEntry]:
+        if not self._sniffed:
+            self._sniffed = True
+            if data[:2] == b"\x1f\x8b":
+                # .xml.gz is usually served as a file, not with Content-Encoding
+                self._inflate = zlib.decompressobj(31)
+        if self._inflate is None:
+            return self._feed_decoded(data)
+        entries: List[SitemapEntry] = []
+        while data and not self.exhausted:
+            # Inflate in bounded steps so a small compressed body cannot balloon in memory
+            out = self._inflate.decompress(data, 1024 * 1024)
+            data = self._inflate.unconsumed_tail
+            entries += self._feed_decoded(out)
+        return entries
+
+    def _feed_decoded(self, data: bytes) -> List[SitemapEntry]:
+        self.decoded += len(data)
+        if not self._xml and self._text is None:
+            head = data.lstrip(b"\xef\xbb\xbf \t\r\n")[:1]
+            if not head:
+                return []
+            if head == b"<":
+                self._xml = True
+            else:
+                self._text = bytearray()
+        if self._text is not None:
+            return self._feed_text(data)
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[SitemapEntry]:
+        if self._text is not None:
+            return self._feed_text(b"\n")
+        try:
+            self._parser.close()
+        except etree.LxmlError:
+            pass
+        return self._drain()
+
+    def _feed_text(self, data: bytes) -> List[SitemapEntry]:
+        # Text sitemaps: one absolute URL per line
+        buffer = self._text
+        buffer += data
+        *lines, rest = bytes(buffer).split(b"\n")
+        self._text = bytearray(rest)
+        entries = []
+        for line in lines:
+            url = line.strip().decode("utf-8", "replace")
+            if url.startswith(("http://", "https://")):
+                entries.append(SitemapEntry(url=url, kind=URL))
+        return entries
+
+    def _drain(self) -> List[SitemapEntry]:
+        entries: List[SitemapEntry] = []
+        for _, element in self._parser.read_events():
+            tag = element.tag
+            name = tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+            if name == "loc":
+                self._loc = (element.text or "").strip()
+            elif name == "lastmod":
+                self._lastmod = element.text
+            elif name in (URL, SITEMAP):
+                if self._loc:
+                    entries.append(SitemapEntry(url=self._loc, kind=name, lastmod=parse_lastmod(self._lastmod)))
+                self._loc = self._lastmod = None
+                element.clear()
+                # Drop already-processed siblings still referenced by the root
+                parent = element.getparent()
+                if parent is not None:
+                    while element.getprevious() is not None:
+                        del parent[0]
+        return entries
+
+
+async def iter_sitemap(
+    session: aiohttp.ClientSession,
+    url: str,
+    timeout_seconds: float,
+    max_bytes: int = 0,
+) -> AsyncIterator[SitemapEntry]:
+    # Streams one sitemap file; entries are yielded while the body is still arriving.
+    # max_bytes caps the decompressed size (the protocol allows 50 MB per file).
+    timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+    parser = SitemapParser(max_bytes)
+    async with session.get(url, timeout=timeout) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            for entry in parser.feed(chunk):
+                yield entry
+            if parser.exhausted:
+                break
+            await asyncio.sleep(0)
+    for entry in parser.close():
+        yield entry
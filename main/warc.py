@@ -0,0 +1,520 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import tempfile
+import threading
+import uuid
+import zlib
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from .metrics import ERRORS, PHASE_SECONDS, error_kind
+
+_READ_SIZE = 1024 * 1024
+_SPOOL_MAX = 1024 * 1024
+_DECODED_HEADERS = ("Content-Encoding", "Content-Length")
+
+
+def _warc_date() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _record_id() -> str:
+    return f"<urn:uuid:{uuid.uuid4()}>"
+
+
+def _sha1_label(digest: Any) -> str:
+    return "sha1:" + base64.b32encode(digest.digest()).decode("ascii")
+
+
+def _header_block(lines: List[str]) -> bytes:
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8", "replace")
+
+
+def _index_path(path: Path) -> Path:
+    return path.with_name(path.name + ".idx")
+
+
+def _range_key(headers: Optional[Dict[str, str]]) -> str:
+    for name, value in (headers or {}).items():
+        if name.lower() == "range":
+            return value
+    return ""
+
+
+# Appends WARC/1.1 request/response pairs, one gzip member per record, plus a JSON-lines index
+# (<archive>.idx) of response offsets so replay can seek without inflating the whole archive.
+class WarcWriter:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file: BinaryIO = open(self.path, "ab")
+        self._index = open(_index_path(self.path), "a", encoding="utf-8")
+        self.records = 0
+        self.errors = 0
+        if self._file.tell() == 0:
+            info = b"software: website-divers\r\nformat: WARC File Format 1.1\r\n"
+            self._write_record(
+                ["WARC-Type: warcinfo", f"WARC-Filename: {self.path.name}", "Content-Type: application/warc-fields"],
+                [info],
+            )
+
+    def _write_record(self, headers: List[str], blocks: List[Any]) -> Tuple[int, int]:
+        # blocks are bytes or binary files positioned at 0; the record is compressed as it is copied
+        length = sum(len(b) if isinstance(b, bytes) else _file_size(b) for b in blocks)
+        head = _header_block(["WARC/1.1", f"WARC-Date: {_warc_date()}"] + headers + [f"Content-Length: {length}"])
+        offset = self._file.tell()
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        self._file.write(compressor.compress(head))
+        for block in blocks:
+            if isinstance(block, bytes):
+                self._file.write(compressor.compress(block))
+                continue
+            while True:
+                chunk = block.read(_READ_SIZE)
+                if not chunk:
+                    break
+                self._file.write(compressor.compress(chunk))
+        self._file.write(compressor.compress(b"\r\n\r\n"))
+        self._file.write(compressor.flush())
+        self.records += 1
+        return offset, self._file.tell() - offset
+
+    def write_exchange(self, exchange: "_Exchange") -> None:
+        request_id, response_id = _record_id(), _record_id()
+        request_head = _header_block(
+            [f"{exchange.method} {exchange.url.raw_path_qs or '/'} HTTP/1.1", f"Host: {exchange.url.raw_host}"]
+            + [f"{k}: {v}" for k, v in exchange.request_headers.items()]
+        )
+        response_head = _header_block(
+            [f"HTTP/1.1 {exchange.status} {exchange.reason}"] + [f"{k}: {v}" for k, v in exchange.response_headers.items()]
+        )
+        target = f"WARC-Target-URI: {exchange.url}"
+        response_headers = [
+            "WARC-Type: response",
+            f"WARC-Record-ID: {response_id}",
+            target,
+            f"WARC-Payload-Digest: {_sha1_label(exchange.digest)}",
+            "Content-Type: application/http;msgtype=response",
+        ]
+        if exchange.truncated:
+            # The consumer stopped reading (too large, not HTML, ...); replay serves the same prefix
+            response_headers.append("WARC-Truncated: length")
+        exchange.body.seek(0)
+        with self._lock:
+            offset, length = self._write_record(response_headers, [response_head, exchange.body])
+            self._write_record(
+                [
+                    "WARC-Type: request",
+                    f"WARC-Record-ID: {request_id}",
+                    target,
+                    f"WARC-Concurrent-To: {response_id}",
+                    "Content-Type: application/http;msgtype=request",
+                ],
+                [request_head],
+            )
+            entry = {"method": exchange.method, "url": str(exchange.url), "range": exchange.range, "offset": offset, "length": length}
+            self._index.write(json.dumps(entry) + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+            self._index.close()
+
+
+def _file_size(f: BinaryIO) -> int:
+    position = f.tell()
+    f.seek(0, 2)
+    size = f.tell()
+    f.seek(position)
+    return size
+
+
+class _Exchange:
+    def __init__(self, method: str, url: URL, request_headers: Dict[str, str]) -> None:
+        self.method = method
+        self.url = url
+        self.request_headers = request_headers
+        self.range = _range_key(request_headers)
+        self.status = 0
+        self.reason = ""
+        self.response_headers: CIMultiDict[str] = CIMultiDict()
+        self.body = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX)
+        self.digest = hashlib.sha1()
+        self.truncated = True
+
+    def feed(self, chunk: bytes) -> None:
+        self.body.write(chunk)
+        self.digest.update(chunk)
+
+
+class _TeeStream:
+    def __init__(self, content: aiohttp.StreamReader, exchange: _Exchange) -> None:
+        self._content = content
+        self._exchange = exchange
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        async for chunk in self._content.iter_chunked(n):
+            self._exchange.feed(chunk)
+            yield chunk
+        self._exchange.truncated = False
+
+    async def read(self, n: int = -1) -> bytes:
+        data = await self._content.read(n)
+        self._exchange.feed(data)
+        if n < 0 or self._content.at_eof():
+            self._exchange.truncated = False
+        return data
+
+    def at_eof(self) -> bool:
+        return self._content.at_eof()
+
+
+class _RecordingResponse:
+    def __init__(self, response: aiohttp.ClientResponse, exchange: _Exchange) -> None:
+        self._response = response
+        self.content = _TeeStream(response.content, exchange)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+
+class _RecordingRequest:
+    def __init__(self, session: "RecordingSession", method: str, url: str, kwargs: Dict[str, Any]) -> None:
+        self._session = session
+        self._ctx = session.session.request(method, url, **kwargs)
+        headers = dict(session.session.headers)
+        headers.update(kwargs.get("headers") or {})
+        self._exchange = _Exchange(method, URL(url), headers)
+        self._decoded = kwargs.get("auto_decompress", True)
+
+    async def __aenter__(self) -> _RecordingResponse:
+        response = await self._ctx.__aenter__()
+        exchange = self._exchange
+        exchange.status, exchange.reason = response.status, response.reason or ""
+        exchange.response_headers = CIMultiDict(response.headers)
+        if self._decoded and "Content-Encoding" in exchange.response_headers:
+            # The consumer sees inflated bytes, so record them without the encoding they arrived in
+            for name in _DECODED_HEADERS:
+                exchange.response_headers.popall(name, None)
+        # The body is stored de-chunked
+        exchange.response_headers.popall("Transfer-Encoding", None)
+        if response.method == "HEAD" or response.status in (204, 304):
+            exchange.truncated = False
+        return _RecordingResponse(response, exchange)
+
+    async def __aexit__(self, *exc: Any) -> None:
+        try:
+            await self._session.save(self._exchange)
+        finally:
+            await self._ctx.__aexit__(*exc)
+
+
+# Drop-in for the aiohttp session the crawler uses: every exchange goes to the network and is
+# appended to the archive once the caller is done with the response.
+class RecordingSession:
+    def __init__(self, session: aiohttp.ClientSession, writer: WarcWriter) -> None:
+        self.session = session
+        self.writer = writer
+
+    def get(self, url: str, **kwargs: Any) -> _RecordingRequest:
+        return _RecordingRequest(self, "GET", url, kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> _RecordingRequest:
+        return _RecordingRequest(self, "HEAD", url, kwargs)
+
+    async def save(self, exchange: _Exchange) -> None:
+        try:
+            with PHASE_SECONDS.time("warc_write"):
+                await asyncio.to_thread(self.writer.write_exchange, exchange)
+        except Exception as e:
+            # Archiving is best effort; the crawl itself already has the response
+            self.writer.errors += 1
+            ERRORS.inc("warc", error_kind(e))
+        finally:
+            exchange.body.close()
+
+
+@dataclass
+class _IndexEntry:
+    offset: int
+    length: int
+
+
+# Read side: responses are looked up by (method, URL, Range). Several exchanges for the same key
+# (a 429 then a 200) are replayed in recorded order, and the last one repeats once they run out.
+class WarcArchive:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._entries: Dict[Tuple[str, str, str], Deque[_IndexEntry]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        index = _index_path(self.path)
+        if index.exists():
+            self._load_index(index)
+        else:
+            self._scan()
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._entries.values())
+
+    def _load_index(self, index: Path) -> None:
+        with open(index, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a torn last line from an interrupted recording
+                key = (entry["method"], entry["url"], entry.get("range", ""))
+                self._entries[key].append(_IndexEntry(entry["offset"], entry["length"]))
+
+    def _scan(self) -> None:
+        # No index: inflate each member once to find response records and their request keys
+        responses: Dict[str, Tuple[str, _IndexEntry]] = {}
+        for offset, length, data in _iter_members(self.path):
+            warc_headers, block = _split_head(data)
+            kind = warc_headers.get("warc-type")
+            if kind == "response":
+                responses[warc_headers.get("warc-record-id", "")] = (warc_headers.get("warc-target-uri", ""), _IndexEntry(offset, length))
+            elif kind == "request":
+                target = responses.pop(warc_headers.get("warc-concurrent-to", ""), None)
+                if target is None:
+                    continue
+                request_line, request_headers = _split_http(block)
+                method = request_line.split(" ", 1)[0]
+                self._entries[(method, target[0], _range_key(request_headers))].append(target[1])
+
+    def lookup(self, method: str, url: str, headers: Optional[Dict[str, str]]) -> Optional[_IndexEntry]:
+        with self._lock:
+            entries = self._entries.get((method, str(URL(url)), _range_key(headers)))
+            if not entries:
+                self.misses += 1
+                return None
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def open_record(self, entry: _IndexEntry) -> "_RecordReader":
+        return _RecordReader(self.path, entry)
+
+
+def _iter_members(path: Path) -> Iterator[Tuple[int, int, bytes]]:
+    with open(path, "rb") as f:
+        offset = 0
+        pending = b""
+        while True:
+            decompressor = zlib.decompressobj(31)
+            head = bytearray()
+            consumed = 0
+            while not decompressor.eof:
+                data = pending or f.read(_READ_SIZE)
+                pending = b""
+                if not data:
+                    return
+                before = len(data)
+                out = decompressor.decompress(data)
+                if len(head) < 64 * 1024:
+                    head += out
+                pending = decompressor.unused_data
+                consumed += before - len(pending)
+            yield offset, consumed, bytes(head)
+            offset += consumed
+
+
+def _split_head(data: bytes) -> Tuple[Dict[str, str], bytes]:
+    head, _, block = data.partition(b"\r\n\r\n")
+    headers: Dict[str, str] = {}
+    for line in head.decode("utf-8", "replace").split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return headers, block
+
+
+def _split_http(block: bytes) -> Tuple[str, Dict[str, str]]:
+    head = block.partition(b"\r\n\r\n")[0].decode("iso-8859-1")
+    lines = head.split("\r\n")
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip()] = value.strip()
+    return lines[0], headers
+
+
+class _RecordReader:
+    def __init__(self, path: Path, entry: _IndexEntry) -> None:
+        self._file = open(path, "rb")
+        self._file.seek(entry.offset)
+        self._remaining = entry.length
+        self._decompressor = zlib.decompressobj(31)
+        self._buffer = b""
+        self._body_left = 0
+
+    def _inflate(self) -> bytes:
+        while self._remaining > 0:
+            data = self._file.read(min(_READ_SIZE, self._remaining))
+            if not data:
+                break
+            self._remaining -= len(data)
+            out = self._decompressor.decompress(data)
+            if out:
+                return out
+        self._remaining = 0
+        return self._decompressor.flush()
+
+    def read_head(self) -> Tuple[int, str, CIMultiDict[str]]:
+        # WARC header, then the HTTP status line and headers; what follows is the body
+        while self._buffer.count(b"\r\n\r\n") < 2:
+            data = self._inflate()
+            if not data:
+                raise ValueError("truncated WARC record")
+            self._buffer += data
+        warc_head, _, rest = self._buffer.partition(b"\r\n\r\n")
+        http_head, _, self._buffer = rest.partition(b"\r\n\r\n")
+        warc_headers = _split_head(warc_head + b"\r\n\r\n")[0]
+        block_length = int(warc_headers.get("content-length", "0"))
+        self._body_left = block_length - len(http_head) - 4
+        lines = http_head.decode("iso-8859-1").split("\r\n")
+        parts = lines[0].split(" ", 2)
+        headers: CIMultiDict[str] = CIMultiDict()
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers.add(name.strip(), value.strip())
+        return int(parts[1]), parts[2] if len(parts) > 2 else "", headers
+
+    def read_body(self) -> bytes:
+        if self._body_left <= 0:
+            return b""
+        data = self._buffer or self._inflate()
+        self._buffer = b""
+        data = data[: self._body_left]
+        self._body_left -= len(data)
+        return data
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ReplayStream:
+    def __init__(self, reader: _RecordReader) -> None:
+        self._reader = reader
+        self._pending = b""
+        self._eof = False
+
+    async def _next(self) -> bytes:
+        if self._pending:
+            data, self._pending = self._pending, b""
+            return data
+        data = await asyncio.to_thread(self._reader.read_body)
+        if not data:
+            self._eof = True
+        return data
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        while True:
+            data = await self._next()
+            if not data:
+                return
+            for start in range(0, len(data), n):
+                yield data[start : start + n]
+
+    async def read(self, n: int = -1) -> bytes:
+        out = bytearray()
+        while n < 0 or len(out) < n:
+            data = await self._next()
+            if not data:
+                break
+            if n >= 0 and len(out) + len(data) > n:
+                data, self._pending = data[: n - len(out)], data[n - len(out) :]
+            out += data
+        return bytes(out)
+
+    def at_eof(self) -> bool:
+        return self._eof
+
+
+class _ReplayResponse:
+    def __init__(self, method: str, url: str, status: int, reason: str, headers: CIMultiDict[str], reader: _RecordReader) -> None:
+        self.method = method
+        self.url = URL(url)
+        self.status = status
+        self.reason = reason
+        self.headers = CIMultiDictProxy(headers)
+        self.content = _ReplayStream(reader)
+        self._reader = reader
+        self.request_info = aiohttp.RequestInfo(self.url, method, CIMultiDictProxy(CIMultiDict()), self.url)
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("Content-Type", "application/octet-stream").split(";")[0].strip().lower()
+
+    @property
+    def charset(self) -> Optional[str]:
+        for param in self.headers.get("Content-Type", "").split(";")[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "charset":
+                return value.strip().strip('"') or None
+        return None
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                self.request_info, (), status=self.status, message=self.reason, headers=self.headers
+            )
+
+    def close(self) -> None:
+        self._reader.close()
+
+    def release(self) -> None:
+        self._reader.close()
+
+
+class _ReplayRequest:
+    def __init__(self, archive: WarcArchive, method: str, url: str, headers: Optional[Dict[str, str]]) -> None:
+        self._archive = archive
+        self._method = method
+        self._url = url
+        self._headers = headers
+        self._response: Optional[_ReplayResponse] = None
+
+    async def __aenter__(self) -> _ReplayResponse:
+        entry = self._archive.lookup(self._method, self._url, self._headers)
+        if entry is None:
+            raise aiohttp.ClientConnectionError(f"{self._method} {self._url} is not in the archive")
+        reader = self._archive.open_record(entry)
+        try:
+            status, reason, headers = await asyncio.to_thread(reader.read_head)
+        except Exception:
+            reader.close()
+            raise
+        self._response = _ReplayResponse(self._method, self._url, status, reason, headers, reader)
+        return self._response
+
+    async def __aexit__(self, *exc: Any) -> None:
+        if self._response is not None:
+            self._response.close()
+
+
+# Serves the crawl from an archive instead of the network; URLs that were never recorded fail
+# like an unreachable host.
+class ReplaySession:
+    def __init__(self, archive: WarcArchive) -> None:
+        self.archive = archive
+
+    def get(self, url: str, **kwargs: Any) -> _ReplayRequest:
+        return _ReplayRequest(self.archive, "GET", url, kwargs.get("headers"))
+
+    def head(self, url: str, **kwargs: Any) -> _ReplayRequest:
+        return _ReplayRequest(self.archive, "HEAD", url, kwargs.get("headers"))
@@ -1,49 +1,106 @@
 from __future__ import annotations
 
-import asyncio
+from dataclasses import replace
 from pathlib import Path
 from typing import Optional
 
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import Depends, FastAPI, Request, Form
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 
 from .config import Settings, load_settings
-from .crawler import Crawler
-from .db import get_latest_records, init_db, clear_all_records
+from .db import get_engine, get_latest_records, init_db, clear_all_records
+from .frontier import get_run, list_runs, settings_overrides
+from .http_pool import HttpPool
+from .jobs import FAILED, JobManager
+from .metrics import profile_summary, registry
 
 app = FastAPI(title="Lally Data Acquisition UI")
 
 templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
 
-# Global crawl state
-_is_crawling = False
-_state_lock = asyncio.Lock()
-_current_stats: dict[str, int] = {}
-_current_settings: Optional[Settings] = None
-_recent_errors: list[str] = []
+# Crawl jobs submitted from the UI or the /jobs API. They share one connection pool (keep-alive
+# sockets and DNS survive between jobs) and one set of per-host limits, backoff and robots.txt.
+_jobs: Optional[JobManager] = None
+
+
+def _manager() -> JobManager:
+    if _jobs is None:
+        raise RuntimeError("Job manager is not running")
+    return _jobs
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
-    init_db()
+    global _jobs
+    engine = get_engine()
+    init_db(engine)
+    settings = load_settings()
+    _jobs = JobManager(settings, max_jobs=settings.max_concurrent_jobs, pool=HttpPool(settings), engine=engine)
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    if _jobs is not None:
+        await _jobs.close()
+
+
+class CrawlForm:
+    # Form fields of a new crawl; used by the UI (/crawl) and the API (POST /jobs)
+    def __init__(
+        self,
+        url: str = Form(...),
+        depth: int = Form(2),
+        concurrency: int = Form(8),
+        download_concurrency: int = Form(8),
+        enable_ai: bool = Form(False),
+        ai_model: str = Form("gpt-4o-mini"),
+        link_extractor: str = Form("bs4"),
+    ) -> None:
+        self.url = url
+        self.depth = depth
+        self.concurrency = concurrency
+        self.download_concurrency = download_concurrency
+        self.enable_ai = enable_ai
+        self.ai_model = ai_model
+        self.link_extractor = link_extractor
+
+    def settings(self) -> Settings:
+        return replace(
+            load_settings(),
+            start_url=self.url,
+            max_depth=self.depth,
+            max_concurrency=self.concurrency,
+            download_concurrency=self.download_concurrency,
+            enable_ai=self.enable_ai,
+            ai_model=self.ai_model,
+            link_extractor=self.link_extractor,
+        )
 
 
 @app.get("/status")
 async def status() -> JSONResponse:
+    jobs = _manager().jobs()
+    # The UI's progress line follows the most recent job that has started
+    current = next((job for job in jobs if job.started_at is not None), None)
     data = {
-        "crawling": _is_crawling,
-        "stats": _current_stats,
-        "errors": _recent_errors[-5:],
-        "settings": {
-            "max_depth": _current_settings.max_depth if _current_settings else None,
-            "max_concurrency": _current_settings.max_concurrency if _current_settings else None,
-            "per_host_concurrency": _current_settings.per_host_concurrency if _current_settings else None,
-        },
+        "crawling": _manager().running > 0,
+        "running": _manager().running,
+        "queued": _manager().queued,
+        "stats": current.live_stats if current is not None else {},
+        "profile": profile_summary(),
+        "errors": [f"job {job.id}: {job.error}" for job in jobs if job.status == FAILED][:5],
+        "hosts": current.crawler.host_stats() if current is not None and current.crawler is not None else {},
+        "jobs": [job.snapshot() for job in jobs[:20]],
     }
     return JSONResponse(data)
 
 
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/clear")
 async def clear() -> RedirectResponse:
     clear_all_records()
@@ -53,62 +110,64 @@ async def clear() -> RedirectResponse:
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     records = get_latest_records(limit=50)
+    runs = list_runs(limit=10)
     return templates.TemplateResponse(
         "index.html",
         {
             "request": request,
             "records": records,
+            "runs": runs,
+            "jobs": _manager().jobs()[:20],
         },
     )
 
 
 @app.post("/crawl")
-async def crawl(
-    request: Request,
-    url: str = Form(...),
-    depth: int = Form(2),
-    concurrency: int = Form(8),
-    per_host: int = Form(2),
-    enable_ai: bool = Form(False),
-    ai_model: str = Form("gpt-4o-mini"),
-):
-    global _is_crawling, _current_stats, _current_settings, _recent_errors
-    async with _state_lock:
-        if _is_crawling:
-            return RedirectResponse(url="/", status_code=303)
-        _is_crawling = True
-        _recent_errors = []
-
-    base = load_settings()
-    settings = Settings(
-        start_url=url,
-        max_depth=depth,
-        max_concurrency=concurrency,
-        per_host_concurrency=per_host,
-        output_dir=base.output_dir,
-        db_url=base.db_url,
-        enable_ai=enable_ai,
-        ai_model=ai_model,
-        request_timeout_seconds=base.request_timeout_seconds,
-        user_agent=base.user_agent,
-        respect_robots=base.respect_robots,
-        max_file_size_kb=base.max_file_size_kb,
-        max_retries=base.max_retries,
-        backoff_base_seconds=base.backoff_base_seconds,
-        allow_render_js=base.allow_render_js,
-    )
-    _current_settings = settings
-
-    async def _run_and_reset():
-        global _is_crawling, _current_stats, _recent_errors
-        try:
-            crawler = Crawler(settings)
-            await crawler.run(url)
-            _current_stats = crawler.stats
-        except Exception as e:
-            _recent_errors.append(str(e)[:300])
-        finally:
-            _is_crawling = False
-
-    asyncio.create_task(_run_and_reset())
+async def crawl(form: CrawlForm = Depends()):
+    _manager().submit(form.url, form.settings())
     return RedirectResponse(url="/", status_code=303)
+
+
+@app.post("/resume")
+async def resume(run_id: int = Form(...)):
+    info = get_run(run_id)
+    if info is not None and info.status != "completed":
+        settings = replace(load_settings(), **settings_overrides(info))
+        _manager().submit(info.start_url, settings, resume_run_id=run_id)
+    return RedirectResponse(url="/", status_code=303)
+
+
+@app.get("/jobs")
+async def list_jobs() -> JSONResponse:
+    manager = _manager()
+    return JSONResponse(
+        {
+            "running": manager.running,
+            "queued": manager.queued,
+            "max_jobs": manager.max_jobs,
+            "jobs": [job.snapshot() for job in manager.jobs()],
+        }
+    )
+
+
+@app.post("/jobs")
+async def create_job(form: CrawlForm = Depends()) -> JSONResponse:
+    job = _manager().submit(form.url, form.settings())
+    return JSONResponse(job.snapshot() if job is not None else {}, status_code=202)
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: int) -> JSONResponse:
+    job = _manager().get(job_id)
+    if job is None:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+    return JSONResponse(job.snapshot(hosts=True))
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(request: Request, job_id: int):
+    if not _manager().cancel(job_id):
+        return JSONResponse({"error": "job is not queued or running"}, status_code=409)
+    if "text/html" in request.headers.get("Accept", ""):
+        return RedirectResponse(url="/", status_code=303)
+    return JSONResponse({"id": job_id, "cancelled": True})
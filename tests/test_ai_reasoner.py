@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from sqlalchemy import create_engine
+
+from main.ai_reasoner import AIScorer, FakeAIClient, HeuristicScorer, blend_scores
+from main.db import init_db
+
+
+class FailingClient(FakeAIClient):
+    def __init__(self) -> None:
+        super().__init__()
+
+        async def create(**_):
+            raise RuntimeError("upstream unavailable")
+
+        self.chat.completions.create = create
+
+
+def page(n: int) -> str:
+    return f"<html><body>dataset {n} csv download</body></html>"
+
+
+def test_repeated_snippet_is_scored_once():
+    async def main():
+        scorer = AIScorer("fake", client=FakeAIClient(), rate_per_second=0)
+        first = await scorer.score(page(1))
+        second = await scorer.score(page(1))
+        return scorer, first, second
+
+    scorer, first, second = asyncio.run(main())
+    assert first == second == float(int(HeuristicScorer().score(page(1), "")))
+    assert scorer.calls == 1
+    assert scorer.cache_hits == 1
+
+
+def test_concurrent_identical_snippets_share_one_call():
+    async def main():
+        client = FakeAIClient(latency_seconds=0.05)
+        scorer = AIScorer("fake", client=client, rate_per_second=0)
+        results = await asyncio.gather(*(scorer.score(page(1)) for _ in range(5)))
+        return scorer, client, results
+
+    scorer, client, results = asyncio.run(main())
+    assert len(set(results)) == 1
+    assert client.chat.completions.calls == 1
+    assert scorer.cache_hits == 4
+
+
+def test_memory_cache_evicts_least_recently_used():
+    async def main():
+        scorer = AIScorer("fake", client=FakeAIClient(), rate_per_second=0, memory_size=2)
+        await scorer.score(page(1))
+        await scorer.score(page(2))
+        await scorer.score(page(1))  # page 2 is now the oldest entry
+        await scorer.score(page(3))
+        calls = scorer.calls
+        await scorer.score(page(1))
+        assert scorer.calls == calls
+        await scorer.score(page(2))
+        assert scorer.calls == calls + 1
+        return scorer
+
+    scorer = asyncio.run(main())
+    assert len(scorer._memory) == 2
+
+
+def test_persistent_cache_survives_a_new_scorer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ai.db'}")
+    init_db(engine)
+
+    async def main():
+        first = AIScorer("fake", engine=engine, client=FakeAIClient(), rate_per_second=0)
+        value = await first.score(page(1))
+        second = AIScorer("fake", engine=engine, client=FakeAIClient(), rate_per_second=0)
+        return value, await second.score(page(1)), second
+
+    value, cached, second = asyncio.run(main())
+    engine.dispose()
+    assert cached == value
+    assert second.calls == 0
+    assert second.cache_hits == 1
+
+
+def test_calls_are_rate_limited():
+    async def main():
+        # The bucket starts with rate_per_second tokens, so two of six calls have to wait 0.25s each
+        scorer = AIScorer("fake", client=FakeAIClient(), rate_per_second=4, concurrency=6)
+        start = time.monotonic()
+        await asyncio.gather(*(scorer.score(page(n)) for n in range(6)))
+        return scorer, time.monotonic() - start
+
+    scorer, elapsed = asyncio.run(main())
+    assert scorer.calls == 6
+    assert elapsed >= 0.45
+
+
+def test_failed_call_falls_back_to_heuristic_and_is_not_cached():
+    async def main():
+        scorer = AIScorer("fake", client=FailingClient(), rate_per_second=0)
+        first = await scorer.score(page(1))
+        second = await scorer.score(page(1))
+        return scorer, first, second
+
+    scorer, first, second = asyncio.run(main())
+    assert first is None and second is None
+    assert scorer.failures == 2
+    assert scorer.calls == 2
+    assert blend_scores(40.0, first) == 40.0
+
+
+def test_missing_api_key_scores_nothing(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    async def main():
+        scorer = AIScorer("gpt-4o-mini", rate_per_second=0)
+        return scorer, await scorer.score(page(1))
+
+    scorer, value = asyncio.run(main())
+    assert value is None
+    assert scorer.calls == 0
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import List, Set
+
+import pytest
+from sqlalchemy import create_engine
+
+from main.config import Settings
+from main.distributed import SharedFrontier
+from main.db import init_db
+from main.frontier import PAGE, FrontierBatch, FrontierEntry, FrontierStore, create_run, host_shard, url_hash
+
+SHARDS = 4
+URLS = [f"http://h{h}.example/page/{n}" for h in range(16) for n in range(10)]
+
+
+@pytest.fixture
+def run(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'frontier.db'}", connect_args={"timeout": 30})
+    init_db(engine)
+    run_id = create_run("http://h0.example/", Settings(), engine)
+    store = FrontierStore(engine, run_id, shards=SHARDS)
+    store.write(FrontierBatch([FrontierEntry(url=u, kind=PAGE, depth=0, priority=0.0) for u in URLS], []))
+    assert {host_shard(u, SHARDS) for u in URLS} == set(range(SHARDS))
+    yield engine, run_id, store
+    engine.dispose()
+
+
+def worker(engine, run_id: int, name: str, lease_seconds: float = 60.0) -> SharedFrontier:
+    frontier = SharedFrontier(engine, run_id, SHARDS, lease_seconds=lease_seconds, worker_id=name)
+    frontier.open()
+    return frontier
+
+
+def test_two_workers_claim_every_url_exactly_once(run):
+    engine, run_id, store = run
+    workers = [worker(engine, run_id, "a"), worker(engine, run_id, "b")]
+    claimed = {w.worker_id: [] for w in workers}
+    errors: List[BaseException] = []
+
+    def crawl(frontier: SharedFrontier) -> None:
+        try:
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline:
+                entries = frontier.sync({}, 7)
+                claimed[frontier.worker_id].extend(e.url for e in entries)
+                time.sleep(0.005 * len(entries))  # fetching
+                store.write(FrontierBatch([], [(PAGE, url_hash(e.url)) for e in entries]))
+                if not entries:
+                    if frontier.remaining() == 0:
+                        return
+                    time.sleep(0.01)  # the claim loop's interval, shortened
+            raise AssertionError(f"{frontier.worker_id} did not see the run finish")
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=crawl, args=(w,)) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    a, b = claimed["a"], claimed["b"]
+    assert len(a) == len(set(a)) and len(b) == len(set(b))
+    assert not set(a) & set(b)
+    assert sorted(a + b) == sorted(URLS)
+    assert a and b  # whoever started first handed half the shards to the other
+
+
+def test_expired_leases_are_reclaimed_by_another_worker(run):
+    engine, run_id, _ = run
+    crashed = worker(engine, run_id, "crashed", lease_seconds=1)
+    lost = {e.url for e in crashed.sync({}, 25)}
+    assert len(lost) == 25
+
+    survivor = worker(engine, run_id, "survivor", lease_seconds=1)
+    # Live leases are left alone
+    assert not {e.url for e in survivor.sync({}, len(URLS))} & lost
+
+    time.sleep(1.2)  # the crashed worker stops heartbeating and its leases run out
+    taken: Set[str] = set()
+    for _ in range(3):
+        taken |= {e.url for e in survivor.sync({}, len(URLS))}
+    assert lost <= taken
+    assert survivor.reclaimed == len(lost)
+    assert survivor.owned == set(range(SHARDS))
+
+
+def test_close_hands_urls_back_immediately(run):
+    engine, run_id, _ = run
+    leaving = worker(engine, run_id, "leaving")
+    held = {e.url for e in leaving.sync({}, 10)}
+    leaving.close()
+    other = worker(engine, run_id, "other")
+    assert held <= {e.url for e in other.sync({}, len(URLS))}
+    assert other.reclaimed == 0
+
+
+def test_shards_rebalance_when_a_worker_joins(run):
+    engine, run_id, _ = run
+    a = worker(engine, run_id, "a")
+    a.sync({}, 0)
+    assert a.owned == set(range(SHARDS))
+
+    b = worker(engine, run_id, "b")
+    b.sync({}, 0)
+    assert b.owned == set()  # every shard is still leased to a
+
+    # a keeps shards with URLs in flight, whatever its fair share
+    a.sync({s: 1 for s in range(SHARDS)}, 0)
+    assert a.owned == set(range(SHARDS))
+
+    # Once they drain, a hands back everything over half and b picks it up
+    a.sync({}, 0)
+    b.sync({}, 0)
+    assert len(a.owned) == len(b.owned) == SHARDS // 2
+    assert a.owned | b.owned == set(range(SHARDS))
+
+    b.close()
+    a.sync({}, 0)
+    assert a.owned == set(range(SHARDS))
+